@@ -2,6 +2,7 @@ from django.utils.html import format_html  # प्रोफाइल फोट
 from django.contrib import admin
 from django import forms
 from .models import *
+from .user_cache import bump_user_version
 from django.contrib.auth.admin import UserAdmin
 import logging
 
@@ -223,6 +224,7 @@ class CustomUserAdmin(UserAdmin):
                         print(f"[DEBUG change_view] object_id={object_id} before_role={before} role_value={role_value}")
                         # Direct DB update avoids additional model save hooks
                         CustomUser.objects.filter(pk=object_id).update(role=role_value)
+                        bump_user_version(object_id)
                         after = CustomUser.objects.filter(pk=object_id).values_list('role', flat=True).first()
                         print(f"[DEBUG change_view] object_id={object_id} after_role={after}")
                     except Exception:
@@ -1,18 +1,19 @@
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib.auth import get_user_model
-from django.db import DatabaseError
+from django.utils.functional import SimpleLazyObject
 import logging
 
+from . import user_cache
+
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 
 class RefreshUserMiddleware(MiddlewareMixin):
-    """Reload `request.user` from the database on each request.
+    """Resolve `request.user` through the versioned user cache.
 
-    This ensures that role changes performed in the admin UI take effect
-    immediately for redirect decisions and permission checks during the
-    same user's next requests.
+    Role or profile changes bump the user's cache version (see
+    `accounts.signals`), so they take effect for redirect decisions and
+    permission checks on the user's next request, while unchanged users
+    are served from the cache without a user query.
     """
 
     def process_request(self, request):
@@ -27,15 +28,8 @@ class RefreshUserMiddleware(MiddlewareMixin):
                 logger.debug('RefreshUserMiddleware: skipping refresh for SSO path: %s', request.path)
                 return
 
-            user = getattr(request, 'user', None)
-            if user and getattr(user, 'is_authenticated', False):
-                # Refresh from DB to pick up role or other field changes
-                try:
-                    fresh = User.objects.filter(pk=user.pk).first()
-                    if fresh:
-                        request.user = fresh
-                        logger.debug('RefreshUserMiddleware: refreshed user %s', getattr(fresh, 'pk', None))
-                except DatabaseError:
-                    logger.exception('Database error while refreshing user %s', getattr(user, 'pk', None))
+            if hasattr(request, 'session'):
+                # Replaces AuthenticationMiddleware's lazy lookup before anything evaluates it
+                request.user = SimpleLazyObject(lambda: user_cache.get_user(request))
         except Exception:
             logger.exception('Unexpected error in RefreshUserMiddleware')
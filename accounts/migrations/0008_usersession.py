@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def index_existing_sessions(apps, schema_editor):
+    """One-time scan so sessions created before the index existed can be invalidated"""
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.utils import timezone
+
+    Session = apps.get_model('sessions', 'Session')
+    UserSession = apps.get_model('accounts', 'UserSession')
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+
+    user_ids = set(CustomUser.objects.values_list('pk', flat=True))
+    store = SessionStore()
+    rows = []
+    for session in Session.objects.filter(expire_date__gte=timezone.now()).iterator():
+        try:
+            user_id = store.decode(session.session_data).get('_auth_user_id')
+        except Exception:
+            continue
+        if user_id is not None and int(user_id) in user_ids:
+            rows.append(UserSession(user_id=int(user_id), session_key=session.session_key, expire_date=session.expire_date))
+    UserSession.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_merge_0006_add_soft_delete_fields_0006_ssostate'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40, unique=True)),
+                ('expire_date', models.DateTimeField(db_index=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_index', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(index_existing_sessions, migrations.RunPython.noop),
+    ]
@@ -198,6 +198,21 @@ class SSOState(models.Model):
         return f"SSOState(state_id={self.state_id},created={self.created})"
 
 
+class UserSession(models.Model):
+    """Index of the sessions a user is logged in with.
+
+    Rows are added by the `user_logged_in` signal so a user's sessions can be
+    found (and deleted) without decoding every row of the session table.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='session_index')
+    session_key = models.CharField(max_length=40, unique=True)
+    expire_date = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"UserSession(user={self.user_id},session_key={self.session_key[:8]}...)"
+
+
 class Student(models.Model):
     user = models.OneToOneField(
         CustomUser, on_delete=models.CASCADE, related_name="student"
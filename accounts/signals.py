@@ -1,12 +1,17 @@
 import logging
-from django.db.models.signals import post_save, pre_save
+from importlib import import_module
+
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
-from .models import CustomUser
+from .models import CustomUser, Doctor, Staff, Student, UserSession
+from .user_cache import bump_user_version
+from utils.notification_counts import NOTIFICATION_MODELS, invalidate_unread_counts
 
 
 @receiver(post_save, sender=CustomUser)
@@ -77,34 +82,90 @@ def ensure_admin_role_for_superuser(sender, instance, **kwargs):
         logger.exception('Error setting admin role for superuser %s', getattr(instance, 'email', None))
 
 
+def delete_sessions(session_keys):
+    """Delete sessions by key from the configured session engine.
+
+    Database-backed engines get a single DELETE; cache-backed engines
+    (including cached_db) also have the keys evicted from the session cache.
+    """
+    session_keys = list(session_keys)
+    if not session_keys:
+        return
+    from django.core.cache import caches
+
+    store_class = import_module(settings.SESSION_ENGINE).SessionStore
+    if hasattr(store_class, 'get_model_class'):
+        store_class.get_model_class().objects.filter(session_key__in=session_keys).delete()
+    if hasattr(store_class, 'cache_key_prefix'):
+        caches[settings.SESSION_CACHE_ALIAS].delete_many(
+            [store_class.cache_key_prefix + key for key in session_keys]
+        )
+
+
+def live_session_keys(session_keys):
+    """Return the keys of `session_keys` still present in the session engine."""
+    session_keys = list(session_keys)
+    if not session_keys:
+        return set()
+    store_class = import_module(settings.SESSION_ENGINE).SessionStore
+    if hasattr(store_class, 'get_model_class'):
+        return set(
+            store_class.get_model_class().objects.filter(session_key__in=session_keys)
+            .values_list('session_key', flat=True)
+        )
+    return {key for key in session_keys if store_class().exists(key)}
+
+
 def invalidate_user_sessions(user):
-    """Delete all DB sessions associated with `user` (force logout).
+    """Delete all sessions associated with `user` (force logout).
 
-    This is a best-effort approach which iterates active sessions and removes
-    any whose decoded session data references the user's id under
-    `_auth_user_id`.
+    The sessions are looked up in the `UserSession` index, which is filled
+    on login, instead of decoding every active session.
     """
     try:
-        from django.contrib.sessions.models import Session
-        from django.utils import timezone
-
-        now = timezone.now()
-        sessions = Session.objects.filter(expire_date__gte=now)
-        deleted = 0
-        for sess in sessions:
-            try:
-                data = sess.get_decoded()
-                if str(data.get('_auth_user_id')) == str(user.pk):
-                    sess.delete()
-                    deleted += 1
-            except Exception:
-                # Ignore malformed session data
-                continue
-        logger.info('Invalidated %d sessions for user %s', deleted, getattr(user, 'email', user.pk))
+        index = UserSession.objects.filter(user_id=user.pk)
+        session_keys = list(index.values_list('session_key', flat=True))
+        delete_sessions(session_keys)
+        index.delete()
+        logger.info('Invalidated %d sessions for user %s', len(session_keys), getattr(user, 'email', user.pk))
     except Exception:
         logger.exception('Error invalidating sessions for user %s', getattr(user, 'email', user.pk))
 
 
+@receiver(user_logged_in)
+def index_user_session(sender, request, user, **kwargs):
+    """Record the session a user just logged in with."""
+    try:
+        session = getattr(request, 'session', None)
+        session_key = getattr(session, 'session_key', None)
+        if not session_key or user is None or not user.pk:
+            return
+        # Forget this user's sessions the session engine no longer holds. The
+        # stored expiry is not used: saving a session moves its expiry forward.
+        index = UserSession.objects.filter(user_id=user.pk).exclude(session_key=session_key)
+        indexed = list(index.values_list('session_key', flat=True))
+        gone = set(indexed) - live_session_keys(indexed)
+        if gone:
+            UserSession.objects.filter(session_key__in=gone).delete()
+        UserSession.objects.update_or_create(
+            session_key=session_key,
+            defaults={'user_id': user.pk, 'expire_date': session.get_expiry_date()},
+        )
+    except Exception:
+        logger.exception('Error indexing session for user %s', getattr(user, 'pk', None))
+
+
+@receiver(user_logged_out)
+def unindex_user_session(sender, request, user, **kwargs):
+    """Drop the index row of a session that was logged out."""
+    try:
+        session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+        if session_key:
+            UserSession.objects.filter(session_key=session_key).delete()
+    except Exception:
+        logger.exception('Error removing session index for user %s', getattr(user, 'pk', None))
+
+
 @receiver(post_save, sender=CustomUser)
 def invalidate_sessions_on_role_change(sender, instance, created, **kwargs):
     """Invalidate sessions when a user's role changes (but not on create).
@@ -144,6 +205,38 @@ def ensure_role_persisted(sender, instance, created, **kwargs):
         db_role = CustomUser.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
         if db_role != getattr(instance, 'role', None):
             CustomUser.objects.filter(pk=instance.pk).update(role=getattr(instance, 'role', None))
+            bump_user_version(instance.pk)
             logger.info('Enforced role persistence for user %s: %s', getattr(instance, 'email', instance.pk), getattr(instance, 'role', None))
     except Exception:
         logger.exception('Error enforcing role persistence for user %s', getattr(instance, 'email', instance.pk))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def bump_user_cache_version(sender, instance, **kwargs):
+    """Make the next request of this user reload it instead of using the user cache."""
+    bump_user_version(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Doctor)
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Staff)
+def bump_user_cache_version_on_profile_change(sender, instance, **kwargs):
+    """Profile changes can change how a user is routed; reload the user as well."""
+    bump_user_version(instance.user_id)
+
+
+def forget_unread_notification_count(sender, instance, **kwargs):
+    """A notification was created, read or deleted; recount its recipient's unread total."""
+    try:
+        invalidate_unread_counts(sender, [instance.recipient_id])
+    except Exception:
+        logger.exception('Error invalidating unread notification count for %s', sender.__name__)
+
+
+for _model_label, _, _ in NOTIFICATION_MODELS.values():
+    post_save.connect(forget_unread_notification_count, sender=_model_label, dispatch_uid=f'unread-count-save-{_model_label}')
+    post_delete.connect(forget_unread_notification_count, sender=_model_label, dispatch_uid=f'unread-count-delete-{_model_label}')
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase, override_settings
+
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+
+
+User = get_user_model()
+
+
+@override_settings(CACHES=USER_CACHE_TEST_CACHES)
+class NotificationCountTests(TestCase):
+    def setUp(self):
+        from accounts.models import Doctor
+
+        caches["users"].clear()
+        self.user = User.objects.create_user(
+            username="notified", email="notified@example.com", password="pass", role="doctor"
+        )
+        self.doctor = Doctor.objects.get(user=self.user)
+        self.admin = User.objects.create_user(
+            username="notifiedadmin", email="notifiedadmin@example.com", password="pass", role="admin"
+        )
+
+    def _context(self, user):
+        from elogbookagu.context_processors import notification_counts
+
+        request = RequestFactory().get("/")
+        request.user = user
+        return notification_counts(request)
+
+    def _notify(self, **kwargs):
+        from doctor_section.models import Notification
+
+        return Notification.objects.create(recipient=self.doctor, title="Review", message="Log submitted", **kwargs)
+
+    def test_count_is_lazy_and_cached(self):
+        self._notify()
+        with self.assertNumQueries(0):
+            context = self._context(self.user)
+        self.assertEqual(context["admin_unread_notifications_count"], 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(context["unread_notifications_count"], 1)
+        with self.assertNumQueries(0):
+            self.assertTrue(self._context(self.user)["unread_notifications_count"] > 0)
+
+    def test_create_and_read_invalidate(self):
+        self.assertEqual(self._context(self.user)["unread_notifications_count"], 0)
+        notification = self._notify()
+        self.assertEqual(self._context(self.user)["unread_notifications_count"], 1)
+        notification.mark_as_read()
+        self.assertEqual(self._context(self.user)["unread_notifications_count"], 0)
+
+    def test_bulk_create_invalidation(self):
+        from admin_section.models import AdminNotification
+        from utils.notification_counts import invalidate_unread_counts
+
+        self.assertEqual(self._context(self.admin)["admin_unread_notifications_count"], 0)
+        notifications = AdminNotification.objects.bulk_create([
+            AdminNotification(recipient=self.admin, title="Ticket", message="Help", support_ticket_type="doctor")
+        ])
+        invalidate_unread_counts(AdminNotification, [n.recipient_id for n in notifications])
+        self.assertEqual(self._context(self.admin)["admin_unread_notifications_count"], 1)
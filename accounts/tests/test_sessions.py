@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts import user_cache
+from accounts.signals import invalidate_user_sessions
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+from admin_section.tests import LogStatsFixtureMixin
+
+
+def session_queries(queries):
+    return [query['sql'] for query in queries if 'django_session' in query['sql']]
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class AnonymousSessionTests(TestCase):
+    def test_public_home_does_not_touch_session(self):
+        client = Client()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('home_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session_queries(ctx.captured_queries), [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_stale_session_cookie_is_dropped(self):
+        client = Client()
+        client.cookies[settings.SESSION_COOKIE_NAME] = 'stale0000000000000000000000000000'
+        response = client.get(reverse('home_page'))
+        self.assertEqual(response.cookies[settings.SESSION_COOKIE_NAME].value, '')
+
+        # The browser no longer sends the cookie, so nothing is read again
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(reverse('home_page'))
+        self.assertEqual(session_queries(ctx.captured_queries), [])
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    CACHES=USER_CACHE_TEST_CACHES,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    SESSION_CACHE_ALIAS='sessions',
+)
+class CachedDbSessionTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        user_cache.clear_local_users()
+        self.create_fixture(departments=1)
+        self.client = Client()
+        self.client.force_login(self.doctor.user)
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('doctor_section:doctor_dash'))
+        return response, session_queries(ctx.captured_queries)
+
+    def test_dashboard_reads_session_from_cache(self):
+        # The first view copies the user's details into the session
+        self._get()
+        response, queries = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_invalidated_session_is_evicted_from_cache(self):
+        self._get()
+        invalidate_user_sessions(self.doctor.user)
+        response, _ = self._get()
+        self.assertEqual(response.status_code, 302)
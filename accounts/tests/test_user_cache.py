@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import Client, RequestFactory, TestCase, override_settings
+
+from accounts import user_cache
+from accounts.middleware import RefreshUserMiddleware
+
+
+User = get_user_model()
+
+
+USER_CACHE_TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+    "users": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "users"},
+    "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "sessions"},
+}
+
+
+@override_settings(CACHES=USER_CACHE_TEST_CACHES)
+class UserCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear_local_users()
+        self.user = User.objects.create_user(
+            username="cacheduser", email="cacheduser@example.com", password="pass", role="doctor"
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.session = self.client.session
+
+    def _request(self):
+        request = RequestFactory().get("/")
+        request.session = self.session
+        RefreshUserMiddleware(lambda r: None).process_request(request)
+        return request
+
+    def test_steady_state_needs_no_user_query(self):
+        self.assertEqual(self._request().user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            user = self._request().user
+            self.assertEqual(user.role, "doctor")
+
+    def test_requests_get_independent_copies(self):
+        self._request().user.first_name = "Changed"
+        self.assertEqual(self._request().user.first_name, "")
+
+    def test_role_change_applies_on_next_request(self):
+        self._request().user.role
+        user = User.objects.get(pk=self.user.pk)
+        user.role = "staff"
+        # Keep the session so the cached row, not a re-login, is exercised
+        with patch("accounts.signals.invalidate_user_sessions"):
+            user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._request().user.role, "staff")
+
+    def test_password_change_logs_out(self):
+        self._request().user.role
+        User.objects.filter(pk=self.user.pk).update(password="changed")
+        # A direct update bypasses the signals; the cached row still matches the session
+        self.assertTrue(self._request().user.is_authenticated)
+        user_cache.bump_user_version(self.user.pk)
+        self.assertFalse(self._request().user.is_authenticated)
+
+    def test_inactive_user_is_not_served_from_cache(self):
+        self._request().user.role
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertFalse(self._request().user.is_authenticated)
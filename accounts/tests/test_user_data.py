@@ -0,0 +1,44 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts import user_cache
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+from admin_section.tests import LogStatsFixtureMixin
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class UserDataSessionTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        user_cache.clear_local_users()
+        self.create_fixture(departments=1)
+        self.client = Client()
+        self.client.force_login(self.doctor.user)
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('doctor_section:doctor_dash'))
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in ctx.captured_queries], response
+
+    def test_logged_in_page_does_not_write_session(self):
+        # The first page view copies the user's details into the session
+        self._get()
+        queries, response = self._get()
+        session_queries = [sql for sql in queries if 'django_session' in sql]
+        self.assertEqual(len(session_queries), 1)
+        self.assertTrue(session_queries[0].startswith('SELECT'))
+        self.assertFalse([sql for sql in queries if 'FROM "accounts_customuser"' in sql and '"id" = ' in sql])
+        self.assertEqual(response.context['role'], 'doctor')
+        self.assertEqual(self.client.session['email'], 'doc@example.com')
+
+    def test_changed_user_details_are_synced(self):
+        self._get()
+        user = self.doctor.user
+        user.first_name = 'Gregory'
+        user.save()
+        queries, response = self._get()
+        self.assertEqual(response.context['full_name'], 'Gregory')
+        self.assertEqual(self.client.session['first_name'], 'Gregory')
+        self.assertTrue([sql for sql in queries if sql.startswith('UPDATE "django_session"')])
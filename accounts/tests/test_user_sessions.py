@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import UserSession
+from accounts.signals import invalidate_user_sessions
+
+
+User = get_user_model()
+
+
+class UserSessionIndexTests(TestCase):
+    def _login(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.session.session_key
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="indexed", email="indexed@example.com", password="pass")
+        self.other = User.objects.create_user(username="other", email="other@example.com", password="pass")
+        self.keys = [self._login(self.user), self._login(self.user)]
+        self.other_key = self._login(self.other)
+
+    def test_login_indexes_session(self):
+        self.assertEqual(
+            set(UserSession.objects.filter(user=self.user).values_list("session_key", flat=True)),
+            set(self.keys),
+        )
+
+    def test_logout_removes_index_row(self):
+        client = Client()
+        client.force_login(self.user)
+        key = client.session.session_key
+        client.logout()
+        self.assertFalse(UserSession.objects.filter(session_key=key).exists())
+
+    def test_invalidation_deletes_only_the_users_sessions(self):
+        with CaptureQueriesContext(connection) as ctx:
+            invalidate_user_sessions(self.user)
+        session_queries = [q["sql"] for q in ctx.captured_queries if "django_session" in q["sql"]]
+        self.assertEqual(len(session_queries), 1)
+        self.assertTrue(session_queries[0].startswith("DELETE"))
+        self.assertFalse(Session.objects.filter(session_key__in=self.keys).exists())
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+        self.assertTrue(Session.objects.filter(session_key=self.other_key).exists())
+
+    def test_role_change_logs_user_out(self):
+        self.user.role = "doctor"
+        self.user.save()
+        self.assertFalse(Session.objects.filter(session_key__in=self.keys).exists())
+        self.assertTrue(Session.objects.filter(session_key=self.other_key).exists())
+
+    def test_login_keeps_live_sessions_past_their_indexed_expiry(self):
+        # Saving a session moves its expiry past the one indexed at login
+        UserSession.objects.filter(session_key=self.keys[0]).update(expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.filter(session_key=self.keys[1]).delete()
+        new_key = self._login(self.user)
+        self.assertEqual(
+            set(UserSession.objects.filter(user=self.user).values_list("session_key", flat=True)),
+            {self.keys[0], new_key},
+        )
+        invalidate_user_sessions(self.user)
+        self.assertFalse(Session.objects.filter(session_key=self.keys[0]).exists())
@@ -0,0 +1,99 @@
+"""
+Versioned cache of authenticated user rows
+
+Every user has a version token kept in the shared ``users`` cache (a file cache
+by default, so all workers on a host see it). Loaded CustomUser rows are kept
+in process memory keyed by (pk, version). Saving a user or one of its profiles
+replaces the token, so the next request of that user reloads the row from the
+database, while every other request is served without a user query.
+"""
+import copy
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.utils.crypto import constant_time_compare
+
+from utils.conditional import bump_versions, get_versions
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'user-version:{}'
+# Number of user rows kept per process
+MAX_CACHED_USERS = 2000
+
+_rows = OrderedDict()
+_rows_lock = threading.Lock()
+
+
+def get_user_version(user_id):
+    """Return the current version token of a user, creating one if missing"""
+    version, = get_versions(VERSION_KEY.format(user_id))
+    return version
+
+
+def bump_user_version(user_id):
+    """Give a user a new version token so cached rows are reloaded (see ``bump_versions``)"""
+    bump_versions(VERSION_KEY.format(user_id))
+
+
+def clear_local_users():
+    """Drop every user row cached by this process"""
+    with _rows_lock:
+        _rows.clear()
+
+
+def _remember(key, user):
+    with _rows_lock:
+        _rows[key] = user
+        _rows.move_to_end(key)
+        while len(_rows) > MAX_CACHED_USERS:
+            _rows.popitem(last=False)
+
+
+def _cached_row(key):
+    with _rows_lock:
+        user = _rows.get(key)
+        if user is not None:
+            _rows.move_to_end(key)
+        return user
+
+
+def _session_verified(request, user):
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    return bool(session_hash) and constant_time_compare(session_hash, user.get_session_auth_hash())
+
+
+def get_user(request):
+    """
+    Return the user of ``request`` like ``django.contrib.auth.get_user``
+
+    Cached rows are used when the session's backend is still configured,
+    the account is active and the session hash matches. Anything else
+    (cache miss, changed password, rotated secret key) falls back to
+    Django's own lookup, whose result is cached for the next request.
+    """
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return auth.get_user(request)
+
+    try:
+        key = (user_id, get_user_version(user_id))
+    except Exception:
+        logger.exception('User cache unavailable')
+        return auth.get_user(request)
+
+    cached = _cached_row(key)
+    if (cached is not None and backend_path in settings.AUTHENTICATION_BACKENDS
+            and cached.is_active and _session_verified(request, cached)):
+        # Each request gets its own copy so views can modify it freely
+        return copy.copy(cached)
+
+    user = auth.get_user(request)
+    if user.is_authenticated and user.pk == user_id:
+        _remember(key, copy.copy(user))
+    return user
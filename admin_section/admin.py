@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
@@ -13,7 +14,10 @@ from .models import (
     CoreDiaProSession,
     DateRestrictionSettings,
     AdminNotification,
-    MappedAttendance
+    MappedAttendance,
+    ExportJob,
+    ImportJob,
+    OutboundEmail,
 )
 
 
@@ -197,3 +201,41 @@ class MappedAttendanceAdmin(admin.ModelAdmin):
     def get_groups_count(self, obj):
         return obj.groups.count()
     get_groups_count.short_description = 'Groups Count'
+
+
+# Admin configuration for ExportJob
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('export_name', 'user', 'status', 'progress', 'created_at', 'finished_at', 'expires_at')
+    list_filter = ('status', 'export_name')
+    search_fields = ('user__username', 'export_name', 'filename')
+    readonly_fields = ('token', 'created_at', 'started_at', 'finished_at')
+    date_hierarchy = 'created_at'
+
+
+# Admin configuration for ImportJob
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('import_name', 'user', 'status', 'processed_rows', 'total_rows', 'error_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'import_name')
+    search_fields = ('user__username', 'import_name', 'filename')
+    readonly_fields = ('token', 'upload', 'created_at', 'started_at', 'finished_at')
+    date_hierarchy = 'created_at'
+
+
+# Admin configuration for OutboundEmail
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    date_hierarchy = 'created_at'
+    actions = ['send_again']
+
+    @admin.action(description="Send the selected emails again")
+    def send_again(self, request, queryset):
+        count = queryset.exclude(status=OutboundEmail.STATUS_SENT).update(
+            status=OutboundEmail.STATUS_QUEUED, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{count} email(s) queued again.")
@@ -0,0 +1,227 @@
+"""
+Bulk import of CoreDiaProSession rows from CSV or Excel uploads
+
+Rows need ``name``, ``department`` and ``activity_type`` columns (matched
+case-insensitively); the department is looked up by name and the activity
+type by name within it. Used by the upload form of
+``core_dia_pro_session_list``, by ``core_sessions`` import jobs and by
+``CoreDiaProSessionResource``.
+
+An upload is resolved against a ``SessionIndex``: the departments it names,
+their activity types and the keys of their existing sessions are loaded with
+three queries, so checking a row costs no query and new sessions are
+inserted with ``bulk_create`` in batches.
+"""
+import csv
+import io
+from functools import reduce
+from operator import or_
+
+import tablib
+from django.db import transaction
+from django.db.models import Q
+
+from student_section.catalog import invalidate_catalog
+from utils.conditional import bump_model_versions
+from .import_jobs import ImportResult
+from .models import ActivityType, CoreDiaProSession, Department
+
+REQUIRED_COLUMNS = ['name', 'department', 'activity_type']
+BATCH_SIZE = 1000
+# Department names per lookup query
+LOOKUP_CHUNK = 200
+
+
+def normalize_row(row):
+    """Return ``row`` with lowercased keys and stripped string values"""
+    return {
+        str(key).strip().lower(): str(value).strip() if value is not None else ''
+        for key, value in row.items() if key is not None
+    }
+
+
+class SessionIndex:
+    """
+    Departments, activity types and session keys an upload refers to
+
+    Departments and activity types are matched case-insensitively, the first
+    one created winning when several share a name. Sessions are keyed by
+    ``(department id, activity type id, lowercased name)``.
+    """
+
+    def __init__(self, rows, create_activity_types=False):
+        """
+        Args:
+            rows: Normalized row dicts, see ``normalize_row``
+            create_activity_types: Create the activity types the rows name
+                that their department does not have yet, instead of
+                rejecting those rows
+        """
+        self.departments = {}
+        self.activity_types = {}
+        self.sessions = set()
+        self.created_activity_types = 0
+
+        names = sorted({row.get('department', '').lower() for row in rows} - {''})
+        for start in range(0, len(names), LOOKUP_CHUNK):
+            chunk = names[start:start + LOOKUP_CHUNK]
+            query = reduce(or_, (Q(name__iexact=name) for name in chunk))
+            for dept in Department.objects.filter(query).order_by('pk'):
+                self.departments.setdefault(dept.name.lower(), dept)
+        if not self.departments:
+            return
+        dept_ids = [dept.pk for dept in self.departments.values()]
+
+        self._load_activity_types(dept_ids)
+        if create_activity_types:
+            self._create_activity_types(rows, dept_ids)
+        self.sessions = {
+            (dept_id, activity_id, name.lower())
+            for dept_id, activity_id, name in CoreDiaProSession.objects.filter(
+                department_id__in=dept_ids
+            ).values_list('department_id', 'activity_type_id', 'name')
+        }
+
+    def _load_activity_types(self, dept_ids):
+        for activity in ActivityType.objects.filter(department_id__in=dept_ids).order_by('pk'):
+            self.activity_types.setdefault((activity.department_id, activity.name.lower()), activity)
+
+    def _create_activity_types(self, rows, dept_ids):
+        max_length = ActivityType._meta.get_field('name').max_length
+        missing = {}
+        for row in rows:
+            dept = self.departments.get(row.get('department', '').lower())
+            name = row.get('activity_type', '')
+            if dept and name and len(name) <= max_length:
+                missing.setdefault((dept.pk, name.lower()), ActivityType(name=name, department=dept))
+        for key in self.activity_types:
+            missing.pop(key, None)
+        if not missing:
+            return
+        # Another upload may add the same type meanwhile; reload to get the stored rows
+        ActivityType.objects.bulk_create(missing.values(), batch_size=BATCH_SIZE, ignore_conflicts=True)
+        self._load_activity_types(dept_ids)
+        self.created_activity_types = len(missing)
+        bump_model_versions(ActivityType)
+        invalidate_catalog()
+
+    def resolve(self, row):
+        """
+        Return an unsaved CoreDiaProSession for a normalized row
+
+        Raises:
+            ValueError: With the reason the row cannot be imported
+        """
+        name = row.get('name')
+        dept_name = row.get('department')
+        activity_name = row.get('activity_type')
+        if not name:
+            raise ValueError('missing session name')
+        if not dept_name:
+            raise ValueError('missing department')
+        if not activity_name:
+            raise ValueError('missing activity_type')
+        if len(name) > CoreDiaProSession._meta.get_field('name').max_length:
+            raise ValueError(f'session name "{name[:50]}..." is too long')
+
+        dept = self.departments.get(dept_name.lower())
+        if not dept:
+            raise ValueError(f'department "{dept_name}" not found')
+        activity = self.activity_types.get((dept.pk, activity_name.lower()))
+        if not activity:
+            raise ValueError(f'activity_type "{activity_name}" not found for department "{dept.name}"')
+        return CoreDiaProSession(name=name, department=dept, activity_type=activity)
+
+    def claim(self, session):
+        """
+        Reserve the key of ``session``
+
+        Raises:
+            ValueError: If the session exists already, or an earlier row of
+                the upload has the same key
+        """
+        key = (session.department_id, session.activity_type_id, session.name.lower())
+        if key in self.sessions:
+            raise ValueError(
+                f'session "{session.name}" already exists for department "{session.department.name}"'
+                f' and activity "{session.activity_type.name}"'
+            )
+        self.sessions.add(key)
+
+
+def read_session_rows(content, filename):
+    """
+    Return the rows of an uploaded CSV or Excel file as dicts
+
+    Raises:
+        ValueError: For other file types, empty files or missing columns
+    """
+    filename = filename.lower()
+    if filename.endswith('.csv'):
+        rows = list(csv.DictReader(io.StringIO(content.decode('utf-8-sig'))))
+    elif filename.endswith(('.xls', '.xlsx')):
+        rows = list(tablib.Dataset().load(content, format='xlsx').dict)
+    else:
+        raise ValueError('Unsupported file type. Upload a .csv, .xls, or .xlsx file.')
+
+    if not rows:
+        raise ValueError('Uploaded file contains no rows.')
+    headers = [str(h).strip().lower() for h in rows[0].keys()]
+    missing = [c for c in REQUIRED_COLUMNS if c not in headers]
+    if missing:
+        raise ValueError(
+            f'Missing required columns: {", ".join(missing)}. Expected columns: name, department, activity_type'
+        )
+    return rows
+
+
+def import_core_sessions(rows, progress=None, create_activity_types=False):
+    """
+    Create CoreDiaProSession objects from upload rows
+
+    Args:
+        rows: Row dicts, see ``read_session_rows``
+        progress: Called with the ImportResult after validation and after
+            each batch
+        create_activity_types: See ``SessionIndex``
+
+    Returns:
+        An ImportResult; rows are numbered from 1
+    """
+    result = ImportResult()
+    result.total = len(rows)
+    rows = [normalize_row(row) for row in rows]
+    index = SessionIndex(rows, create_activity_types=create_activity_types)
+
+    pending = []
+    for idx, row in enumerate(rows, start=1):
+        try:
+            session = index.resolve(row)
+            index.claim(session)
+        except ValueError as e:
+            result.add_error(idx, str(e))
+            continue
+        pending.append(session)
+    if progress:
+        progress(result)
+
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            CoreDiaProSession.objects.bulk_create(batch)
+        result.created.extend(batch)
+        if progress:
+            progress(result)
+
+    if result.created:
+        # bulk_create sends no signals
+        bump_model_versions(CoreDiaProSession)
+        invalidate_catalog()
+    return result
+
+
+def run_core_session_import(path, params, progress):
+    """Import job entry point: import the CSV or Excel file at ``path``"""
+    with open(path, 'rb') as upload:
+        content = upload.read()
+    return import_core_sessions(read_session_rows(content, path), progress=progress)
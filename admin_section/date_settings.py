@@ -0,0 +1,66 @@
+"""
+Process-wide cache of the DateRestrictionSettings singleton
+
+The settings row is read on most doctor, student and staff requests but
+changes only when an administrator edits it. Each process keeps the loaded
+row together with a version token from the shared ``users`` cache; saving or
+deleting the row replaces the token (see ``admin_section.signals``), so every
+process reloads it on its next read.
+"""
+import copy
+import logging
+import threading
+
+from utils.conditional import bump_versions, get_versions
+from .models import DateRestrictionSettings
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'date-restrictions-version'
+
+# (version, DateRestrictionSettings or None) loaded by this process
+_cached = None
+_lock = threading.Lock()
+
+
+def invalidate_date_settings():
+    """Make every process reload the settings on its next read"""
+    global _cached
+    with _lock:
+        _cached = None
+    bump_versions(VERSION_KEY)
+
+
+def get_date_settings(create=False):
+    """
+    Return the DateRestrictionSettings singleton
+
+    Args:
+        create: Create the row with its default values if there is none
+
+    Returns:
+        A copy of the cached settings, or None when no row exists and
+        ``create`` is false. Falls back to a query when the version cache
+        is unavailable.
+    """
+    global _cached
+    try:
+        version, = get_versions(VERSION_KEY)
+    except Exception:
+        logger.exception('Date restriction settings cache unavailable')
+        version = None
+
+    with _lock:
+        cached = _cached
+    if version is not None and cached is not None and cached[0] == version:
+        date_settings = cached[1]
+    else:
+        date_settings = DateRestrictionSettings.objects.first()
+        if version is not None:
+            with _lock:
+                _cached = (version, date_settings)
+
+    if date_settings is None:
+        # Creating the row invalidates the cached None through the signal
+        return DateRestrictionSettings.objects.create() if create else None
+    return copy.copy(date_settings)
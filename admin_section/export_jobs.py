@@ -0,0 +1,243 @@
+"""
+Background export jobs.
+
+Exporter views decorated with ``background_export`` can be queued by adding
+``background=1`` to their query string: an ExportJob is stored and its status
+URL returned instead of building the file inside the web worker. The
+``run_export_worker`` management command claims queued jobs, replays the
+exporter as the requesting user in a process pool and stores the response body
+under MEDIA_ROOT until the job expires.
+"""
+import os
+import re
+from importlib import import_module
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.files import File
+from django.db import connections
+from django.http import HttpRequest, JsonResponse, QueryDict
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .models import ExportJob
+
+
+BACKGROUND_PARAM = 'background'
+DEFAULT_TTL_HOURS = 24
+STALE_AFTER = timedelta(hours=1)
+
+# URL names of the exporter views that may run as jobs
+EXPORTERS = set()
+
+_FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+
+
+def export_ttl():
+    """How long finished artifacts are kept (EXPORT_JOB_TTL_HOURS setting)"""
+    return timedelta(hours=getattr(settings, 'EXPORT_JOB_TTL_HOURS', DEFAULT_TTL_HOURS))
+
+
+def background_export(url_name):
+    """
+    Allow an exporter view to be queued as an ExportJob
+
+    Args:
+        url_name: Namespaced URL name the view is routed under, used by the
+            worker to find the view again
+
+    Requests carrying ``background=1`` are queued and answered with a 202
+    JSON payload holding the job's status and download URLs; all other
+    requests run the view as before.
+    """
+    def decorator(view_func):
+        EXPORTERS.add(url_name)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.GET.get(BACKGROUND_PARAM) != '1':
+                return view_func(request, *args, **kwargs)
+
+            params = request.GET.copy()
+            params.pop(BACKGROUND_PARAM)
+            job = ExportJob.objects.create(user=request.user, export_name=url_name, params=dict(params.lists()))
+            return JsonResponse(job_payload(job), status=202)
+        return wrapper
+    return decorator
+
+
+def job_payload(job):
+    """Return the JSON status representation of an ExportJob"""
+    return {
+        'id': str(job.token),
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'filename': job.filename,
+        'status_url': job.get_status_url(),
+        'download_url': job.get_download_url() if job.status == ExportJob.STATUS_DONE else None,
+    }
+
+
+def claim_jobs(limit):
+    """
+    Mark up to ``limit`` queued jobs as running and return their ids
+
+    Each job is claimed with a conditional UPDATE, so several workers can poll
+    the same table without processing a job twice.
+    """
+    claimed = []
+    candidates = ExportJob.objects.filter(status=ExportJob.STATUS_QUEUED).order_by('created_at')
+    for job_id in candidates.values_list('id', flat=True)[:limit]:
+        updated = ExportJob.objects.filter(id=job_id, status=ExportJob.STATUS_QUEUED).update(
+            status=ExportJob.STATUS_RUNNING, started_at=timezone.now(), progress=5
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale_jobs(stale_after=STALE_AFTER):
+    """Put back jobs left running by a worker that died; returns the number requeued"""
+    return ExportJob.objects.filter(
+        status=ExportJob.STATUS_RUNNING, started_at__lt=timezone.now() - stale_after
+    ).update(status=ExportJob.STATUS_QUEUED, progress=0, started_at=None)
+
+
+def _build_request(job):
+    """Rebuild the GET request that queued ``job``, as its user"""
+    query_string = urlencode(job.params, doseq=True)
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = reverse(job.export_name)
+    request.GET = QueryDict(query_string)
+    request.META.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': request.path_info,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+    })
+    request.user = job.user
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def _response_filename(response, job):
+    match = _FILENAME_RE.search(response.get('Content-Disposition', ''))
+    if match:
+        return os.path.basename(match.group(1))
+    return f"{job.export_name.split(':')[-1]}_{job.token.hex[:8]}"
+
+
+def _response_chunks(response):
+    if response.streaming:
+        yield from response.streaming_content
+    else:
+        yield response.content
+
+
+def _set_progress(job, progress):
+    job.progress = progress
+    ExportJob.objects.filter(id=job.id).update(progress=progress)
+
+
+def run_job(job_id):
+    """
+    Run one claimed ExportJob and store its artifact
+
+    Returns:
+        The final job status
+    """
+    job = ExportJob.objects.select_related('user').get(id=job_id)
+    try:
+        # Building the request loads the URLconf, which registers the exporters
+        request = _build_request(job)
+        if job.export_name not in EXPORTERS:
+            raise ValueError(f"{job.export_name} is not a background exporter")
+
+        response = resolve(request.path_info).func(request)
+        _set_progress(job, 50)
+        if response.status_code != 200 or not response.has_header('Content-Disposition'):
+            raise ValueError(f"Exporter returned HTTP {response.status_code} without a file")
+
+        filename = _response_filename(response, job)
+        tmp_dir = os.path.join(settings.MEDIA_ROOT, 'exports', 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, job.token.hex)
+        try:
+            with open(tmp_path, 'wb') as out:
+                for chunk in _response_chunks(response):
+                    out.write(chunk)
+            response.close()
+            _set_progress(job, 90)
+            with open(tmp_path, 'rb') as artifact:
+                job.file.save(filename, File(artifact), save=False)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        job.filename = filename
+        job.content_type = response.get('Content-Type', '')
+        job.status = ExportJob.STATUS_DONE
+        job.progress = 100
+    except Exception as e:
+        job.status = ExportJob.STATUS_FAILED
+        job.error = str(e)[:1000]
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + export_ttl()
+    job.save()
+    return job.status
+
+
+def _init_worker():
+    # Children must open their own database connections
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _run_in_child(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def make_pool(workers):
+    """Return a process pool whose children are ready to run jobs"""
+    # Connections must not be shared with forked children
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+
+def run_in_pool(pool, job_ids):
+    """Run claimed jobs in ``pool`` and return their final statuses"""
+    return list(pool.map(_run_in_child, job_ids))
+
+
+def cleanup_expired_jobs(now=None):
+    """
+    Delete expired jobs and their artifacts
+
+    Returns:
+        Number of jobs deleted
+    """
+    now = now or timezone.now()
+    expired = ExportJob.objects.filter(expires_at__lt=now)
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+            try:
+                os.rmdir(os.path.join(settings.MEDIA_ROOT, 'exports', job.token.hex))
+            except OSError:
+                pass
+        job.delete()
+        count += 1
+    return count
@@ -5,6 +5,7 @@ import csv
 import io
 from accounts.models import CustomUser, Student, Doctor, Staff
 from .models import LogYear, LogYearSection, Department, Group, TrainingSite, ActivityType, CoreDiaProSession, Blog, BlogCategory, MappedAttendance
+from .import_jobs import job_max_bytes
 
 class LogYearForm(forms.ModelForm):
     class Meta:
@@ -197,6 +198,11 @@ class CSVUploadForm(forms.Form):
             'class': 'w-full px-4 py-2 rounded-lg border border-gray-300 focus:outline-none focus:ring-2 focus:ring-blue-500 dark:bg-gray-700 dark:border-gray-600 dark:text-white',
         })
     )
+    background = forms.BooleanField(
+        required=False,
+        label='Import in the background',
+        help_text='Large files are always imported in the background.',
+    )
 
     def clean_csv_file(self):
         csv_file = self.cleaned_data.get('csv_file')
@@ -205,9 +211,9 @@ class CSVUploadForm(forms.Form):
             if not csv_file.name.endswith('.csv'):
                 raise forms.ValidationError('File must be a CSV file.')
 
-            # Check file size (limit to 5MB)
-            if csv_file.size > 5 * 1024 * 1024:  # 5MB
-                raise forms.ValidationError('File size must be under 5MB.')
+            # Files over the request limit are imported as a job
+            if csv_file.size > job_max_bytes():
+                raise forms.ValidationError(f'File size must be under {job_max_bytes() // (1024 * 1024)}MB.')
 
         return csv_file
 
@@ -0,0 +1,238 @@
+"""
+Background import jobs.
+
+Large uploads to the bulk importers are stored as an ImportJob instead of
+being processed inside the web worker. The ``run_import_worker`` management
+command claims queued jobs and runs the importer registered under the job's
+``import_name``; importers report their progress counters and row errors
+while they run, so the status endpoint can be polled for a live report.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImportJob
+
+
+DEFAULT_TTL_HOURS = 72
+STALE_AFTER = timedelta(hours=1)
+# Row errors kept on a job; the error count stays exact beyond this
+MAX_STORED_ERRORS = 10000
+
+# Importer name -> dotted path of ``run(path, params, progress)``, which
+# imports the file at ``path`` and returns an ImportResult
+IMPORTERS = {
+    'users': 'admin_section.user_import.run_user_import',
+    'core_sessions': 'admin_section.core_session_import.run_core_session_import',
+}
+
+
+class ImportResult:
+    """Objects created by an import and the ``(line, message)`` of each rejected row"""
+
+    def __init__(self):
+        self.created = []
+        self.errors = []
+        self.total = 0
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    @property
+    def success_count(self):
+        return len(self.created)
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+    @property
+    def processed(self):
+        return self.success_count + self.error_count
+
+    @property
+    def error_messages(self):
+        return [f"Row {line}: {message}" for line, message in sorted(self.errors)]
+
+
+def import_ttl():
+    """How long finished jobs are kept (IMPORT_JOB_TTL_HOURS setting)"""
+    return timedelta(hours=getattr(settings, 'IMPORT_JOB_TTL_HOURS', DEFAULT_TTL_HOURS))
+
+
+def sync_max_bytes():
+    """Uploads larger than this are always imported in the background (IMPORT_SYNC_MAX_MB)"""
+    return getattr(settings, 'IMPORT_SYNC_MAX_MB', 5) * 1024 * 1024
+
+
+def job_max_bytes():
+    """Largest upload accepted for a background import (IMPORT_JOB_MAX_MB)"""
+    return getattr(settings, 'IMPORT_JOB_MAX_MB', 100) * 1024 * 1024
+
+
+def queue_import(user, import_name, upload, params=None):
+    """
+    Store ``upload`` and queue it for the importer ``import_name``
+
+    Returns:
+        The queued ImportJob
+    """
+    if import_name not in IMPORTERS:
+        raise ValueError(f"Unknown importer {import_name}")
+    job = ImportJob(user=user, import_name=import_name, params=params or {}, filename=upload.name)
+    job.upload.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def job_payload(job, errors_from=0):
+    """
+    Return the JSON status representation of an ImportJob
+
+    Args:
+        errors_from: Leave out the first row errors, which a poller has
+            already received
+    """
+    return {
+        'id': str(job.token),
+        'status': job.status,
+        'progress': job.progress,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'success_count': job.success_count,
+        'error_count': job.error_count,
+        'errors_from': errors_from,
+        'errors': job.errors[errors_from:],
+        'error': job.error,
+        'filename': job.filename,
+        'status_url': job.get_status_url(),
+    }
+
+
+def claim_jobs(limit):
+    """
+    Mark up to ``limit`` queued jobs as running and return their ids
+
+    Each job is claimed with a conditional UPDATE, so several workers can poll
+    the same table without processing a job twice.
+    """
+    claimed = []
+    candidates = ImportJob.objects.filter(status=ImportJob.STATUS_QUEUED).order_by('created_at')
+    for job_id in candidates.values_list('id', flat=True)[:limit]:
+        updated = ImportJob.objects.filter(id=job_id, status=ImportJob.STATUS_QUEUED).update(
+            status=ImportJob.STATUS_RUNNING, started_at=timezone.now()
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale_jobs(stale_after=STALE_AFTER):
+    """
+    Put back jobs left running by a worker that died; returns the number requeued
+
+    Rows the dead worker had already created are reported as duplicates
+    when the job runs again.
+    """
+    return ImportJob.objects.filter(
+        status=ImportJob.STATUS_RUNNING, started_at__lt=timezone.now() - stale_after
+    ).update(
+        status=ImportJob.STATUS_QUEUED, started_at=None, total_rows=0, processed_rows=0,
+        success_count=0, error_count=0, errors=[],
+    )
+
+
+def _delete_upload(job):
+    if not job.upload:
+        return
+    job.upload.delete(save=False)
+    try:
+        os.rmdir(job.upload.storage.path(job.token.hex))
+    except OSError:
+        pass
+
+
+def _progress_reporter(job):
+    def report(result):
+        ImportJob.objects.filter(id=job.id).update(
+            total_rows=result.total,
+            processed_rows=result.processed,
+            success_count=result.success_count,
+            error_count=result.error_count,
+            errors=result.error_messages[:MAX_STORED_ERRORS],
+        )
+    return report
+
+
+def run_job(job_id):
+    """
+    Run one claimed ImportJob and delete its upload
+
+    Returns:
+        The final job status
+    """
+    job = ImportJob.objects.get(id=job_id)
+    try:
+        importer = import_string(IMPORTERS[job.import_name])
+        result = importer(job.upload.path, job.params, _progress_reporter(job))
+        job.total_rows = result.total
+        job.processed_rows = result.processed
+        job.success_count = result.success_count
+        job.error_count = result.error_count
+        job.errors = result.error_messages[:MAX_STORED_ERRORS]
+        job.status = ImportJob.STATUS_DONE
+    except Exception as e:
+        job.refresh_from_db(fields=['total_rows', 'processed_rows', 'success_count', 'error_count', 'errors'])
+        job.status = ImportJob.STATUS_FAILED
+        job.error = str(e)[:1000]
+    _delete_upload(job)
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + import_ttl()
+    job.save()
+    return job.status
+
+
+def cleanup_expired_jobs(now=None):
+    """
+    Delete expired jobs and any upload left behind
+
+    Returns:
+        Number of jobs deleted
+    """
+    now = now or timezone.now()
+    count = 0
+    for job in ImportJob.objects.filter(expires_at__lt=now).iterator():
+        _delete_upload(job)
+        job.delete()
+        count += 1
+    return count
+
+
+def requested_job(request):
+    """Return the user's ImportJob named by the ``import_job`` query parameter, if any"""
+    token = request.GET.get('import_job')
+    if not token:
+        return None
+    try:
+        return ImportJob.objects.filter(token=token, user=request.user).first()
+    except ValidationError:
+        return None
+
+
+def queued_response(request, job, url_name):
+    """
+    Answer the upload that queued ``job``
+
+    Script uploads get the job's JSON status with 202; form posts are sent
+    back to ``url_name``, which shows the job's progress.
+    """
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse(job_payload(job), status=202)
+    return redirect(f"{reverse(url_name)}?import_job={job.token}")
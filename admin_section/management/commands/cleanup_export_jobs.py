@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from admin_section.export_jobs import cleanup_expired_jobs
+
+
+class Command(BaseCommand):
+    help = 'Delete expired export jobs and their files under MEDIA_ROOT'
+
+    def handle(self, *args, **options):
+        removed = cleanup_expired_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired export jobs'))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_section.outbox import BACKENDS, batch_size, cleanup_outbox, drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send the queued outbound emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when no email is due')
+        parser.add_argument('--cleanup-interval', type=float, default=3600.0, help='Seconds between outbox cleanups')
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails sent over one connection')
+        parser.add_argument(
+            '--backend',
+            help=f"Email backend ({', '.join(BACKENDS)} or a dotted path); defaults to EMAIL_OUTBOX_BACKEND",
+        )
+        parser.add_argument('--once', action='store_true', help='Send the due emails once and exit')
+
+    def handle(self, *args, **options):
+        limit = options['batch_size'] or batch_size()
+        if options['once']:
+            sent, failed = drain_outbox(options['backend'], limit)
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Email worker started'))
+        last_cleanup = 0.0
+        while True:
+            if time.monotonic() - last_cleanup >= options['cleanup_interval']:
+                removed = cleanup_outbox()
+                if removed:
+                    self.stdout.write(f'Removed {removed} old outbound emails')
+                last_cleanup = time.monotonic()
+
+            sent, failed = drain_outbox(options['backend'], limit)
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed')
+            else:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_section.export_jobs import (
+    claim_jobs, cleanup_expired_jobs, make_pool, requeue_stale_jobs, run_in_pool, run_job
+)
+
+
+class Command(BaseCommand):
+    help = 'Process queued export jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--cleanup-interval', type=float, default=600.0, help='Seconds between expired job cleanups')
+        parser.add_argument('--once', action='store_true', help='Process the queued jobs once and exit')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+
+        if options['once']:
+            # Run in-process so a single pass needs no pool
+            statuses = [run_job(job_id) for job_id in claim_jobs(limit=1000)]
+            self.stdout.write(self.style.SUCCESS(f'Processed {len(statuses)} export jobs'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Export worker started with {workers} processes'))
+        last_cleanup = 0.0
+        with make_pool(workers) as pool:
+            while True:
+                if time.monotonic() - last_cleanup >= options['cleanup_interval']:
+                    removed = cleanup_expired_jobs()
+                    if removed:
+                        self.stdout.write(f'Removed {removed} expired export jobs')
+                    last_cleanup = time.monotonic()
+
+                job_ids = claim_jobs(limit=workers)
+                if not job_ids:
+                    time.sleep(options['poll_interval'])
+                    continue
+                for job_id, status in zip(job_ids, run_in_pool(pool, job_ids)):
+                    self.stdout.write(f'Export job {job_id}: {status}')
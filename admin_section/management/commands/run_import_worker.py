@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_section.import_jobs import claim_jobs, cleanup_expired_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued import jobs one at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--cleanup-interval', type=float, default=600.0, help='Seconds between expired job cleanups')
+        parser.add_argument('--once', action='store_true', help='Process the queued jobs once and exit')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+
+        if options['once']:
+            statuses = [run_job(job_id) for job_id in claim_jobs(limit=1000)]
+            self.stdout.write(self.style.SUCCESS(f'Processed {len(statuses)} import jobs'))
+            return
+
+        # Importers parallelise their own slow parts (password hashing), so
+        # jobs run one after the other
+        self.stdout.write(self.style.SUCCESS('Import worker started'))
+        last_cleanup = 0.0
+        while True:
+            if time.monotonic() - last_cleanup >= options['cleanup_interval']:
+                removed = cleanup_expired_jobs()
+                if removed:
+                    self.stdout.write(f'Removed {removed} expired import jobs')
+                last_cleanup = time.monotonic()
+
+            job_ids = claim_jobs(limit=1)
+            if not job_ids:
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'Import job {job_ids[0]}: {run_job(job_ids[0])}')
@@ -1,3 +1,8 @@
+import os
+import uuid
+from functools import lru_cache
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_save
@@ -88,6 +93,12 @@ class CoreDiaProSession(models.Model):
         verbose_name_plural = "Core Diagnosis Procedure Sessions"
 
 
+@lru_cache(maxsize=64)
+def parse_weekdays(value):
+    """Parse a comma-separated weekday list such as '0,1,2' into a frozenset"""
+    return frozenset(int(day) for day in value.split(',') if day.strip())
+
+
 # Date Restriction Settings Model
 class DateRestrictionSettings(models.Model):
     # Original fields (for backward compatibility)
@@ -199,12 +210,21 @@ class DateRestrictionSettings(models.Model):
         help_text="Whether doctors can track student attendance"
     )
 
+    # Allowed days as sets of weekday numbers, for membership checks
+    @property
+    def student_allowed_days(self):
+        return parse_weekdays(self.allowed_days_for_students)
+
+    @property
+    def doctor_allowed_days(self):
+        return parse_weekdays(self.allowed_days_for_doctors)
+
     # Helper methods for getting allowed days as lists
     def get_allowed_days_for_students(self):
-        return [int(day) for day in self.allowed_days_for_students.split(',') if day.strip()]
+        return sorted(self.student_allowed_days)
 
     def get_allowed_days_for_doctors(self):
-        return [int(day) for day in self.allowed_days_for_doctors.split(',') if day.strip()]
+        return sorted(self.doctor_allowed_days)
 
 # Admin Notification Model
 class AdminNotification(models.Model):
@@ -348,3 +368,196 @@ class MappedAttendance(models.Model):
         """Get total count of students in mapped groups"""
         from accounts.models import Student
         return Student.objects.filter(group__in=self.groups.all()).count()
+
+
+def export_job_upload_to(instance, filename):
+    """Store artifacts under an unguessable path since MEDIA_ROOT is served publicly"""
+    return f"exports/{instance.token.hex}/{filename}"
+
+
+# Export Job Model
+class ExportJob(models.Model):
+    """A queued run of an exporter view, processed by the run_export_worker command.
+
+    The worker replays the exporter with the stored GET parameters as the
+    requesting user and saves the response body under MEDIA_ROOT. Artifacts are
+    deleted by cleanup_export_jobs once ``expires_at`` has passed.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='export_jobs')
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    export_name = models.CharField(max_length=100, help_text="URL name of the exporter view")
+    params = models.JSONField(default=dict, blank=True, help_text="GET parameters passed to the exporter")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    file = models.FileField(upload_to=export_job_upload_to, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_created_idx'),
+            models.Index(fields=['expires_at'], name='exportjob_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.export_name} for {self.user.username} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def get_status_url(self):
+        return reverse('admin_section:export_job_status', args=[self.token])
+
+    def get_download_url(self):
+        return reverse('admin_section:export_job_download', args=[self.token])
+
+
+class ImportJobStorage(FileSystemStorage):
+    """Uploads hold passwords, so they are kept in IMPORT_JOB_ROOT, outside the public MEDIA_ROOT"""
+
+    @property
+    def base_location(self):
+        return settings.IMPORT_JOB_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def import_job_storage():
+    return ImportJobStorage()
+
+
+def import_job_upload_to(instance, filename):
+    return f"{instance.token.hex}/{filename}"
+
+
+# Import Job Model
+class ImportJob(models.Model):
+    """A stored upload imported by the run_import_worker command.
+
+    The worker runs the importer named by ``import_name`` on the upload and
+    records its progress counters and row errors as it goes; the upload is
+    deleted once the job finishes. Finished jobs are deleted by the worker
+    once ``expires_at`` has passed.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='import_jobs')
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    import_name = models.CharField(max_length=50, help_text="Name of the importer, see admin_section.import_jobs")
+    params = models.JSONField(default=dict, blank=True, help_text="Options passed to the importer")
+    upload = models.FileField(upload_to=import_job_upload_to, storage=import_job_storage, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Messages of the rejected rows")
+    error = models.TextField(blank=True, help_text="Why the whole job failed")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='importjob_status_created_idx'),
+            models.Index(fields=['expires_at'], name='importjob_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.import_name} for {self.user.username} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @property
+    def progress(self):
+        """Percentage of the rows processed so far"""
+        if self.status == self.STATUS_DONE:
+            return 100
+        return int(100 * self.processed_rows / self.total_rows) if self.total_rows else 0
+
+    def get_status_url(self):
+        return reverse('admin_section:import_job_status', args=[self.token])
+
+
+# Outbound Email Model
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox, sent by the run_email_worker command.
+
+    Views queue mail with ``admin_section.outbox.queue_email`` inside their
+    transaction, so a message is stored if and only if the change it reports
+    is. The worker sends due messages in batches and reschedules failed ones
+    with exponential backoff (see ``admin_section.outbox``).
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    recipients = models.JSONField(default=list, help_text="Addresses the message is sent to")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True, help_text="Defaults to EMAIL_HOST_USER")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, help_text="When a queued message is due, or when a claim on it lapses"
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+            models.Index(fields=['created_at'], name='outbox_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
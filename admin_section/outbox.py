@@ -0,0 +1,217 @@
+"""
+Persistent outbound email queue
+
+Views call ``queue_email`` instead of sending mail from a thread of the web
+worker: the message is stored as an OutboundEmail in the caller's
+transaction and sent later by the ``run_email_worker`` management command.
+The worker claims due messages in batches, sends each batch over one
+connection of EMAIL_OUTBOX_BACKEND and reschedules the messages that failed
+with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Any Django email backend can drain the outbox; ``--backend console`` or
+``--backend file`` (writing to EMAIL_FILE_PATH) show the mail locally
+without an SMTP server.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Short names accepted by run_email_worker --backend
+BACKENDS = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+    'locmem': 'django.core.mail.backends.locmem.EmailBackend',
+}
+# A claimed message not marked sent or failed within this time is claimed again
+CLAIM_TIMEOUT = timedelta(minutes=10)
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def batch_size():
+    """Messages sent over one connection (EMAIL_OUTBOX_BATCH_SIZE setting)"""
+    return _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+
+
+def max_attempts():
+    """Sends tried before a message is marked failed (EMAIL_OUTBOX_MAX_ATTEMPTS setting)"""
+    return _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def retry_delay(attempts):
+    """Wait before the next try of a message that failed ``attempts`` times"""
+    delay = timedelta(seconds=_setting('EMAIL_OUTBOX_RETRY_SECONDS', 60) * 2 ** (attempts - 1))
+    return min(delay, MAX_RETRY_DELAY)
+
+
+def queue_emails(emails, from_email=''):
+    """
+    Store emails in the outbox
+
+    Args:
+        emails: ``(recipients, subject, body)`` tuples; messages without a
+            recipient address are left out
+        from_email: Sender of every message, EMAIL_HOST_USER when blank
+
+    Returns:
+        Number of messages queued
+    """
+    subject_length = OutboundEmail._meta.get_field('subject').max_length
+    objs = []
+    for recipients, subject, body in emails:
+        recipients = [address for address in recipients if address]
+        if recipients:
+            objs.append(OutboundEmail(
+                recipients=recipients, subject=subject[:subject_length], body=body, from_email=from_email or ''
+            ))
+    OutboundEmail.objects.bulk_create(objs)
+    return len(objs)
+
+
+def queue_email(recipients, subject, body, from_email=''):
+    """Store one message to ``recipients`` in the outbox; see ``queue_emails``"""
+    return queue_emails([(recipients, subject, body)], from_email=from_email)
+
+
+def claim_batch(limit):
+    """
+    Mark up to ``limit`` due messages as sending and return them
+
+    Rows locked by another worker are skipped, so several workers can drain
+    the same outbox. Messages whose claim lapsed (the worker sending them
+    died) are due again.
+    """
+    now = timezone.now()
+    due = (
+        OutboundEmail.objects.filter(
+            status__in=[OutboundEmail.STATUS_QUEUED, OutboundEmail.STATUS_SENDING], next_attempt_at__lte=now
+        )
+        .order_by('next_attempt_at', 'id')
+    )
+    with transaction.atomic():
+        emails = list(due.select_for_update(skip_locked=True)[:limit])
+        OutboundEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            status=OutboundEmail.STATUS_SENDING, next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return emails
+
+
+def get_outbox_connection(backend=None):
+    """
+    Return a connection of ``backend`` (a BACKENDS name or dotted path)
+
+    Defaults to the EMAIL_OUTBOX_BACKEND setting, then EMAIL_BACKEND.
+    """
+    backend = backend or _setting('EMAIL_OUTBOX_BACKEND', None) or settings.EMAIL_BACKEND
+    return get_connection(BACKENDS.get(backend, backend))
+
+
+def _message(email, connection):
+    return EmailMessage(
+        email.subject, email.body, email.from_email or settings.EMAIL_HOST_USER or None,
+        email.recipients, connection=connection,
+    )
+
+
+def _failed(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts():
+        email.status = OutboundEmail.STATUS_FAILED
+        logger.error('Giving up on email %s to %s: %s', email.id, email.recipients, error)
+    else:
+        email.status = OutboundEmail.STATUS_QUEUED
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def send_batch(emails, connection):
+    """
+    Send claimed messages over one open connection
+
+    Each message is passed to ``send_messages`` on its own, so one rejected
+    address does not fail the others; failures are rescheduled.
+
+    Returns:
+        ``(sent, failed)`` counts
+    """
+    now = timezone.now()
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning('Could not open the email connection: %s', e)
+        for email in emails:
+            _failed(email, e, now)
+        failed = emails
+    else:
+        try:
+            for email in emails:
+                try:
+                    if connection.send_messages([_message(email, connection)]) != 1:
+                        raise RuntimeError('The backend did not send the message')
+                except Exception as e:
+                    _failed(email, e, now)
+                    failed.append(email)
+                else:
+                    sent.append(email.id)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception('Error closing the email connection')
+
+    if sent:
+        OutboundEmail.objects.filter(id__in=sent).update(
+            status=OutboundEmail.STATUS_SENT, sent_at=timezone.now(), attempts=F('attempts') + 1, last_error=''
+        )
+    if failed:
+        OutboundEmail.objects.bulk_update(failed, ['status', 'attempts', 'last_error', 'next_attempt_at'])
+    return len(sent), len(failed)
+
+
+def drain_outbox(backend=None, limit=None):
+    """
+    Send every due message, one batch per connection
+
+    Messages rescheduled during the run are not retried by it.
+
+    Returns:
+        ``(sent, failed)`` counts
+    """
+    limit = limit or batch_size()
+    total_sent = total_failed = 0
+    while True:
+        emails = claim_batch(limit)
+        if not emails:
+            return total_sent, total_failed
+        sent, failed = send_batch(emails, get_outbox_connection(backend))
+        total_sent += sent
+        total_failed += failed
+
+
+def cleanup_outbox(now=None):
+    """
+    Delete sent and failed messages older than EMAIL_OUTBOX_KEEP_DAYS
+
+    Returns:
+        Number of messages deleted
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=_setting('EMAIL_OUTBOX_KEEP_DAYS', 14))
+    deleted, _ = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_FAILED], created_at__lt=cutoff
+    ).delete()
+    return deleted
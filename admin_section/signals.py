@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import LogYearSection, Department, Group,TrainingSite
+from .date_settings import invalidate_date_settings
+from .models import LogYearSection, Department, Group,TrainingSite, DateRestrictionSettings
 
 # Define the departments for each year section
 YEAR_5_DEPARTMENTS = [
@@ -48,4 +49,11 @@ def create_departments_and_groups_for_year_section(sender, instance, created, **
                 group_name=group_name,
                 log_year=instance.year_name,
                 log_year_section=instance
-            )
\ No newline at end of file
+            )
+
+
+@receiver(post_save, sender=DateRestrictionSettings)
+@receiver(post_delete, sender=DateRestrictionSettings)
+def forget_date_settings(sender, **kwargs):
+    """Reload the cached date restriction settings in every process."""
+    invalidate_date_settings()
@@ -1,3 +1,747 @@
-from django.test import TestCase
+import json
+from datetime import date
+from smtplib import SMTPException
+from unittest.mock import patch
 
-# Create your tests here.
+import tablib
+from django.core.mail.backends import locmem
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser, Student, Doctor
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+from admin_section import core_session_import
+from admin_section.date_settings import get_date_settings, invalidate_date_settings
+from admin_section.export_jobs import claim_jobs, run_job, cleanup_expired_jobs
+from admin_section.models import (
+    LogYear, LogYearSection, Department, Group, TrainingSite, ActivityType, CoreDiaProSession, ExportJob,
+    DateRestrictionSettings,
+)
+from admin_section.views_file.resources import CoreDiaProSessionResource
+from student_section.models import StudentLogFormModel
+from utils.log_stats import summarize_logs, group_status_counts
+
+
+def make_log(student, department, tutor, reviewed=False, comments='', **extra):
+    """Create a StudentLogFormModel with the minimum related rows"""
+    activity_type, _ = ActivityType.objects.get_or_create(name='Procedure', department=department)
+    core, _ = CoreDiaProSession.objects.get_or_create(
+        name='Core', activity_type=activity_type, department=department
+    )
+    site = TrainingSite.objects.first() or TrainingSite.objects.create(
+        name='Main Hospital', log_year=department.log_year
+    )
+    fields = dict(
+        student=student,
+        date=extra.pop('date', date(2025, 1, 15)),
+        log_year=department.log_year,
+        log_year_section=department.log_year_section,
+        group=student.group,
+        department=department,
+        tutor=tutor,
+        training_site=site,
+        activity_type=activity_type,
+        core_diagnosis=core,
+        participation_type='Observed',
+        is_reviewed=reviewed,
+        reviewer_comments=comments,
+    )
+    fields.update(extra)
+    return StudentLogFormModel.objects.create(**fields)
+
+
+class LogStatsFixtureMixin:
+    def create_fixture(self, departments=2):
+        self.year = LogYear.objects.create(year_name='2025')
+        self.section = LogYearSection.objects.create(year_section_name='Test Section', year_name=self.year)
+        self.group = Group.objects.create(group_name='G1', log_year=self.year, log_year_section=self.section)
+
+        student_user = CustomUser.objects.create_user(
+            username='stud', email='stud@example.com', password='pass', role='student'
+        )
+        self.student = Student.objects.get(user=student_user)
+        self.student.group = self.group
+        self.student.save()
+
+        doctor_user = CustomUser.objects.create_user(
+            username='doc', email='doc@example.com', password='pass', role='doctor'
+        )
+        self.doctor = Doctor.objects.get(user=doctor_user)
+
+        self.departments = []
+        for index in range(departments):
+            dept = Department.objects.create(name=f'Dept {index}', log_year=self.year, log_year_section=self.section)
+            self.doctor.departments.add(dept)
+            make_log(self.student, dept, self.doctor)
+            make_log(self.student, dept, self.doctor, reviewed=True, comments='Good work')
+            make_log(self.student, dept, self.doctor, reviewed=True, comments='REJECTED: incomplete')
+            self.departments.append(dept)
+
+
+class LogStatsTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture()
+
+    def test_summarize_logs(self):
+        summary = summarize_logs(StudentLogFormModel.objects.all())
+        self.assertEqual(summary, {'total': 6, 'reviewed': 4, 'pending': 2, 'approved': 2, 'rejected': 2})
+
+    def test_group_status_counts_by_department(self):
+        counts = group_status_counts(StudentLogFormModel.objects.all(), 'department_id')
+        self.assertEqual(set(counts), {dept.id for dept in self.departments})
+        for dept in self.departments:
+            self.assertEqual(counts[dept.id]['approved'], 1)
+            self.assertEqual(counts[dept.id]['rejected'], 1)
+            self.assertEqual(counts[dept.id]['pending'], 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DepartmentReportTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='admin'
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def _query_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin_section:department_report'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_department_stats(self):
+        self.create_fixture(departments=2)
+        _, response = self._query_count()
+        stats = {stat['department'].id: stat for stat in response.context['department_stats']}
+        for dept in self.departments:
+            self.assertEqual(stats[dept.id]['total_logs'], 3)
+            self.assertEqual(stats[dept.id]['approved_logs'], 1)
+            self.assertEqual(stats[dept.id]['rejected_logs'], 1)
+            self.assertEqual(stats[dept.id]['doctors_count'], 1)
+            self.assertEqual(stats[dept.id]['students_count'], 1)
+        self.assertEqual(response.context['total_logs'], 6)
+        self.assertEqual(
+            json.loads(response.context['approval_status_data']),
+            {'approved': 2, 'pending': 2, 'rejected': 2}
+        )
+
+    def test_query_count_independent_of_department_count(self):
+        self.create_fixture(departments=1)
+        # The first request loads the user into the user cache
+        self._query_count()
+        small, _ = self._query_count()
+        for index in range(1, 5):
+            dept = Department.objects.create(name=f'Extra {index}', log_year=self.year, log_year_section=self.section)
+            make_log(self.student, dept, self.doctor)
+        large, _ = self._query_count()
+        self.assertEqual(small, large)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CsvExportTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=2)
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='admin'
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def _rows(self, response):
+        import csv
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(content.splitlines()))
+
+    def test_department_logs_csv(self):
+        response = self.client.get(reverse('admin_section:export_department_logs'), {'format': 'csv'})
+        rows = self._rows(response)
+        header = rows.index([
+            'Student ID', 'Student Name', 'Email', 'Group', 'Department',
+            'Activity Type', 'Core Diagnosis', 'Date', 'Status', 'Tutor',
+            'Review Date', 'Reviewer Comments', 'Created At'
+        ])
+        data = rows[header + 1:]
+        self.assertEqual(len(data), 6)
+        self.assertEqual(sorted(row[8] for row in data), ['Approved'] * 2 + ['Pending'] * 2 + ['Rejected'] * 2)
+        self.assertIn(['Rejected Logs:', '2'], rows)
+        self.assertEqual(data[0][2], 'stud@example.com')
+        self.assertEqual(data[0][3], 'G1')
+
+    def test_export_users_csv(self):
+        rows = self._rows(self.client.get(reverse('admin_section:export_users'), {'type': 'all'}))
+        by_username = {row[0]: row for row in rows[1:]}
+        self.assertEqual(set(by_username), {'stud', 'doc', 'admin'})
+        self.assertEqual(by_username['doc'][7], 'Dept 0, Dept 1')
+        self.assertEqual(by_username['stud'][8], 'G1')
+        self.assertEqual(by_username['admin'][5], 'N/A')
+
+    def _workbook(self, response):
+        from io import BytesIO
+        from openpyxl import load_workbook
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        return load_workbook(BytesIO(b''.join(response.streaming_content)))
+
+    def test_department_logs_excel(self):
+        wb = self._workbook(self.client.get(reverse('admin_section:export_department_logs'), {'format': 'excel'}))
+        rows = [list(row) for row in wb.active.iter_rows(values_only=True)]
+        header = next(index for index, row in enumerate(rows) if row[0] == 'Student ID')
+        data = rows[header + 1:]
+        self.assertEqual(len(data), 6)
+        self.assertEqual(sorted(row[8] for row in data), ['Approved'] * 2 + ['Pending'] * 2 + ['Rejected'] * 2)
+        self.assertIn(['Rejected Logs:', 2] + [None] * 11, rows)
+        self.assertEqual(wb.active.column_dimensions['C'].width, len('stud@example.com') + 2)
+
+    def test_department_report_excel(self):
+        wb = self._workbook(self.client.get(reverse('admin_section:department_report_export'), {'format': 'excel'}))
+        ws = wb.active
+        self.assertEqual(ws['A1'].value, 'Department Report')
+        self.assertEqual(ws['A3'].value, 'Department')
+        self.assertEqual(len(ws._charts), 1)
+
+    def test_department_logs_pdf(self):
+        response = self.client.get(reverse('admin_section:export_department_logs'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+
+class PdfTableTests(SimpleTestCase):
+    def test_rows_are_read_while_building(self):
+        from io import BytesIO
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+        from utils.pdf_utils import LazyFlowables, add_table, get_common_styles
+
+        consumed = []
+
+        def rows():
+            for index in range(45):
+                consumed.append(index)
+                yield [index, f'row {index}']
+
+        elements = LazyFlowables()
+        self.assertTrue(add_table(elements, ['#', 'Name'], rows(), chunk_size=20))
+        elements.append(Paragraph('Footer', get_common_styles()['small']))
+        # Only the first row is peeked to detect an empty table
+        self.assertEqual(consumed, [0])
+
+        built = []
+        doc = SimpleDocTemplate(BytesIO())
+        doc.afterFlowable = built.append
+        doc.build(elements)
+        self.assertEqual(len(consumed), 45)
+        tables = [flowable for flowable in built if isinstance(flowable, Table)]
+        # Every chunk (and every page split of a chunk) repeats the header row
+        self.assertTrue(all(table._cellvalues[0] == ['#', 'Name'] for table in tables))
+        self.assertEqual(sum(len(table._cellvalues) - 1 for table in tables), 45)
+        self.assertIsInstance(built[-1], Paragraph)
+
+    def test_empty_rows_add_nothing(self):
+        from utils.pdf_utils import add_table
+
+        elements = []
+        self.assertFalse(add_table(elements, ['#'], iter([])))
+        self.assertEqual(elements, [])
+
+
+class PdfHeaderCacheTests(SimpleTestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from PIL import Image
+        from utils.pdf_utils import clear_pdf_caches
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(clear_pdf_caches)
+        self.logo_path = f'{self.media_root}/agulogo.png'
+        Image.new('RGB', (600, 600), 'red').save(self.logo_path)
+
+    def test_logo_is_scaled_and_decoded_once(self):
+        from utils.pdf_utils import get_logo, LOGO_DPI
+
+        logo = get_logo(self.logo_path)
+        self.assertIs(get_logo(self.logo_path), logo)
+        self.assertEqual(logo.getSize(), (int(1.5 * LOGO_DPI), int(1.5 * LOGO_DPI)))
+        # Pixel data is decoded when loaded and reused by every document
+        self.assertIs(logo.getRGBData(), logo.getRGBData())
+
+    def test_logo_reloaded_when_file_changes(self):
+        import os
+        from PIL import Image
+        from utils.pdf_utils import get_logo
+
+        logo = get_logo(self.logo_path)
+        Image.new('RGB', (100, 50), 'blue').save(self.logo_path)
+        stat = os.stat(self.logo_path)
+        os.utime(self.logo_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded = get_logo(self.logo_path)
+        self.assertIsNot(reloaded, logo)
+        self.assertEqual(reloaded.getSize(), (100, 50))
+
+        os.remove(self.logo_path)
+        self.assertIsNone(get_logo(self.logo_path))
+
+    def test_header_uses_cached_styles_and_logo(self):
+        from io import BytesIO
+        from reportlab import rl_config
+        from reportlab.platypus import SimpleDocTemplate
+        from utils import pdf_utils
+        from utils.pdf_utils import CachedImage, add_agu_header, add_footer_info, build_pdf, get_common_styles
+
+        with self.settings(MEDIA_ROOT=self.media_root):
+            first = add_agu_header([], 'Report')
+            with patch.object(pdf_utils, '_load_logo', side_effect=AssertionError('decoded twice')):
+                second = add_agu_header([], 'Report')
+            self.assertIs(first[2].style, second[2].style)
+            self.assertIsInstance(first[0], CachedImage)
+            self.assertIs(first[0].reader, second[0].reader)
+            self.assertEqual(first[0].drawWidth, pdf_utils.LOGO_SIZE)
+            self.assertIs(get_common_styles()['small'], add_footer_info([], 'Admin')[1].style)
+
+            # Binary streams only while the helpers build a document
+            use_a85 = rl_config.useA85
+            seen = []
+            doc = SimpleDocTemplate(BytesIO())
+            build_pdf(doc, first + second, onFirstPage=lambda canvas, doc: seen.append(rl_config.useA85))
+            self.assertEqual(seen, [0])
+            self.assertEqual(rl_config.useA85, use_a85)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ExportJobTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.create_fixture(departments=1)
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='admin'
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def _queue(self):
+        response = self.client.get(
+            reverse('admin_section:export_department_logs'), {'format': 'csv', 'background': '1'}
+        )
+        self.assertEqual(response.status_code, 202)
+        return ExportJob.objects.get(token=response.json()['id'])
+
+    def test_queue_run_and_download(self):
+        job = self._queue()
+        self.assertEqual(job.status, ExportJob.STATUS_QUEUED)
+        self.assertEqual(job.params, {'format': ['csv']})
+
+        self.assertEqual(claim_jobs(limit=5), [job.id])
+        self.assertEqual(run_job(job.id), ExportJob.STATUS_DONE)
+
+        status = self.client.get(job.get_status_url()).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['progress'], 100)
+        self.assertTrue(status['filename'].endswith('.csv'))
+
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Rejected Logs:,1', content)
+
+    def test_job_request_replays_the_filters(self):
+        from admin_section.export_jobs import _build_request
+        job = ExportJob.objects.create(
+            user=self.admin, export_name='admin_section:export_department_logs',
+            params={'format': ['csv'], 'years': ['1', '2']},
+        )
+        request = _build_request(job)
+        self.assertEqual(request.GET.getlist('years'), ['1', '2'])
+        self.assertEqual(
+            request.get_full_path(), reverse('admin_section:export_department_logs') + '?format=csv&years=1&years=2'
+        )
+        self.assertEqual(request.user, self.admin)
+
+    def test_other_users_cannot_see_job(self):
+        job = self._queue()
+        self.client.force_login(self.student.user)
+        self.assertEqual(self.client.get(job.get_status_url()).status_code, 404)
+
+    def test_failed_export_is_reported(self):
+        job = self._queue()
+        self.admin.role = 'student'
+        self.admin.save()
+        self.assertEqual(run_job(job.id), ExportJob.STATUS_FAILED)
+        self.assertIn('HTTP 302', ExportJob.objects.get(id=job.id).error)
+
+    def test_cleanup_removes_expired_artifacts(self):
+        import os
+        from datetime import timedelta
+        from django.utils import timezone
+
+        job = self._queue()
+        claim_jobs(limit=1)
+        run_job(job.id)
+        job.refresh_from_db()
+        path = job.file.path
+        self.assertTrue(os.path.exists(path))
+
+        self.assertEqual(cleanup_expired_jobs(), 0)
+        self.assertEqual(cleanup_expired_jobs(now=timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ExportJob.objects.exists())
+
+
+@override_settings(CACHES=USER_CACHE_TEST_CACHES)
+class DateSettingsCacheTests(TestCase):
+    def setUp(self):
+        invalidate_date_settings()
+
+    def test_settings_are_read_once(self):
+        DateRestrictionSettings.objects.create(past_days_limit=5)
+        self.assertEqual(get_date_settings().past_days_limit, 5)
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                self.assertEqual(get_date_settings().past_days_limit, 5)
+        self.assertEqual(ctx.captured_queries, [])
+
+    def test_save_invalidates_cached_settings(self):
+        date_settings = DateRestrictionSettings.objects.create()
+        get_date_settings()
+        date_settings.allowed_days_for_doctors = '0,2,4'
+        date_settings.save()
+        cached = get_date_settings()
+        self.assertEqual(cached.doctor_allowed_days, frozenset({0, 2, 4}))
+        self.assertEqual(cached.get_allowed_days_for_doctors(), [0, 2, 4])
+
+        date_settings.delete()
+        self.assertIsNone(get_date_settings())
+
+    def test_create_missing_settings(self):
+        self.assertIsNone(get_date_settings())
+        created = get_date_settings(create=True)
+        self.assertEqual(created.student_allowed_days, frozenset(range(7)))
+        self.assertEqual(get_date_settings().pk, created.pk)
+
+
+def users_csv(rows, header='username,email,password,first_name,last_name,role,student_id,group,city,country,phone_no,'
+                           'profile_photo,bio,speciality'):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    content = '\n'.join([header] + rows) + '\n'
+    return SimpleUploadedFile('users.csv', content.encode(), content_type='text/csv')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class UserImportTests(TestCase):
+    def setUp(self):
+        self.year = LogYear.objects.create(year_name='2025')
+        self.group = Group.objects.create(group_name='B1', log_year=self.year)
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='admin'
+        )
+        CustomUser.objects.create_user(username='taken', email='taken@example.com', password='pass', role='doctor')
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_rows_are_validated_before_anything_is_written(self):
+        rows = [
+            'stud1,s1@example.com,pw,Sam,One,student,S-1,B1,City,Country,1,,,',
+            'stud2,s2@example.com,pw,Sue,Two,student,S-2,missing,City,Country,2,,,',
+            'taken,new@example.com,pw,Tom,Three,student,S-3,B1,City,Country,3,,,',
+            'stud4,s1@example.com,pw,Tim,Four,student,S-4,B1,City,Country,4,,,',
+            'stud5,s5@example.com,pw,Ann,Five,student,S-1,B1,City,Country,5,,,',
+            'doc1,d1@example.com,pw,Dan,Six,doctor,,,City,Country,6,,,',
+            'bad,not-an-email,pw,Bo,Seven,staff,,,City,Country,7,,,',
+            'nobody,n@example.com,pw,No,Role,pilot,,,City,Country,8,,,',
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('admin_section:bulk_add_users'), {'csv_file': users_csv(rows)})
+        self.assertEqual(response.status_code, 200)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "accounts_')]
+        self.assertEqual(len(inserts), 3)  # users, students, doctors
+
+        results = response.context['results']
+        self.assertEqual((results['success_count'], results['error_count']), (3, 5))
+        self.assertEqual(results['error_messages'], [
+            "Row 4: Username 'taken' already exists",
+            "Row 5: Email 's1@example.com' already exists",
+            "Row 6: Student ID 'S-1' already exists",
+            "Row 8: Invalid email 'not-an-email'",
+            "Row 9: Invalid role: pilot",
+        ])
+
+        student = Student.objects.select_related('user', 'group').get(student_id='S-1')
+        self.assertEqual(student.group, self.group)
+        self.assertTrue(student.user.check_password('pw'))
+        self.assertIsNone(Student.objects.get(student_id='S-2').group)
+        self.assertTrue(Doctor.objects.filter(user__username='doc1').exists())
+
+    def test_bulk_add_users_matches_group_ids_before_names(self):
+        from admin_section.user_import import import_users
+        named_like_id = Group.objects.create(group_name=str(self.group.id), log_year=self.year)
+        rows = [
+            f'stud1,s1@example.com,pw,Sam,One,student,S-1,{self.group.id},City,Country,1,,,',
+            'stud2,s2@example.com,pw,Sue,Two,student,S-2,B1,City,Country,2,,,',
+        ]
+        self.client.post(reverse('admin_section:bulk_add_users'), {'csv_file': users_csv(rows)})
+        self.assertEqual(Student.objects.get(student_id='S-1').group, self.group)
+        self.assertEqual(Student.objects.get(student_id='S-2').group, self.group)
+
+        # Other imports try group names first
+        import_users([(2, {
+            'username': 'stud3', 'email': 's3@example.com', 'password': 'pw', 'first_name': 'Tim',
+            'last_name': 'Three', 'role': 'student', 'student_id': 'S-3', 'group': str(self.group.id),
+            'city': 'City', 'country': 'Country', 'phone_no': '3',
+        })])
+        self.assertEqual(Student.objects.get(student_id='S-3').group, named_like_id)
+
+    def test_doctor_upload_joins_the_department(self):
+        department = Department.objects.create(name='Surgery', log_year=self.year)
+        rows = [f'doc{i},doc{i}@example.com,pw,Dan,Doe,0,City,Country,Surgeon,Bio' for i in range(3)]
+        response = self.client.post(reverse('admin_section:add_doctor'), {
+            'bulk_upload': '1',
+            'department': department.id,
+            'csv_file': users_csv(rows, header='username,email,password,first_name,last_name,phone_no,city,country,speciality,bio'),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['bulk_results']['success_count'], 3)
+        self.assertEqual(Doctor.objects.filter(departments=department).count(), 3)
+
+    def test_passwords_can_be_hashed_in_a_process_pool(self):
+        from django.contrib.auth.hashers import check_password
+        from admin_section import user_import
+
+        with patch.object(user_import, 'PARALLEL_HASH_MIN_ROWS', 2), \
+                override_settings(USER_IMPORT_HASH_WORKERS=2):
+            hashed = user_import.hash_passwords([f'pw{i}' for i in range(6)])
+        self.assertEqual(len(hashed), 6)
+        self.assertTrue(all(check_password(f'pw{i}', value) for i, value in enumerate(hashed)))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class ImportJobTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        job_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, job_root, ignore_errors=True)
+        root = override_settings(IMPORT_JOB_ROOT=job_root)
+        root.enable()
+        self.addCleanup(root.disable)
+        self.job_root = job_root
+
+        self.year = LogYear.objects.create(year_name='2025')
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='admin'
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def _run_worker(self):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('run_import_worker', '--once', stdout=StringIO())
+
+    def test_user_upload_is_imported_by_the_worker(self):
+        import os
+        from admin_section.models import ImportJob
+        rows = [f'doc{i},doc{i}@example.com,pw,Dan,Doe,City,Country,{i}' for i in range(3)] + [
+            'doc0,dup@example.com,pw,Dan,Doe,City,Country,9',
+        ]
+        upload = users_csv(rows, header='username,email,password,first_name,last_name,city,country,phone_no')
+        response = self.client.post(reverse('admin_section:bulk_import_users'), {
+            'csv_file': upload, 'user_type': 'doctor', 'background': 'on',
+        })
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f"{reverse('admin_section:bulk_import_users')}?import_job={job.token}")
+        self.assertEqual(job.status, ImportJob.STATUS_QUEUED)
+        self.assertFalse(CustomUser.objects.filter(username='doc0').exists())
+        self.assertTrue(job.upload.path.startswith(self.job_root))
+
+        self._run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_DONE)
+        self.assertEqual((job.total_rows, job.processed_rows, job.success_count, job.error_count), (4, 4, 3, 1))
+        self.assertEqual(Doctor.objects.filter(user__username__startswith='doc').count(), 3)
+        self.assertEqual(os.listdir(self.job_root), [])
+
+        status = self.client.get(job.get_status_url(), {'errors_from': 0}).json()
+        self.assertEqual(status['errors'], ["Row 5: Username 'doc0' already exists"])
+        self.assertEqual(self.client.get(job.get_status_url(), {'errors_from': 1}).json()['errors'], [])
+        page = self.client.get(reverse('admin_section:bulk_import_users'), {'import_job': job.token})
+        self.assertEqual(page.context['import_job'], job)
+
+    @override_settings(IMPORT_SYNC_MAX_MB=0)
+    def test_large_session_upload_is_queued(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from admin_section.models import ImportJob
+        department = Department.objects.create(name='Surgery', log_year=self.year)
+        ActivityType.objects.create(name='Procedure', department=department)
+        content = 'name,department,activity_type\nSuture,surgery,procedure\nCast,Surgery,Missing\n'
+        response = self.client.post(reverse('admin_section:core_dia_pro_session_list'), {
+            'bulk_file': SimpleUploadedFile('sessions.csv', content.encode(), content_type='text/csv'),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(CoreDiaProSession.objects.exists())
+
+        self._run_worker()
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.success_count), (ImportJob.STATUS_DONE, 1))
+        self.assertEqual(job.errors, ['Row 2: activity_type "Missing" not found for department "Surgery"'])
+        self.assertTrue(CoreDiaProSession.objects.filter(name='Suture', department=department).exists())
+
+
+@override_settings(CACHES=USER_CACHE_TEST_CACHES)
+class CoreSessionImportTests(TestCase):
+    def setUp(self):
+        self.year = LogYear.objects.create(year_name='2025')
+        self.department = Department.objects.create(name='Pediatrics', log_year=self.year)
+        self.activity = ActivityType.objects.create(name='Procedure', department=self.department)
+        CoreDiaProSession.objects.create(name='Lumbar puncture', department=self.department, activity_type=self.activity)
+
+    def _rows(self, count):
+        return [
+            {'Name': f'Session {i}', 'Department': 'pediatrics', 'Activity_Type': 'PROCEDURE'}
+            for i in range(count)
+        ]
+
+    def test_queries_do_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            core_session_import.import_core_sessions(self._rows(5))
+        CoreDiaProSession.objects.filter(name__startswith='Session').delete()
+        with CaptureQueriesContext(connection) as large:
+            result = core_session_import.import_core_sessions(self._rows(200))
+        self.assertEqual(result.success_count, 200)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+        # One insert in its own savepoint per batch
+        with patch.object(core_session_import, 'BATCH_SIZE', 100), \
+                CaptureQueriesContext(connection) as batched:
+            result = core_session_import.import_core_sessions(self._rows(200) + self._rows(400)[200:])
+        self.assertEqual(result.success_count, 200)
+        self.assertEqual(result.error_count, 200)
+        self.assertEqual(len(batched.captured_queries), len(small.captured_queries) + 3)
+
+    def test_errors_and_duplicates_are_reported(self):
+        rows = [
+            {'name': 'lumbar PUNCTURE', 'department': 'Pediatrics', 'activity_type': 'Procedure'},
+            {'name': 'Intubation', 'department': 'Pediatrics', 'activity_type': 'Procedure'},
+            {'name': 'intubation', 'department': 'Pediatrics', 'activity_type': 'procedure'},
+            {'name': 'Cast', 'department': 'Surgery', 'activity_type': 'Procedure'},
+            {'name': 'Ward round', 'department': 'Pediatrics', 'activity_type': 'Rounds'},
+            {'name': '', 'department': 'Pediatrics', 'activity_type': 'Procedure'},
+        ]
+        result = core_session_import.import_core_sessions(rows)
+        self.assertEqual([session.name for session in result.created], ['Intubation'])
+        self.assertEqual(result.error_messages, [
+            'Row 1: session "lumbar PUNCTURE" already exists for department "Pediatrics" and activity "Procedure"',
+            'Row 3: session "intubation" already exists for department "Pediatrics" and activity "Procedure"',
+            'Row 4: department "Surgery" not found',
+            'Row 5: activity_type "Rounds" not found for department "Pediatrics"',
+            'Row 6: missing session name',
+        ])
+        self.assertFalse(ActivityType.objects.filter(name='Rounds').exists())
+
+    def test_resource_creates_activity_types_and_skips_duplicates(self):
+        dataset = tablib.Dataset(
+            ['Lumbar puncture', 'Procedure', 'Pediatrics'],
+            ['Ward round', 'Rounds', 'Pediatrics'],
+            ['Ward round', 'rounds', 'pediatrics'],
+            headers=['name', 'activity_type', 'department'],
+        )
+        result = CoreDiaProSessionResource().import_data(dataset)
+        self.assertFalse(result.has_errors())
+        self.assertEqual([row.import_type for row in result.rows], ['skip', 'new', 'skip'])
+        rounds = ActivityType.objects.get(name='Rounds', department=self.department)
+        self.assertTrue(CoreDiaProSession.objects.filter(name='Ward round', activity_type=rounds).exists())
+        self.assertEqual(CoreDiaProSession.objects.count(), 2)
+
+        dataset = tablib.Dataset(['Cast', 'Procedure', 'Surgery'], headers=['name', 'activity_type', 'department'])
+        result = CoreDiaProSessionResource().import_data(dataset)
+        self.assertIn('department "Surgery" not found', str(result.row_errors()[0][1][0].error))
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Rejects every message, like an unreachable SMTP server"""
+    def send_messages(self, email_messages):
+        raise SMTPException('Connection refused')
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+@override_settings(EMAIL_OUTBOX_BACKEND='locmem', EMAIL_HOST_USER='elog@example.com')
+class OutboxTests(TestCase):
+    def _queue(self, count):
+        from admin_section.outbox import queue_emails
+        return queue_emails([([f'user{i}@example.com', ''], f'Subject {i}', 'Body') for i in range(count)])
+
+    def test_worker_sends_each_batch_over_one_connection(self):
+        from io import StringIO
+        from django.core import mail
+        from django.core.management import call_command
+        from admin_section.models import OutboundEmail
+        self.assertEqual(self._queue(5), 5)
+        CountingEmailBackend.opened = 0
+        out = StringIO()
+        call_command(
+            'run_email_worker', '--once', '--batch-size', '2',
+            '--backend', 'admin_section.tests.CountingEmailBackend', stdout=out,
+        )
+        self.assertIn('Sent 5 emails, 0 failed', out.getvalue())
+        self.assertEqual(CountingEmailBackend.opened, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, ['user0@example.com'])
+        self.assertEqual(mail.outbox[0].from_email, 'elog@example.com')
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_SECONDS=60)
+    def test_failed_sends_back_off_then_give_up(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from admin_section.models import OutboundEmail
+        from admin_section.outbox import drain_outbox
+        self._queue(1)
+        backend = 'admin_section.tests.FailingEmailBackend'
+        self.assertEqual(drain_outbox(backend), (0, 1))
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_QUEUED, 1))
+        self.assertIn('Connection refused', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Not due yet
+        self.assertEqual(drain_outbox(backend), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('admin_section.outbox', 'ERROR'):
+            self.assertEqual(drain_outbox(backend), (0, 1))
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.STATUS_FAILED)
+
+    def test_file_backend_writes_the_batch_locally(self):
+        import os
+        import shutil
+        import tempfile
+        from admin_section.outbox import drain_outbox
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        self._queue(3)
+        with override_settings(EMAIL_FILE_PATH=path):
+            self.assertEqual(drain_outbox('file'), (3, 0))
+        files = os.listdir(path)
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(path, files[0])) as sent:
+            self.assertEqual(sent.read().count('Subject: Subject'), 3)
@@ -37,6 +37,8 @@ from .views_file.mapped_attendance_views import (
     get_training_sites_by_year,
     get_doctors_by_department,
 )
+from .views_file.export_jobs_views import export_job_status, export_job_download
+from .views_file.import_jobs_views import import_job_status
 
 
 app_name = "admin_section"
@@ -205,4 +207,11 @@ urlpatterns = [
     path('api/search-students/', search_students, name='search_students'),
     path('api/groups-by-year/', get_groups_by_year, name='get_groups_by_year'),
     path('api/training-sites-by-year/', get_training_sites_by_year, name='get_training_sites_by_year'),
+
+    # Background export jobs
+    path('export-jobs/<uuid:token>/', export_job_status, name='export_job_status'),
+    path('export-jobs/<uuid:token>/download/', export_job_download, name='export_job_download'),
+
+    # Background import jobs
+    path('import-jobs/<uuid:token>/', import_job_status, name='import_job_status'),
 ]
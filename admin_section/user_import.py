@@ -0,0 +1,289 @@
+"""
+Two-phase bulk user import
+
+``import_users`` first checks every row of an upload against the usernames,
+emails and student IDs already taken (loaded with a few ``IN`` queries) and
+against the rows above it, then inserts the valid rows with ``bulk_create``
+in batches. Password hashing, the slow part of an import, runs in a process
+pool for large uploads. The result lists every rejected row with its line
+number, so an upload can be corrected in one go.
+
+``bulk_create`` sends no signals: the role profiles that
+``accounts.signals.ensure_role_profile`` would add are created here, and the
+cached versions of the touched models are bumped.
+"""
+import csv
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from accounts.models import CustomUser, Doctor, Staff, Student
+from student_section.catalog import invalidate_catalog
+from utils.conditional import bump_model_versions
+from .import_jobs import ImportResult
+from .models import Group
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('admin', 'student', 'doctor', 'staff')
+REQUIRED_COLUMNS = ['username', 'email', 'password', 'first_name', 'last_name', 'city', 'country', 'phone_no']
+USER_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'phone_no', 'city', 'country', 'bio', 'speciality'
+)
+BATCH_SIZE = 500
+LOOKUP_CHUNK = 500
+# Uploads with fewer rows per worker than this are hashed in the calling process
+PARALLEL_HASH_MIN_ROWS = 50
+
+
+def required_columns(role):
+    """Return the CSV columns an upload of ``role`` users must have"""
+    return REQUIRED_COLUMNS + ['student_id'] if role == 'student' else list(REQUIRED_COLUMNS)
+
+
+def read_rows(reader):
+    """Return the ``(line number, row)`` pairs of a csv.DictReader"""
+    return [(reader.line_num, row) for row in reader]
+
+
+def _clean(row, field):
+    return (row.get(field) or '').strip()
+
+
+def _taken(queryset, field, values):
+    """Return the subset of ``values`` already stored in ``field``"""
+    values = list(values)
+    taken = set()
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[start:start + LOOKUP_CHUNK]
+        taken.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return taken
+
+
+def _load_groups(ids_first=False):
+    """Return a function resolving a group name or ID to a Group, trying names first unless ``ids_first``"""
+    by_name, by_id = {}, {}
+    for group in Group.objects.order_by('id'):
+        by_name.setdefault(group.group_name, group)
+        by_id[str(group.id)] = group
+    if ids_first:
+        return lambda value: by_id.get(value) or by_name.get(value)
+    return lambda value: by_name.get(value) or by_id.get(value)
+
+
+def _validate(rows, role, result, group_ids_first=False):
+    """Return the rows that can be created, recording errors for the others"""
+    rows = [(line, {key: value for key, value in row.items() if key}) for line, row in rows]
+    # Soft-deleted users still hold their username and email
+    users = CustomUser.all_objects
+    usernames = _taken(users, 'username', {_clean(row, 'username') for _, row in rows} - {''})
+    emails = _taken(users, 'email', {_clean(row, 'email') for _, row in rows} - {''})
+    student_ids = _taken(Student.objects, 'student_id', {_clean(row, 'student_id') for _, row in rows} - {''})
+    find_group = _load_groups(ids_first=group_ids_first)
+    max_lengths = {field: CustomUser._meta.get_field(field).max_length for field in USER_FIELDS}
+    student_id_length = Student._meta.get_field('student_id').max_length
+
+    valid = []
+    for line, row in rows:
+        fields = {field: _clean(row, field) for field in USER_FIELDS}
+        user_role = role or _clean(row, 'role').lower()
+        password = _clean(row, 'password')
+        username, email = fields['username'], fields['email']
+
+        if not username or not email:
+            result.add_error(line, "Username and email are required")
+            continue
+        if user_role not in ROLES:
+            result.add_error(line, f"Invalid role: {user_role}")
+            continue
+        if not password:
+            result.add_error(line, "Password is required")
+            continue
+        try:
+            validate_email(email)
+        except ValidationError:
+            result.add_error(line, f"Invalid email '{email}'")
+            continue
+        too_long = [field for field, value in fields.items() if max_lengths[field] and len(value) > max_lengths[field]]
+        if too_long:
+            result.add_error(line, f"Value too long for {', '.join(too_long)}")
+            continue
+        if username in usernames:
+            result.add_error(line, f"Username '{username}' already exists")
+            continue
+        if email in emails:
+            result.add_error(line, f"Email '{email}' already exists")
+            continue
+
+        entry = {'line': line, 'password': password, 'student_id': None, 'group': None}
+        if user_role == 'student':
+            student_id = _clean(row, 'student_id')
+            if not student_id:
+                result.add_error(line, "Student ID is required for student users")
+                continue
+            if len(student_id) > student_id_length:
+                result.add_error(line, "Value too long for student_id")
+                continue
+            if student_id in student_ids:
+                result.add_error(line, f"Student ID '{student_id}' already exists")
+                continue
+            group_value = _clean(row, 'group')
+            if group_value:
+                entry['group'] = find_group(group_value)
+                if entry['group'] is None:
+                    # Imported without a group, as before
+                    logger.warning("Group '%s' not found for student %s", group_value, student_id)
+            entry['student_id'] = student_id
+            student_ids.add(student_id)
+
+        usernames.add(username)
+        emails.add(email)
+        entry['user'] = CustomUser(role=user_role, **fields)
+        valid.append(entry)
+    return valid
+
+
+def _hash_chunk(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _init_hasher():
+    # Spawned children start without Django set up
+    import django
+    django.setup()
+
+
+def hash_workers():
+    """Processes used to hash passwords (USER_IMPORT_HASH_WORKERS setting, 0 for one per CPU)"""
+    return getattr(settings, 'USER_IMPORT_HASH_WORKERS', 0) or os.cpu_count() or 1
+
+
+def hash_passwords(passwords):
+    """
+    Hash ``passwords`` with the default password hasher
+
+    Large lists are split over a process pool; the hashes are returned in
+    the order of ``passwords``.
+    """
+    workers = min(hash_workers(), len(passwords) // PARALLEL_HASH_MIN_ROWS)
+    if workers <= 1:
+        return _hash_chunk(passwords)
+
+    size = -(-len(passwords) // (workers * 4))
+    chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_hasher) as pool:
+            hashed = list(pool.map(_hash_chunk, chunks))
+    except Exception:
+        logger.exception('Password hashing pool failed, hashing in process')
+        return _hash_chunk(passwords)
+    return [password for chunk in hashed for password in chunk]
+
+
+def _bulk_create(model, objs, key):
+    """bulk_create ``objs`` and make sure they have their primary keys"""
+    model.objects.bulk_create(objs)
+    missing = {getattr(obj, key): obj for obj in objs if obj.pk is None}
+    if missing:
+        # Backends that cannot return ids from bulk inserts
+        stored = model.objects.filter(**{f'{key}__in': list(missing)}).values_list(key, 'pk')
+        for value, pk in stored:
+            missing[value].pk = pk
+    return objs
+
+
+def _insert(batch, departments):
+    users = _bulk_create(CustomUser, [entry['user'] for entry in batch], 'username')
+    Student.objects.bulk_create([
+        Student(user=entry['user'], student_id=entry['student_id'], group=entry['group'])
+        for entry in batch if entry['user'].role == 'student'
+    ])
+    for model in (Doctor, Staff):
+        role = 'doctor' if model is Doctor else 'staff'
+        profiles = _bulk_create(model, [model(user=user) for user in users if user.role == role], 'user_id')
+        if departments and profiles:
+            through = model.departments.through
+            through.objects.bulk_create([
+                through(**{f'{model._meta.model_name}_id': profile.pk, 'department_id': department.pk})
+                for profile in profiles for department in departments
+            ])
+
+
+def _write(batch, departments, result):
+    """Insert one batch; if it conflicts, insert its rows one by one to find the culprits"""
+    try:
+        with transaction.atomic():
+            _insert(batch, departments)
+    except IntegrityError:
+        # Another request took a value after it was checked
+        for entry in batch:
+            user = entry['user']
+            user.pk = None
+            user._state.adding = True
+            try:
+                with transaction.atomic():
+                    _insert([entry], departments)
+            except IntegrityError as e:
+                user.pk = None
+                result.add_error(entry['line'], f"Could not be saved: {e}")
+            else:
+                result.created.append(user)
+        return
+    result.created.extend(entry['user'] for entry in batch)
+
+
+def import_users(rows, role=None, departments=(), progress=None, group_ids_first=False):
+    """
+    Create users and their role profiles from CSV rows
+
+    Args:
+        rows: ``(line number, row dict)`` pairs, see ``read_rows``
+        role: Role of every user; when None, each row's ``role`` column
+        departments: Departments the imported doctors and staff join
+        progress: Called with the ImportResult after validation and after
+            each batch
+        group_ids_first: Match the ``group`` column against group IDs
+            before group names (names come first by default)
+
+    Returns:
+        An ImportResult covering every row
+    """
+    result = ImportResult()
+    result.total = len(rows)
+    valid = _validate(rows, role, result, group_ids_first=group_ids_first)
+    if progress:
+        progress(result)
+    if not valid:
+        return result
+
+    for entry, password in zip(valid, hash_passwords([entry.pop('password') for entry in valid])):
+        entry['user'].password = password
+    for start in range(0, len(valid), BATCH_SIZE):
+        _write(valid[start:start + BATCH_SIZE], departments, result)
+        if progress:
+            progress(result)
+
+    if result.created:
+        bump_model_versions(CustomUser, Student, Doctor, Staff, Doctor.departments.through, Staff.departments.through)
+        if departments and any(user.role == 'doctor' for user in result.created):
+            # New tutors appear in the student log form
+            invalidate_catalog()
+    return result
+
+
+def run_user_import(path, params, progress):
+    """Import job entry point: import the CSV file at ``path`` as ``params['role']`` users"""
+    role = params.get('role')
+    with open(path, encoding='utf-8-sig', newline='') as upload:
+        reader = csv.DictReader(upload)
+        missing = [field for field in required_columns(role) if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV file is missing required fields: {', '.join(missing)}")
+        rows = read_rows(reader)
+    return import_users(rows, role=role, progress=progress)
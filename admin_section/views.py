@@ -11,12 +11,13 @@ import csv
 import io
 import json
 from datetime import timedelta
-from django.contrib.auth.hashers import make_password
 
 # Models
 from admin_section.models import *
 from accounts.models import CustomUser, Student, Doctor, Staff
-from student_section.models import SupportTicket, StudentLogFormModel
+from student_section.models import SupportTicket, StudentLogFormModel, StudentLogRollup
+from student_section.rollup import deferred_rollup
+from student_section.reviews import batch_comment, review_logs
 from doctor_section.models import DoctorSupportTicket
 
 # Forms
@@ -30,12 +31,26 @@ from django.db.models import Count, Q
 from django.db.models.functions import TruncMonth
 from datetime import datetime
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.units import inch
 import tablib
-from utils.pdf_utils import add_agu_header, get_common_styles, add_footer_info
+from .export_jobs import background_export
+from .import_jobs import job_max_bytes, queue_import, queued_response, requested_job, sync_max_bytes
+from .user_import import import_users, read_rows, required_columns
+from utils.conditional import conditional_json
+from utils.pdf_utils import (
+    add_agu_header, get_common_styles, add_footer_info, add_table, get_table_style, LazyFlowables, build_pdf,
+)
+from utils.csv_export import streaming_csv_response, iter_values, full_name, format_datetime
+from utils.notification_counts import forget_unread_counts
+from utils.excel_export import (
+    new_workbook, write_table, workbook_response, Styled, TITLE_FONT, SECTION_FONT, BOLD_FONT, CENTER
+)
+from utils.log_stats import (
+    summarize_logs, group_status_counts, empty_status_counts, chart_breakdowns, summarize_rollups,
+    group_rollup_counts, approval_rate
+)
 
 @login_required
 def department_report(request):
@@ -67,94 +82,56 @@ def department_report(request):
     if section_filter:
         logs = logs.filter(log_year_section_id=section_filter)
 
-    # Calculate department statistics
-    department_stats = []
-    for dept in departments:
-        dept_logs = logs.filter(department=dept)
-        total_logs = dept_logs.count()
-        reviewed_logs = dept_logs.filter(is_reviewed=True).count()
-        pending_logs = total_logs - reviewed_logs
-        approved_logs = dept_logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-        rejected_logs = dept_logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
+    # Calculate department statistics with one grouped query over the logs
+    departments_with_counts = departments.annotate(doctors_count=Count('doctors', distinct=True))
+    dept_counts = group_status_counts(logs, 'department_id')
+    section_ids = {dept.log_year_section_id for dept in departments_with_counts if dept.log_year_section_id}
+    students_per_section = {
+        row['group__log_year_section']: row['count']
+        for row in Student.objects.filter(group__log_year_section__in=section_ids)
+        .values('group__log_year_section').annotate(count=Count('id'))
+    }
 
+    department_stats = []
+    dept_case_totals = {}
+    for dept in departments_with_counts:
+        counts = dept_counts.get(dept.id, empty_status_counts())
         department_stats.append({
             'department': dept,
-            'total_logs': total_logs,
-            'reviewed_logs': reviewed_logs,
-            'pending_logs': pending_logs,
-            'approved_logs': approved_logs,
-            'rejected_logs': rejected_logs,
-            'doctors_count': dept.doctors.count(),
-            'students_count': Student.objects.filter(group__log_year_section=dept.log_year_section).count() if dept.log_year_section else 0
+            'total_logs': counts['total'],
+            'reviewed_logs': counts['reviewed'],
+            'pending_logs': counts['pending'],
+            'approved_logs': counts['approved'],
+            'rejected_logs': counts['rejected'],
+            'doctors_count': dept.doctors_count,
+            'students_count': students_per_section.get(dept.log_year_section_id, 0) if dept.log_year_section_id else 0
         })
+        if counts['total']:
+            dept_case_totals[dept.name] = dept_case_totals.get(dept.name, 0) + counts['total']
 
     # Prepare chart data
-    import json
-    from django.db.models import Count
-
-    # Case Types Data (Activity Types) - Real data from logs
-    case_types = logs.values('activity_type__name').annotate(count=Count('id')).order_by('-count')
-    case_types_data = {
-        'labels': [item['activity_type__name'] or 'Unknown' for item in case_types],
-        'data': [item['count'] for item in case_types]
-    }
-
-    # Training Sites Data - Real data from logs
-    training_sites = logs.values('training_site__name').annotate(count=Count('id')).order_by('-count')
-    training_sites_data = {
-        'labels': [item['training_site__name'] or 'Unknown' for item in training_sites],
-        'data': [item['count'] for item in training_sites]
-    }
+    charts = chart_breakdowns(logs)
 
     # Activity Types Data (same as case types but can be filtered)
-    activity_types_data = case_types_data.copy()
-
-    # Participation Data - Real data from logs
-    participation_logs = logs.values('participation_type').annotate(count=Count('id')).order_by('-count')
-    participation_data = {
-        'labels': [item['participation_type'] or 'Not Specified' for item in participation_logs],
-        'data': [item['count'] for item in participation_logs]
-    }
-
-    # Monthly Data - Real data from logs
-    monthly_logs = logs.annotate(month=TruncMonth('date')).values('month').annotate(count=Count('id')).order_by('month')
-    monthly_data = {
-        'labels': [item['month'].strftime('%B %Y') if item['month'] else 'Unknown' for item in monthly_logs],
-        'data': [item['count'] for item in monthly_logs]
-    }
-
-    # Core Diagnosis Data - Additional chart data
-    core_diagnosis_logs = logs.values('core_diagnosis__name').annotate(count=Count('id')).order_by('-count')[:10]  # Top 10
-    core_diagnosis_data = {
-        'labels': [item['core_diagnosis__name'] or 'Unknown' for item in core_diagnosis_logs],
-        'data': [item['count'] for item in core_diagnosis_logs]
-    }
-
-    # Patient Gender Data - Additional chart data
-    gender_logs = logs.values('patient_gender').annotate(count=Count('id')).order_by('-count')
-    gender_data = {
-        'labels': [item['patient_gender'] or 'Not Specified' for item in gender_logs],
-        'data': [item['count'] for item in gender_logs]
-    }
+    charts['activity_types_data'] = charts['case_types_data'].copy()
 
     # Department-wise case distribution
-    dept_case_logs = logs.values('department__name').annotate(count=Count('id')).order_by('-count')
-    dept_case_data = {
-        'labels': [item['department__name'] or 'Unknown' for item in dept_case_logs],
-        'data': [item['count'] for item in dept_case_logs]
+    dept_case_items = sorted(dept_case_totals.items(), key=lambda item: item[1], reverse=True)
+    charts['dept_case_data'] = {
+        'labels': [name for name, _ in dept_case_items],
+        'data': [count for _, count in dept_case_items]
     }
 
     # Approval Status Data
-    total_logs_count = logs.count()
-    reviewed_count = logs.filter(is_reviewed=True).count()
-    pending_count = total_logs_count - reviewed_count
-    approved_count = logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-    rejected_count = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
-
-    approval_status_data = {
-        'approved': approved_count,
-        'pending': pending_count,
-        'rejected': rejected_count
+    summary = empty_status_counts()
+    for counts in dept_counts.values():
+        for key in summary:
+            summary[key] += counts[key]
+
+    charts['approval_status_data'] = {
+        'approved': summary['approved'],
+        'pending': summary['pending'],
+        'rejected': summary['rejected']
     }
 
     # Get years and sections for filters
@@ -175,27 +152,20 @@ def department_report(request):
         'selected_department': department_filter,
         'selected_year': year_filter,
         'selected_section': section_filter,
-        'total_departments': departments.count(),
-        'total_logs': logs.count(),
+        'total_departments': len(department_stats),
+        'total_logs': summary['total'],
         'total_doctors': total_doctors,
         'total_training_sites': total_training_sites,
         'total_activity_types': total_activity_types,
-        # Chart data as JSON
-        'case_types_data': json.dumps(case_types_data),
-        'training_sites_data': json.dumps(training_sites_data),
-        'activity_types_data': json.dumps(activity_types_data),
-        'participation_data': json.dumps(participation_data),
-        'monthly_data': json.dumps(monthly_data),
-        'approval_status_data': json.dumps(approval_status_data),
-        'core_diagnosis_data': json.dumps(core_diagnosis_data),
-        'gender_data': json.dumps(gender_data),
-        'dept_case_data': json.dumps(dept_case_data),
     }
+    # Chart data as JSON
+    context.update({name: json.dumps(data) for name, data in charts.items()})
 
     return render(request, 'admin_section/department_report.html', context)
 
 
 @login_required
+@background_export('admin_section:department_report_export')
 def department_report_export(request):
     """Export Department Report as PDF or Excel"""
     if request.user.role != 'admin':
@@ -252,16 +222,7 @@ def department_report_export(request):
 
 def export_department_excel(department_data, selected_department=None, selected_year=None):
     """Export department report to Excel"""
-    import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
     from openpyxl.chart import BarChart, Reference
-    from django.http import HttpResponse
-    import io
-
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Department Report"
 
     # Add title
     title = "Department Report"
@@ -271,39 +232,31 @@ def export_department_excel(department_data, selected_department=None, selected_
     if selected_year:
         title += f" - {selected_year}"
 
-    ws['A1'] = title
-    ws['A1'].font = Font(size=16, bold=True)
-    ws['A1'].alignment = Alignment(horizontal='center')
-    ws.merge_cells('A1:F1')
-
-    # Add headers
+    # Add headers and data
     headers = ['Department', 'Total Students', 'Total Logs', 'Reviewed Logs', 'Pending Logs', 'Review Rate']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=3, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(color="FFFFFF", bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Add data
-    for row, dept in enumerate(department_data, 4):
-        ws.cell(row=row, column=1, value=dept['name'])
-        ws.cell(row=row, column=2, value=dept['total_students'])
-        ws.cell(row=row, column=3, value=dept['total_logs'])
-        ws.cell(row=row, column=4, value=dept['reviewed_logs'])
-        ws.cell(row=row, column=5, value=dept['pending_logs'])
-        ws.cell(row=row, column=6, value=dept['review_rate'])
+    rows = (
+        [dept['name'], dept['total_students'], dept['total_logs'], dept['reviewed_logs'],
+         dept['pending_logs'], dept['review_rate']]
+        for dept in department_data
+    )
+
+    wb = new_workbook()
+    ws, header_row, row_count = write_table(
+        wb, "Department Report", headers, rows,
+        preamble=[[Styled(title, font=TITLE_FONT, alignment=CENTER)], []]
+    )
+    ws.merged_cells.add('A1:F1')
 
     # Add chart
-    if len(department_data) > 0:
+    if row_count > 0:
         chart = BarChart()
         chart.title = "Department Statistics"
         chart.x_axis.title = "Departments"
         chart.y_axis.title = "Count"
 
         # Data for chart
-        data = Reference(ws, min_col=2, min_row=3, max_col=5, max_row=len(department_data) + 3)
-        categories = Reference(ws, min_col=1, min_row=4, max_row=len(department_data) + 3)
+        data = Reference(ws, min_col=2, min_row=header_row, max_col=5, max_row=header_row + row_count)
+        categories = Reference(ws, min_col=1, min_row=header_row + 1, max_row=header_row + row_count)
 
         chart.add_data(data, titles_from_data=True)
         chart.set_categories(categories)
@@ -311,27 +264,7 @@ def export_department_excel(department_data, selected_department=None, selected_
         # Add chart to worksheet
         ws.add_chart(chart, "H3")
 
-    # Auto-adjust column widths
-    headers = ['Department', 'Total Students', 'Total Logs', 'Reviewed Logs', 'Pending Logs', 'Review Rate']
-    for col_num in range(1, len(headers) + 1):
-        max_length = 0
-        column_letter = openpyxl.utils.get_column_letter(col_num)
-        for row in range(1, ws.max_row + 1):
-            cell = ws.cell(row=row, column=col_num)
-            try:
-                if cell.value and len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Save to response
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="department_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-
-    wb.save(response)
-    return response
+    return workbook_response(wb, f'department_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
 
 
 def export_department_pdf(department_data, selected_department=None, selected_year=None):
@@ -436,7 +369,7 @@ def export_department_pdf(department_data, selected_department=None, selected_ye
     add_footer_info(elements)
 
     # Build PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get PDF data
     pdf_data = buffer.getvalue()
@@ -481,11 +414,12 @@ def student_report(request):
         )
 
     # Calculate summary statistics
-    total_logs = logs.count()
-    reviewed_logs = logs.filter(is_reviewed=True).count()
-    pending_logs = logs.filter(is_reviewed=False).count()
-    approved_logs = logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-    rejected_logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
+    summary = summarize_logs(logs)
+    total_logs = summary['total']
+    reviewed_logs = summary['reviewed']
+    pending_logs = summary['pending']
+    approved_logs = summary['approved']
+    rejected_logs = summary['rejected']
 
     # Get unique doctors - fix duplicate issue
     unique_doctor_ids = logs.values_list('tutor', flat=True).distinct()
@@ -627,6 +561,7 @@ def student_report(request):
 
 
 @login_required
+@background_export('admin_section:student_report_export')
 def student_report_export(request):
     """Export Student Report as PDF or Excel"""
     if request.user.role != 'admin':
@@ -703,16 +638,6 @@ def student_report_export(request):
 
 def export_student_excel(student_data, selected_department=None, selected_year=None, selected_group=None, selected_student=None):
     """Export student report to Excel"""
-    import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill
-    from openpyxl.chart import BarChart, Reference
-    from django.http import HttpResponse
-
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Student Report"
-
     # Add title
     title = "Student Report"
     if selected_department:
@@ -724,54 +649,23 @@ def export_student_excel(student_data, selected_department=None, selected_year=N
         group_name = Group.objects.get(id=selected_group).group_name
         title += f" - {group_name}"
 
-    ws['A1'] = title
-    ws['A1'].font = Font(size=16, bold=True)
-    ws['A1'].alignment = Alignment(horizontal='center')
-    ws.merge_cells('A1:J1')
-
-    # Add headers
+    # Add headers and data
     headers = ['Name', 'Email', 'Group', 'Department', 'Year', 'Total Logs', 'Reviewed', 'Pending', 'Departments', 'Review Rate']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=3, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(color="FFFFFF", bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Add data
-    for row, student in enumerate(student_data, 4):
-        ws.cell(row=row, column=1, value=student['name'])
-        ws.cell(row=row, column=2, value=student['email'])
-        ws.cell(row=row, column=3, value=student['group'])
-        ws.cell(row=row, column=4, value=student['department'])
-        ws.cell(row=row, column=5, value=student['year'])
-        ws.cell(row=row, column=6, value=student['total_logs'])
-        ws.cell(row=row, column=7, value=student['reviewed_logs'])
-        ws.cell(row=row, column=8, value=student['pending_logs'])
-        ws.cell(row=row, column=9, value=student['departments_count'])
-        ws.cell(row=row, column=10, value=student['review_rate'])
-
-    # Auto-adjust column widths
-    headers = ['Name', 'Email', 'Student ID', 'Group', 'Department', 'Year', 'Total Logs', 'Reviewed Logs', 'Pending Logs', 'Review Rate']
-    for col_num in range(1, len(headers) + 1):
-        max_length = 0
-        column_letter = openpyxl.utils.get_column_letter(col_num)
-        for row in range(1, ws.max_row + 1):
-            cell = ws.cell(row=row, column=col_num)
-            try:
-                if cell.value and len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Save to response
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="student_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-
-    wb.save(response)
-    return response
+    rows = (
+        [student['name'], student['email'], student['group'], student['department'], student['year'],
+         student['total_logs'], student['reviewed_logs'], student['pending_logs'],
+         student['departments_count'], student['review_rate']]
+        for student in student_data
+    )
+
+    wb = new_workbook()
+    ws, _, _ = write_table(
+        wb, "Student Report", headers, rows,
+        preamble=[[Styled(title, font=TITLE_FONT, alignment=CENTER)], []]
+    )
+    ws.merged_cells.add('A1:J1')
+
+    return workbook_response(wb, f'student_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
 
 
 def export_student_pdf(student_data, selected_department=None, selected_year=None, selected_group=None, selected_student=None):
@@ -855,7 +749,7 @@ def export_student_pdf(student_data, selected_department=None, selected_year=Non
     add_footer_info(elements)
 
     # Build PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get PDF data
     pdf_data = buffer.getvalue()
@@ -899,11 +793,12 @@ def tutor_report(request):
         )
 
     # Calculate summary statistics
-    total_logs = logs.count()
-    reviewed_logs = logs.filter(is_reviewed=True).count()
-    pending_logs = logs.filter(is_reviewed=False).count()
-    approved_logs = logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-    rejected_logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
+    summary = summarize_logs(logs)
+    total_logs = summary['total']
+    reviewed_logs = summary['reviewed']
+    pending_logs = summary['pending']
+    approved_logs = summary['approved']
+    rejected_logs = summary['rejected']
 
     # Get unique doctors from filtered logs
     unique_doctor_ids = logs.values_list('tutor', flat=True).distinct()
@@ -1025,6 +920,7 @@ def tutor_report(request):
 
 
 @login_required
+@background_export('admin_section:tutor_report_export')
 def tutor_report_export(request):
     """Export Tutor Report as PDF or Excel"""
     if request.user.role != 'admin':
@@ -1088,15 +984,7 @@ def tutor_report_export(request):
 
 def export_tutor_excel(tutor_data, selected_department=None, selected_year=None):
     """Export tutor report to Excel"""
-    import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill
     from openpyxl.chart import BarChart, Reference
-    from django.http import HttpResponse
-
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Tutor Report"
 
     # Add title
     title = "Tutor Report"
@@ -1106,42 +994,31 @@ def export_tutor_excel(tutor_data, selected_department=None, selected_year=None)
     if selected_year:
         title += f" - {selected_year}"
 
-    ws['A1'] = title
-    ws['A1'].font = Font(size=16, bold=True)
-    ws['A1'].alignment = Alignment(horizontal='center')
-    ws.merge_cells('A1:I1')
-
-    # Add headers
+    # Add headers and data
     headers = ['Name', 'Email', 'Department', 'Specialization', 'Phone', 'Total Supervised', 'Total Reviews', 'Students Supervised', 'Departments']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=3, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(color="FFFFFF", bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Add data
-    for row, tutor in enumerate(tutor_data, 4):
-        ws.cell(row=row, column=1, value=tutor['name'])
-        ws.cell(row=row, column=2, value=tutor['email'])
-        ws.cell(row=row, column=3, value=tutor['department'])
-        ws.cell(row=row, column=4, value=tutor['specialization'])
-        ws.cell(row=row, column=5, value=tutor['phone'])
-        ws.cell(row=row, column=6, value=tutor['total_supervised'])
-        ws.cell(row=row, column=7, value=tutor['total_reviews'])
-        ws.cell(row=row, column=8, value=tutor['unique_students'])
-        ws.cell(row=row, column=9, value=tutor['unique_departments'])
+    rows = (
+        [tutor['name'], tutor['email'], tutor['department'], tutor['specialization'], tutor['phone'],
+         tutor['total_supervised'], tutor['total_reviews'], tutor['unique_students'], tutor['unique_departments']]
+        for tutor in tutor_data
+    )
+
+    wb = new_workbook()
+    ws, header_row, row_count = write_table(
+        wb, "Tutor Report", headers, rows,
+        preamble=[[Styled(title, font=TITLE_FONT, alignment=CENTER)], []]
+    )
+    ws.merged_cells.add('A1:I1')
 
     # Add chart
-    if len(tutor_data) > 0:
+    if row_count > 0:
         chart = BarChart()
         chart.title = "Tutor Review Statistics"
         chart.x_axis.title = "Tutors"
         chart.y_axis.title = "Count"
 
         # Data for chart
-        data = Reference(ws, min_col=6, min_row=3, max_col=8, max_row=len(tutor_data) + 3)
-        categories = Reference(ws, min_col=1, min_row=4, max_row=len(tutor_data) + 3)
+        data = Reference(ws, min_col=6, min_row=header_row, max_col=8, max_row=header_row + row_count)
+        categories = Reference(ws, min_col=1, min_row=header_row + 1, max_row=header_row + row_count)
 
         chart.add_data(data, titles_from_data=True)
         chart.set_categories(categories)
@@ -1149,26 +1026,7 @@ def export_tutor_excel(tutor_data, selected_department=None, selected_year=None)
         # Add chart to worksheet
         ws.add_chart(chart, "J3")
 
-    # Auto-adjust column widths
-    for col_num in range(1, len(headers) + 1):
-        max_length = 0
-        column_letter = openpyxl.utils.get_column_letter(col_num)
-        for row in range(1, ws.max_row + 1):
-            cell = ws.cell(row=row, column=col_num)
-            try:
-                if cell.value and len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Save to response
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="tutor_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-
-    wb.save(response)
-    return response
+    return workbook_response(wb, f'tutor_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
 
 
 def export_tutor_pdf(tutor_data, selected_department=None, selected_year=None):
@@ -1248,7 +1106,7 @@ def export_tutor_pdf(tutor_data, selected_department=None, selected_year=None):
     add_footer_info(elements)
 
     # Build PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get PDF data
     pdf_data = buffer.getvalue()
@@ -1294,86 +1152,11 @@ def bulk_add_users(request):
                 messages.error(request, 'CSV file must contain all required fields')
                 return redirect('admin_section:bulk_add_users')
 
-            success_count = 0
-            error_count = 0
-            error_messages = []
-
-            for row in reader:
-                try:
-                    with transaction.atomic():
-                        # Basic validation
-                        username = row.get('username', '').strip()
-                        email = row.get('email', '').strip()
-                        role = row.get('role', '').strip().lower()
-
-                        if not username or not email or not role:
-                            raise ValueError("Username, email and role are required")
-
-                        if CustomUser.objects.filter(username=username).exists():
-                            raise ValueError(f"Username '{username}' already exists")
-
-                        if CustomUser.objects.filter(email=email).exists():
-                            raise ValueError(f"Email '{email}' already exists")
-
-                        if role not in ['admin', 'student', 'doctor', 'staff']:
-                            raise ValueError(f"Invalid role: {role}")
-
-                        # Create user
-                        user = CustomUser.objects.create(
-                            username=username,
-                            email=email,
-                            password=make_password(row['password'].strip()),
-                            first_name=row.get('first_name', '').strip(),
-                            last_name=row.get('last_name', '').strip(),
-                            role=role,
-                            phone_no=row.get('phone_no', '').strip(),
-                            city=row.get('city', '').strip(),
-                            country=row.get('country', '').strip(),
-                            bio=row.get('bio', '').strip(),
-                            speciality=row.get('speciality', '').strip()
-                        )
-
-                        # Create role-specific profile
-                        if role == 'student':
-                            # Additional validation for student-specific fields
-                            student_id = row.get('student_id', '').strip()
-                            group_id = row.get('group', '').strip()
-
-                            if not student_id:
-                                raise ValueError("Student ID is required for student users")
-
-                            if Student.objects.filter(student_id=student_id).exists():
-                                raise ValueError(f"Student ID '{student_id}' already exists")
-
-                            # Create student profile
-                            student = Student(user=user, student_id=student_id)
-
-                            # Assign group if provided and valid
-                            if group_id:
-                                try:
-                                    group = Group.objects.get(id=group_id)
-                                    student.group = group
-                                except Group.DoesNotExist:
-                                    # Try to match by group name (B1, B2, A1, etc.)
-                                    try:
-                                        group = Group.objects.filter(group_name=group_id).first()
-                                        if group:
-                                            student.group = group
-                                    except Exception:
-                                        pass
-
-                            student.save()
-
-                        elif role == 'doctor':
-                            Doctor.objects.create(user=user)
-
-                        elif role == 'staff':
-                            Staff.objects.create(user=user)
-
-                        success_count += 1
-                except Exception as e:
-                    error_count += 1
-                    error_messages.append(f"Row {reader.line_num}: {str(e)}")
+            # Rows are checked up front and created in batches
+            # This form has always matched groups by ID before name
+            result = import_users(read_rows(reader), group_ids_first=True)
+            success_count = result.success_count
+            error_count = result.error_count
 
             if success_count > 0:
                 messages.success(request, f"Successfully added {success_count} users.")
@@ -1385,8 +1168,8 @@ def bulk_add_users(request):
                 'results': {
                     'success_count': success_count,
                     'error_count': error_count,
-                    'error_messages': error_messages[:10],
-                    'total_errors': len(error_messages)
+                    'error_messages': result.error_messages,
+                    'total_errors': error_count
                 }
             })
     else:
@@ -1495,50 +1278,51 @@ def admin_dash(request):
     today = timezone.now()
     start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
+    # Pre-aggregated log counts
+    rollups = StudentLogRollup.objects.all()
+    if department_id:
+        rollups = rollups.filter(department_id=department_id)
+    summary = summarize_rollups(rollups)
+
     # Count metrics
-    total_logs = logs.count()
+    total_logs = summary['total']
     total_doctors = Doctor.objects.count()
     total_student = Student.objects.count()
     total_departments = Department.objects.count()
     total_activities = ActivityType.objects.count()
 
     # Review status counts
-    reviewed_logs = logs.filter(is_reviewed=True)
-    pending_logs = logs.filter(is_reviewed=False).count()
-    approved_logs = reviewed_logs.exclude(reviewer_comments__startswith='REJECTED').count()
-    rejected_logs = reviewed_logs.filter(reviewer_comments__startswith='REJECTED').count()
+    pending_logs = summary['pending']
+    approved_logs = summary['approved']
+    rejected_logs = summary['rejected']
 
     # Get recent logs for the table (limited to 10)
     recent_logs = logs.order_by('-created_at')[:10]
 
     # Department statistics for charts
+    dept_counts = group_rollup_counts(StudentLogRollup.objects.all(), 'department_id')
     department_stats = []
-    for dept in departments:
-        dept_logs = StudentLogFormModel.objects.filter(department=dept)
-        total = dept_logs.count()
-        reviewed = dept_logs.filter(is_reviewed=True).count()
-        pending = total - reviewed
+    for dept in departments.annotate(doctors_count=Count('doctors', distinct=True)):
+        counts = dept_counts.get(dept.id, empty_status_counts())
         department_stats.append({
             'name': dept.name,
-            'total': total,
-            'reviewed': reviewed,
-            'pending': pending,
-            'doctors_count': dept.doctors.count()
+            'total': counts['total'],
+            'reviewed': counts['reviewed'],
+            'pending': counts['pending'],
+            'doctors_count': dept.doctors_count
         })
 
     # Doctor performance data if department is selected
     doctor_performance = []
     if department_id:
+        tutor_counts = group_rollup_counts(rollups, 'tutor_id')
         for doctor in doctors:
-            doctor_logs = logs.filter(tutor=doctor)
-            reviewed = doctor_logs.filter(is_reviewed=True).count()
-            approved = doctor_logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-            rejected = doctor_logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
+            counts = tutor_counts.get(doctor.id, empty_status_counts())
             doctor_performance.append({
                 'name': doctor.user.get_full_name() or doctor.user.username,
-                'reviewed': reviewed,
-                'approved': approved,
-                'rejected': rejected
+                'reviewed': counts['reviewed'],
+                'approved': counts['approved'],
+                'rejected': counts['rejected']
             })
 
     # Student performance search
@@ -1554,40 +1338,32 @@ def admin_dash(request):
         ).first()
 
         if student_query:
-            # Get student logs
-            student_logs = logs.filter(student=student_query)
-            total_student_logs = student_logs.count()
-            approved_student_logs = student_logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-            pending_student_logs = student_logs.filter(is_reviewed=False).count()
-            rejected_student_logs = student_logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
+            # Get student log counts
+            student_rollups = rollups.filter(student=student_query)
+            student_counts = summarize_rollups(student_rollups)
 
             # Create student data dictionary
             student_data = {
                 'name': student_query.user.get_full_name() or student_query.user.username,
                 'id': student_query.student_id,
                 'email': student_query.user.email,
-                'total_logs': total_student_logs,
-                'approved_logs': approved_student_logs,
-                'pending_logs': pending_student_logs,
-                'rejected_logs': rejected_student_logs
+                'total_logs': student_counts['total'],
+                'approved_logs': student_counts['approved'],
+                'pending_logs': student_counts['pending'],
+                'rejected_logs': student_counts['rejected']
             }
 
             # Get performance by department
-            student_departments = student_logs.values('department__name').annotate(
-                total=Count('id'),
-                approved=Count('id', filter=Q(is_reviewed=True) & ~Q(reviewer_comments__startswith='REJECTED')),
-                pending=Count('id', filter=Q(is_reviewed=False)),
-                rejected=Count('id', filter=Q(is_reviewed=True) & Q(reviewer_comments__startswith='REJECTED'))
-            )
+            student_departments = group_rollup_counts(student_rollups, 'department__name')
 
             student_performance_data = []
-            for dept in student_departments:
+            for dept_name, counts in student_departments.items():
                 student_performance_data.append({
-                    'department': dept['department__name'],
-                    'total': dept['total'],
-                    'approved': dept['approved'],
-                    'pending': dept['pending'],
-                    'rejected': dept['rejected']
+                    'department': dept_name,
+                    'total': counts['total'],
+                    'approved': counts['approved'],
+                    'pending': counts['pending'],
+                    'rejected': counts['rejected']
                 })
 
     # Prepare chart data
@@ -1618,12 +1394,7 @@ def admin_dash(request):
     return render(request, "admin_section/admin_dash.html", context)
 
 def calculate_approval_rate(logs):
-    reviewed_logs = logs.filter(is_reviewed=True)
-    total_reviewed = reviewed_logs.count()
-    if total_reviewed == 0:
-        return 0
-    approved = reviewed_logs.filter(reviewer_comments__startswith='REJECTED').count()
-    return round((1 - approved / total_reviewed) * 100)
+    return approval_rate(summarize_logs(logs))
 
 def get_daily_submissions_data(logs):
     last_7_days = timezone.now() - timedelta(days=7)
@@ -1678,6 +1449,8 @@ def get_monthly_trend_data(logs):
 
 
 @login_required
+@conditional_json(CustomUser, Student, Doctor, Staff, Group, Department,
+                  Doctor.departments.through, Staff.departments.through)
 def get_user_data(request):
     """AJAX endpoint to get user data for the dashboard"""
     user_type = request.GET.get('user_type', '')
@@ -2355,22 +2128,9 @@ def batch_review(request):
     # Get logs - admin can review all logs
     logs = StudentLogFormModel.objects.filter(id__in=log_ids)
 
-    # Process each log
-    with transaction.atomic():
-        for log in logs:
-            log.is_reviewed = True
-            log.review_date = timezone.now()
+    with deferred_rollup():
+        count = len(review_logs(logs, action, batch_comment(action, comments)))
 
-            # Set comments based on action
-            if action == 'reject':
-                prefix = "REJECTED: "
-                log.reviewer_comments = prefix + comments if comments else prefix + "Batch rejected"
-            else:  # approve
-                log.reviewer_comments = comments if comments else "Approved"
-
-            log.save()
-
-    count = logs.count()
     messages.success(request, f"{count} log entries have been {'approved' if action == 'approve' else 'rejected'}.")
     return redirect('admin_section:admin_reviews')
 
@@ -2445,6 +2205,7 @@ def notifications(request):
         to_mark = notifications_list.filter(is_read=False)
         count = to_mark.count()
         to_mark.update(is_read=True)
+        forget_unread_counts('admin', [request.user.pk])
 
         if count > 0:
             messages.success(request, f"{count} notifications marked as read.")
@@ -2543,118 +2304,36 @@ def bulk_import_users(request):
             csv_file = request.FILES['csv_file']
             user_type = form.cleaned_data['user_type']
 
-            # Validate file size (5MB limit)
-            if csv_file.size > 5 * 1024 * 1024:
-                messages.error(request, 'File size must be less than 5MB')
-                return redirect('admin_section:bulk_import_users')
-
+            # Check the header line before the file is imported or queued
             try:
-                decoded_file = csv_file.read().decode('utf-8')
+                header_line = csv_file.readline().decode('utf-8-sig')
             except UnicodeDecodeError:
                 messages.error(request, 'Please upload a valid CSV file')
                 return redirect('admin_section:bulk_import_users')
-
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-
-            # Basic required fields for all user types
-            required_fields = [
-                'username', 'email', 'password', 'first_name', 'last_name',
-                'city', 'country', 'phone_no'
-            ]
-
-            # Add role-specific required fields
-            if user_type == 'student':
-                required_fields.append('student_id')
-
-            # Validate headers
-            headers = reader.fieldnames
-            if not headers or not all(field in headers for field in required_fields):
-                missing_fields = [field for field in required_fields if field not in headers]
+            csv_file.seek(0)
+            headers = next(csv.reader([header_line]), [])
+            missing_fields = [field for field in required_columns(user_type) if field not in headers]
+            if missing_fields:
                 messages.error(request, f'CSV file is missing required fields: {", ".join(missing_fields)}')
                 return redirect('admin_section:bulk_import_users')
 
-            success_count = 0
-            error_count = 0
-            error_messages = []
+            # Large files are imported by the run_import_worker command
+            if form.cleaned_data['background'] or csv_file.size > sync_max_bytes():
+                job = queue_import(request.user, 'users', csv_file, {'role': user_type})
+                messages.success(request, f'{csv_file.name} is being imported in the background.')
+                return queued_response(request, job, 'admin_section:bulk_import_users')
 
-            for row in reader:
-                try:
-                    with transaction.atomic():
-                        # Basic validation
-                        username = row.get('username', '').strip()
-                        email = row.get('email', '').strip()
-
-                        if not username or not email:
-                            raise ValueError("Username and email are required")
-
-                        if CustomUser.objects.filter(username=username).exists():
-                            raise ValueError(f"Username '{username}' already exists")
-
-                        if CustomUser.objects.filter(email=email).exists():
-                            raise ValueError(f"Email '{email}' already exists")
-
-                        # Create user with role based on form selection
-                        user = CustomUser.objects.create(
-                            username=username,
-                            email=email,
-                            password=make_password(row['password'].strip()),
-                            first_name=row.get('first_name', '').strip(),
-                            last_name=row.get('last_name', '').strip(),
-                            role=user_type,  # Use the selected role from the form
-                            phone_no=row.get('phone_no', '').strip(),
-                            city=row.get('city', '').strip(),
-                            country=row.get('country', '').strip(),
-                            bio=row.get('bio', '').strip(),
-                            speciality=row.get('speciality', '').strip()
-                        )
-
-                        # Create role-specific profile
-                        if user_type == 'student':
-                            # Additional validation for student-specific fields
-                            student_id = row.get('student_id', '').strip()
-                            group_id = row.get('group', '').strip()
-
-                            if not student_id:
-                                raise ValueError("Student ID is required for student users")
-
-                            if Student.objects.filter(student_id=student_id).exists():
-                                raise ValueError(f"Student ID '{student_id}' already exists")
-
-                            # Create student profile
-                            student = Student(user=user, student_id=student_id)
-
-                            # Assign group if provided and valid
-                            if group_id:
-                                # First try to match by group name (B1, B2, A1, etc.)
-                                group = Group.objects.filter(group_name=group_id).first()
-
-                                # If not found by name, try by ID (if it's a number)
-                                if not group and group_id.isdigit():
-                                    try:
-                                        group = Group.objects.get(id=int(group_id))
-                                    except Group.DoesNotExist:
-                                        pass
-
-                                # If group was found, assign it
-                                if group:
-                                    student.group = group
-                                else:
-                                    # Log a warning but don't fail the import
-                                    print(f"Warning: Group '{group_id}' not found for student {student_id}")
-
-                            student.save()
-
-                        elif user_type == 'doctor':
-                            Doctor.objects.create(user=user)
-
-                        elif user_type == 'staff':
-                            Staff.objects.create(user=user)
-
-                        success_count += 1
-                except Exception as e:
-                    error_count += 1
-                    error_messages.append(f"Row {reader.line_num}: {str(e)}")
+            try:
+                decoded_file = csv_file.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                messages.error(request, 'Please upload a valid CSV file')
+                return redirect('admin_section:bulk_import_users')
+            reader = csv.DictReader(io.StringIO(decoded_file))
+
+            # Rows are checked up front and created in batches
+            result = import_users(read_rows(reader), role=user_type)
+            success_count = result.success_count
+            error_count = result.error_count
 
             if success_count > 0:
                 messages.success(request, f"Successfully added {success_count} {user_type}s.")
@@ -2666,15 +2345,20 @@ def bulk_import_users(request):
                 'results': {
                     'success_count': success_count,
                     'error_count': error_count,
-                    'error_messages': error_messages[:10],
-                    'total_errors': len(error_messages),
+                    'error_messages': result.error_messages,
+                    'total_errors': error_count,
                     'user_type': user_type
-                }
+                },
+                'job_max_mb': job_max_bytes() // (1024 * 1024),
             })
     else:
         form = CSVUploadForm()
 
-    return render(request, 'admin_section/bulk_import_users.html', {'form': form})
+    return render(request, 'admin_section/bulk_import_users.html', {
+        'form': form,
+        'import_job': requested_job(request),
+        'job_max_mb': job_max_bytes() // (1024 * 1024),
+    })
 
 @login_required
 def download_sample_csv(request):
@@ -2684,34 +2368,8 @@ def download_sample_csv(request):
     return download_user_template(request)
 
 
-def send_admin_emails(admin_emails, subject, message):
-    """
-    Send email notifications to admin users
-
-    Args:
-        admin_emails (list): List of admin email addresses
-        subject (str): Email subject
-        message (str): Email message body
-    """
-    try:
-        from django.core.mail import send_mail
-        from django.conf import settings
-
-        # Send email to all admin users
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=admin_emails,
-            fail_silently=True,
-        )
-    except Exception as e:
-        # Log the error but don't raise it to prevent disrupting the user experience
-        print(f"Error sending admin emails: {str(e)}")
-        # In a production environment, you might want to log this to a file or monitoring service
-
-
 @login_required
+@background_export('admin_section:export_users')
 def export_users(request):
     """Export users in CSV format based on user type"""
     if request.user.role != 'admin':
@@ -2721,147 +2379,127 @@ def export_users(request):
     user_type = request.GET.get('type', 'all')
     today = datetime.now().strftime('%Y-%m-%d')
 
-    # Create HTTP response with CSV content type
-    response = HttpResponse(content_type='text/csv')
+    # Columns shared by every export, read with values_list instead of model instances
+    user_fields = (
+        'username', 'email', 'first_name', 'last_name', 'phone_no', 'city', 'country',
+        'date_joined', 'last_login', 'is_active'
+    )
 
-    # Set filename based on user type
-    if user_type == 'student':
-        filename = f'student_users_export_{today}.csv'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    def contact_columns(row):
+        return [
+            row['phone_no'] or 'N/A',
+            row['city'] or 'N/A',
+            row['country'] or 'N/A',
+            format_datetime(row['date_joined']),
+            format_datetime(row['last_login'], 'Never'),
+            'Yes' if row['is_active'] else 'No'
+        ]
 
-        # Get all student users
-        users = CustomUser.objects.filter(role='student').select_related('student').order_by('username')
+    def doctor_departments():
+        # Map doctor id to a comma separated department list in one query
+        names = {}
+        through = Doctor.departments.through.objects.order_by('department__name')
+        for doctor_id, name in through.values_list('doctor_id', 'department__name').iterator(chunk_size=2000):
+            names.setdefault(doctor_id, []).append(name)
+        return {doctor_id: ', '.join(dept_names) for doctor_id, dept_names in names.items()}
 
-        # Write CSV headers
-        writer = csv.writer(response)
-        writer.writerow([
-            'Username', 'Email', 'First Name', 'Last Name', 'Student ID', 'Group',
-            'Phone Number', 'City', 'Country', 'Date Joined', 'Last Login', 'Is Active'
-        ])
+    def user_rows(users, *extra_fields):
+        fields = user_fields + extra_fields
+        for values in iter_values(users, *fields):
+            yield dict(zip(fields, values))
 
-        # Write data rows
-        for user in users:
-            student_profile = getattr(user, 'student', None)
-            writer.writerow([
-                user.username,
-                user.email,
-                user.first_name,
-                user.last_name,
-                student_profile.student_id if student_profile else 'N/A',
-                student_profile.group.group_name if student_profile and student_profile.group else 'N/A',
-                user.phone_no or 'N/A',
-                user.city or 'N/A',
-                user.country or 'N/A',
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else 'N/A',
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
-                'Yes' if user.is_active else 'No'
-            ])
+    if user_type == 'student':
+        filename = f'student_users_export_{today}.csv'
+        users = CustomUser.objects.filter(role='student').order_by('username')
+
+        def rows():
+            yield [
+                'Username', 'Email', 'First Name', 'Last Name', 'Student ID', 'Group',
+                'Phone Number', 'City', 'Country', 'Date Joined', 'Last Login', 'Is Active'
+            ]
+            for row in user_rows(users, 'student__id', 'student__student_id', 'student__group__group_name'):
+                has_profile = row['student__id'] is not None
+                yield [
+                    row['username'],
+                    row['email'],
+                    row['first_name'],
+                    row['last_name'],
+                    row['student__student_id'] if has_profile else 'N/A',
+                    row['student__group__group_name'] or 'N/A',
+                ] + contact_columns(row)
 
     elif user_type == 'doctor':
         filename = f'doctor_users_export_{today}.csv'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        # Get all doctor users
-        users = CustomUser.objects.filter(role='doctor').select_related('doctor_profile').prefetch_related('doctor_profile__departments').order_by('username')
+        users = CustomUser.objects.filter(role='doctor').order_by('username')
 
-        # Write CSV headers
-        writer = csv.writer(response)
-        writer.writerow([
-            'Username', 'Email', 'First Name', 'Last Name', 'Speciality', 'Departments',
-            'Phone Number', 'City', 'Country', 'Date Joined', 'Last Login', 'Is Active'
-        ])
-
-        # Write data rows
-        for user in users:
-            doctor_profile = getattr(user, 'doctor_profile', None)
-            departments = ', '.join([dept.name for dept in doctor_profile.departments.all()]) if doctor_profile else 'N/A'
-
-            writer.writerow([
-                user.username,
-                user.email,
-                user.first_name,
-                user.last_name,
-                user.speciality or 'N/A',  # speciality is on CustomUser, not Doctor
-                departments,
-                user.phone_no or 'N/A',
-                user.city or 'N/A',
-                user.country or 'N/A',
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else 'N/A',
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
-                'Yes' if user.is_active else 'No'
-            ])
+        def rows():
+            departments = doctor_departments()
+            yield [
+                'Username', 'Email', 'First Name', 'Last Name', 'Speciality', 'Departments',
+                'Phone Number', 'City', 'Country', 'Date Joined', 'Last Login', 'Is Active'
+            ]
+            for row in user_rows(users, 'speciality', 'doctor_profile__id'):
+                doctor_id = row['doctor_profile__id']
+                yield [
+                    row['username'],
+                    row['email'],
+                    row['first_name'],
+                    row['last_name'],
+                    row['speciality'] or 'N/A',  # speciality is on CustomUser, not Doctor
+                    departments.get(doctor_id, '') if doctor_id is not None else 'N/A',
+                ] + contact_columns(row)
 
     elif user_type == 'staff':
         filename = f'staff_users_export_{today}.csv'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        # Get all staff users
-        users = CustomUser.objects.filter(role='staff').select_related('staff_profile').order_by('username')
+        users = CustomUser.objects.filter(role='staff').order_by('username')
 
-        # Write CSV headers
-        writer = csv.writer(response)
-        writer.writerow([
-            'Username', 'Email', 'First Name', 'Last Name', 'Phone Number', 'City', 'Country',
-            'Date Joined', 'Last Login', 'Is Active'
-        ])
-
-        # Write data rows
-        for user in users:
-            writer.writerow([
-                user.username,
-                user.email,
-                user.first_name,
-                user.last_name,
-                user.phone_no or 'N/A',
-                user.city or 'N/A',
-                user.country or 'N/A',
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else 'N/A',
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
-                'Yes' if user.is_active else 'No'
-            ])
+        def rows():
+            yield [
+                'Username', 'Email', 'First Name', 'Last Name', 'Phone Number', 'City', 'Country',
+                'Date Joined', 'Last Login', 'Is Active'
+            ]
+            for row in user_rows(users):
+                yield [
+                    row['username'],
+                    row['email'],
+                    row['first_name'],
+                    row['last_name'],
+                ] + contact_columns(row)
 
     else:  # all users
         filename = f'all_users_export_{today}.csv'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        users = CustomUser.objects.all().order_by('role', 'username')
 
-        # Get all users
-        users = CustomUser.objects.all().select_related('student', 'doctor_profile', 'staff_profile').prefetch_related('doctor_profile__departments').order_by('role', 'username')
-
-        # Write CSV headers
-        writer = csv.writer(response)
-        writer.writerow([
-            'Username', 'Email', 'First Name', 'Last Name', 'Role', 'Student ID', 'Speciality', 'Departments',
-            'Group', 'Phone Number', 'City', 'Country', 'Date Joined', 'Last Login', 'Is Active'
-        ])
-
-        # Write data rows
-        for user in users:
-            student_profile = getattr(user, 'student', None)
-            doctor_profile = getattr(user, 'doctor_profile', None)
-            departments = ', '.join([dept.name for dept in doctor_profile.departments.all()]) if doctor_profile else 'N/A'
-
-            writer.writerow([
-                user.username,
-                user.email,
-                user.first_name,
-                user.last_name,
-                user.role.title(),
-                student_profile.student_id if student_profile else 'N/A',
-                user.speciality or 'N/A',  # speciality is on CustomUser, not Doctor
-                departments,
-                student_profile.group.group_name if student_profile and student_profile.group else 'N/A',
-                user.phone_no or 'N/A',
-                user.city or 'N/A',
-                user.country or 'N/A',
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else 'N/A',
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
-                'Yes' if user.is_active else 'No'
-            ])
-
-    return response
+        def rows():
+            departments = doctor_departments()
+            yield [
+                'Username', 'Email', 'First Name', 'Last Name', 'Role', 'Student ID', 'Speciality', 'Departments',
+                'Group', 'Phone Number', 'City', 'Country', 'Date Joined', 'Last Login', 'Is Active'
+            ]
+            for row in user_rows(
+                users, 'role', 'speciality', 'student__id', 'student__student_id',
+                'student__group__group_name', 'doctor_profile__id'
+            ):
+                doctor_id = row['doctor_profile__id']
+                phone, city, country, joined, last_login, active = contact_columns(row)
+                yield [
+                    row['username'],
+                    row['email'],
+                    row['first_name'],
+                    row['last_name'],
+                    row['role'].title(),
+                    row['student__student_id'] if row['student__id'] is not None else 'N/A',
+                    row['speciality'] or 'N/A',  # speciality is on CustomUser, not Doctor
+                    departments.get(doctor_id, '') if doctor_id is not None else 'N/A',
+                    row['student__group__group_name'] or 'N/A',
+                    phone, city, country, joined, last_login, active
+                ]
+
+    return streaming_csv_response(filename, rows())
 
 
 @login_required
+@background_export('admin_section:export_department_logs')
 def export_department_logs(request):
     """Export all department logs filtered by year and department in PDF or Excel format"""
     # Check if user is admin
@@ -2915,7 +2553,7 @@ def export_department_logs_pdf(logs, filename_base, admin_user, year_ids=None, d
 
     # Create the PDF document with landscape orientation for better table fit
     doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
+    elements = LazyFlowables()
 
     # Add AGU header with logo and university name
     elements = add_agu_header(elements, "Department Logs Report")
@@ -2955,54 +2593,30 @@ def export_department_logs_pdf(logs, filename_base, admin_user, year_ids=None, d
     elements.append(Paragraph(f"Total Records: {logs.count()}", custom_styles['normal']))
     elements.append(Spacer(1, 0.3*inch))
 
-    if logs.exists():
-        # Create table data
-        table_data = [
-            ['Student ID', 'Student Name', 'Department', 'Activity', 'Date', 'Status', 'Tutor', 'Review Date']
+    # Rows are read in chunks while the document is built
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'department__name', 'activity_type__name', 'date',
+        'review_status', 'tutor_id', 'tutor__user__first_name', 'tutor__user__last_name', 'review_date',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name, username),
+            department,
+            activity_type or 'N/A',
+            log_date.strftime('%Y-%m-%d'),
+            status_labels[review_status],
+            full_name(tutor_first_name, tutor_last_name) if tutor_id else 'N/A',
+            format_datetime(review_date, fmt='%Y-%m-%d'),
         ]
-
-        for log in logs:
-            # Determine status
-            if log.is_reviewed:
-                if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED'):
-                    status = 'Rejected'
-                else:
-                    status = 'Approved'
-            else:
-                status = 'Pending'
-
-            table_data.append([
-                log.student.student_id,
-                log.student.user.get_full_name() or log.student.user.username,
-                log.department.name,
-                log.activity_type.name if log.activity_type else 'N/A',
-                log.date.strftime('%Y-%m-%d'),
-                status,
-                log.tutor.user.get_full_name() if log.tutor else 'N/A',
-                log.review_date.strftime('%Y-%m-%d') if log.review_date else 'N/A'
-            ])
-
-        # Create table
-        table = Table(table_data)
-
-        # Define table style
-        table_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ])
-
-        table.setStyle(table_style)
-        elements.append(table)
-    else:
+        for (student_id, first_name, last_name, username, department, activity_type, log_date,
+             review_status, tutor_id, tutor_first_name, tutor_last_name, review_date) in values
+    )
+    headers = ['Student ID', 'Student Name', 'Department', 'Activity', 'Date', 'Status', 'Tutor', 'Review Date']
+    if not add_table(elements, headers, rows, get_table_style('grey', 9, 7)):
         elements.append(Paragraph("No logs found for the selected criteria.", custom_styles['normal']))
 
     # Add footer information
@@ -3013,7 +2627,7 @@ def export_department_logs_pdf(logs, filename_base, admin_user, year_ids=None, d
     )
 
     # Build the PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get the value of the buffer and write it to the response
     pdf = buffer.getvalue()
@@ -3024,187 +2638,95 @@ def export_department_logs_pdf(logs, filename_base, admin_user, year_ids=None, d
 
 
 def export_department_logs_excel(logs, filename_base, year_ids=None, department_id=None):
-    """Export department logs as Excel file with AGU logo using openpyxl directly"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, PatternFill
-    from openpyxl.utils import get_column_letter
-
-    # Create a new workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Student Logs"
-
-    # Add summary information first
-    total_logs = logs.count()
-    approved_logs = logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-    pending_logs = logs.filter(is_reviewed=False).count()
-    rejected_logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
-
-    # Define styles
-    title_font = Font(bold=True, size=16)
-    header_font = Font(bold=True, size=12)
-    bold_font = Font(bold=True)
-
-    # Add AGU header
-    ws['A1'] = 'Arabian Gulf University - Student Logs Export'
-    ws['A1'].font = title_font
-    ws.merge_cells('A1:M1')
-
-    # Add export information
-    row = 3
-    ws[f'A{row}'] = 'Export Date:'
-    ws[f'B{row}'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-    ws[f'A{row}'].font = bold_font
-
-    row += 1
+    """Export department logs as a write-only Excel workbook"""
+    summary = summarize_logs(logs)
+
+    # Add AGU header and export information
+    preamble = [
+        [Styled('Arabian Gulf University - Student Logs Export', font=TITLE_FONT)],
+        [],
+        [Styled('Export Date:', font=BOLD_FONT), timezone.now().strftime('%Y-%m-%d %H:%M:%S')],
+    ]
+
     # Add filter information
     if year_ids:
-        try:
-            years = LogYear.objects.filter(id__in=year_ids).values_list('year_name', flat=True)
-            if years:
-                year_names = list(years)
-                if len(year_names) == 1:
-                    ws[f'A{row}'] = 'Academic Year:'
-                    ws[f'B{row}'] = year_names[0]
-                else:
-                    ws[f'A{row}'] = 'Academic Years:'
-                    ws[f'B{row}'] = ', '.join(year_names)
-        except Exception:
-            pass
+        year_names = list(LogYear.objects.filter(id__in=year_ids).values_list('year_name', flat=True))
+        if len(year_names) == 1:
+            preamble.append([Styled('Academic Year:', font=BOLD_FONT), year_names[0]])
+        elif year_names:
+            preamble.append([Styled('Academic Years:', font=BOLD_FONT), ', '.join(year_names)])
+        else:
+            preamble.append([])
     else:
-        ws[f'A{row}'] = 'Academic Years:'
-        ws[f'B{row}'] = 'All Years'
-    ws[f'A{row}'].font = bold_font
+        preamble.append([Styled('Academic Years:', font=BOLD_FONT), 'All Years'])
 
-    row += 1
+    department_name = 'All Departments'
     if department_id:
-        try:
-            department = Department.objects.get(id=department_id)
-            ws[f'A{row}'] = 'Department:'
-            ws[f'B{row}'] = department.name
-        except Department.DoesNotExist:
-            ws[f'A{row}'] = 'Department:'
-            ws[f'B{row}'] = 'All Departments'
-    else:
-        ws[f'A{row}'] = 'Department:'
-        ws[f'B{row}'] = 'All Departments'
-    ws[f'A{row}'].font = bold_font
+        department_name = Department.objects.filter(id=department_id).values_list('name', flat=True).first() or department_name
+    preamble.append([Styled('Department:', font=BOLD_FONT), department_name])
 
     # Add summary statistics
-    row += 2
-    ws[f'A{row}'] = 'Summary Statistics:'
-    ws[f'A{row}'].font = header_font
-
-    row += 1
-    ws[f'A{row}'] = 'Total Records:'
-    ws[f'B{row}'] = total_logs
-    ws[f'A{row}'].font = bold_font
-
-    row += 1
-    ws[f'A{row}'] = 'Approved Logs:'
-    ws[f'B{row}'] = approved_logs
-    ws[f'A{row}'].font = bold_font
-
-    row += 1
-    ws[f'A{row}'] = 'Pending Logs:'
-    ws[f'B{row}'] = pending_logs
-    ws[f'A{row}'].font = bold_font
-
-    row += 1
-    ws[f'A{row}'] = 'Rejected Logs:'
-    ws[f'B{row}'] = rejected_logs
-    ws[f'A{row}'].font = bold_font
-
-    # Add data headers
-    row += 3
+    preamble += [
+        [],
+        [Styled('Summary Statistics:', font=SECTION_FONT)],
+        [Styled('Total Records:', font=BOLD_FONT), summary['total']],
+        [Styled('Approved Logs:', font=BOLD_FONT), summary['approved']],
+        [Styled('Pending Logs:', font=BOLD_FONT), summary['pending']],
+        [Styled('Rejected Logs:', font=BOLD_FONT), summary['rejected']],
+        [],
+        [],
+    ]
+
     headers = [
         'Student ID', 'Student Name', 'Email', 'Group', 'Department',
         'Activity Type', 'Core Diagnosis', 'Date', 'Status', 'Tutor',
         'Review Date', 'Reviewer Comments', 'Created At'
     ]
 
-    # Style the header row
-    header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-    header_font_white = Font(bold=True, color='FFFFFF')
-
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = header_font_white
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center')
-
-    # Add data rows
-    for log in logs:
-        row += 1
-
-        # Determine status
-        if log.is_reviewed:
-            if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED'):
-                status = 'Rejected'
-            else:
-                status = 'Approved'
-        else:
-            status = 'Pending'
-
-        data_row = [
-            str(log.student.student_id) if log.student.student_id else '',
-            log.student.user.get_full_name() or log.student.user.username or '',
-            log.student.user.email or '',
-            log.student.group.group_name if log.student.group else 'N/A',
-            log.department.name if log.department else 'N/A',
-            log.activity_type.name if log.activity_type else 'N/A',
-            log.core_diagnosis.name if log.core_diagnosis else 'N/A',
-            log.date.strftime('%Y-%m-%d') if log.date else '',
-            status,
-            log.tutor.user.get_full_name() if log.tutor else 'N/A',
-            log.review_date.strftime('%Y-%m-%d') if log.review_date else 'N/A',
-            (log.reviewer_comments[:100] + '...' if log.reviewer_comments and len(log.reviewer_comments) > 100 else (log.reviewer_comments or '')),
-            log.created_at.strftime('%Y-%m-%d %H:%M:%S') if log.created_at else ''
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'student__user__email', 'student__group__group_name',
+        'department__name', 'activity_type__name', 'core_diagnosis__name', 'date', 'review_status',
+        'tutor__user__first_name', 'tutor__user__last_name', 'review_date', 'reviewer_comments', 'created_at',
+    )
+    rows = (
+        [
+            str(student_id) if student_id else '',
+            full_name(first_name, last_name, username),
+            email or '',
+            group or 'N/A',
+            department or 'N/A',
+            activity_type or 'N/A',
+            core_diagnosis or 'N/A',
+            format_datetime(log_date, '', '%Y-%m-%d'),
+            status_labels[review_status],
+            full_name(tutor_first, tutor_last),
+            format_datetime(review_date, fmt='%Y-%m-%d'),
+            comments[:100] + '...' if comments and len(comments) > 100 else (comments or ''),
+            format_datetime(created_at, ''),
         ]
-
-        for col, value in enumerate(data_row, 1):
-            ws.cell(row=row, column=col, value=value)
-
-    # Auto-adjust column widths
-    for col in range(1, len(headers) + 1):
-        column_letter = get_column_letter(col)
-        max_length = 0
-        for row_cells in ws[column_letter]:
-            try:
-                if len(str(row_cells.value)) > max_length:
-                    max_length = len(str(row_cells.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Save to BytesIO
-    from io import BytesIO
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    # Create HTTP response
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        for (student_id, first_name, last_name, username, email, group, department, activity_type,
+             core_diagnosis, log_date, review_status, tutor_first, tutor_last, review_date,
+             comments, created_at) in values
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
 
-    return response
+    wb = new_workbook()
+    ws, _, _ = write_table(wb, "Student Logs", headers, rows, preamble=preamble)
+    ws.merged_cells.add('A1:M1')
 
+    return workbook_response(wb, f"{filename_base}.xlsx")
 
-def export_department_logs_csv(logs, filename_base, year_ids=None, department_id=None):
-    """Export department logs as CSV file"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-
-    writer = csv.writer(response)
 
+def export_department_logs_csv(logs, filename_base, year_ids=None, department_id=None):
+    """Export department logs as a streamed CSV file"""
     # Add AGU header information
-    writer.writerow(['Arabian Gulf University - Department Logs Export'])
-    writer.writerow([''])
-    writer.writerow(['Export Date:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
+    header_rows = [
+        ['Arabian Gulf University - Department Logs Export'],
+        [''],
+        ['Export Date:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')],
+    ]
 
     # Add filter information
     if year_ids:
@@ -3213,70 +2735,70 @@ def export_department_logs_csv(logs, filename_base, year_ids=None, department_id
             if years:
                 year_names = list(years)
                 if len(year_names) == 1:
-                    writer.writerow(['Academic Year:', year_names[0]])
+                    header_rows.append(['Academic Year:', year_names[0]])
                 else:
-                    writer.writerow(['Academic Years:', ', '.join(year_names)])
+                    header_rows.append(['Academic Years:', ', '.join(year_names)])
         except Exception:
             pass
     else:
-        writer.writerow(['Academic Years:', 'All Years'])
+        header_rows.append(['Academic Years:', 'All Years'])
 
     if department_id:
         try:
             department = Department.objects.get(id=department_id)
-            writer.writerow(['Department:', department.name])
+            header_rows.append(['Department:', department.name])
         except Department.DoesNotExist:
-            writer.writerow(['Department:', 'All Departments'])
+            header_rows.append(['Department:', 'All Departments'])
     else:
-        writer.writerow(['Department:', 'All Departments'])
+        header_rows.append(['Department:', 'All Departments'])
 
     # Add summary statistics
-    total_logs = logs.count()
-    approved_logs = logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-    pending_logs = logs.filter(is_reviewed=False).count()
-    rejected_logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
-
-    writer.writerow([''])
-    writer.writerow(['Summary Statistics:'])
-    writer.writerow(['Total Records:', total_logs])
-    writer.writerow(['Approved Logs:', approved_logs])
-    writer.writerow(['Pending Logs:', pending_logs])
-    writer.writerow(['Rejected Logs:', rejected_logs])
-    writer.writerow([''])
-    writer.writerow([''])
-
-    # Write header row for data
-    writer.writerow([
-        'Student ID', 'Student Name', 'Email', 'Group', 'Department',
-        'Activity Type', 'Core Diagnosis', 'Date', 'Status', 'Tutor',
-        'Review Date', 'Reviewer Comments', 'Created At'
-    ])
-
-    # Write data rows
-    for log in logs:
-        # Determine status
-        if log.is_reviewed:
-            if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED'):
-                status = 'Rejected'
-            else:
-                status = 'Approved'
-        else:
-            status = 'Pending'
-
-        writer.writerow([
-            log.student.student_id if log.student.student_id else '',
-            log.student.user.get_full_name() or log.student.user.username or '',
-            log.student.user.email or '',
-            log.student.group.group_name if log.student.group else 'N/A',
-            log.department.name if log.department else 'N/A',
-            log.activity_type.name if log.activity_type else 'N/A',
-            log.core_diagnosis.name if log.core_diagnosis else 'N/A',
-            log.date.strftime('%Y-%m-%d') if log.date else '',
-            status,
-            log.tutor.user.get_full_name() if log.tutor else 'N/A',
-            log.review_date.strftime('%Y-%m-%d') if log.review_date else 'N/A',
-            log.reviewer_comments or '',
-            log.created_at.strftime('%Y-%m-%d %H:%M:%S') if log.created_at else ''
-        ])
+    summary = summarize_logs(logs)
+    header_rows += [
+        [''],
+        ['Summary Statistics:'],
+        ['Total Records:', summary['total']],
+        ['Approved Logs:', summary['approved']],
+        ['Pending Logs:', summary['pending']],
+        ['Rejected Logs:', summary['rejected']],
+        [''],
+        [''],
+        # Header row for data
+        [
+            'Student ID', 'Student Name', 'Email', 'Group', 'Department',
+            'Activity Type', 'Core Diagnosis', 'Date', 'Status', 'Tutor',
+            'Review Date', 'Reviewer Comments', 'Created At'
+        ],
+    ]
 
-    return response
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'student__user__email', 'student__group__group_name',
+        'department__name', 'activity_type__name', 'core_diagnosis__name', 'date', 'review_status',
+        'tutor__user__first_name', 'tutor__user__last_name', 'review_date', 'reviewer_comments', 'created_at',
+    )
+
+    def rows():
+        yield from header_rows
+        for (student_id, first_name, last_name, username, email, group, department, activity_type,
+             core_diagnosis, log_date, review_status, tutor_first, tutor_last, review_date,
+             comments, created_at) in values:
+            yield [
+                student_id or '',
+                full_name(first_name, last_name, username),
+                email or '',
+                group or 'N/A',
+                department or 'N/A',
+                activity_type or 'N/A',
+                core_diagnosis or 'N/A',
+                format_datetime(log_date, '', '%Y-%m-%d'),
+                status_labels[review_status],
+                full_name(tutor_first, tutor_last),
+                format_datetime(review_date, fmt='%Y-%m-%d'),
+                comments or '',
+                format_datetime(created_at, ''),
+            ]
+
+    return streaming_csv_response(f"{filename_base}.csv", rows())
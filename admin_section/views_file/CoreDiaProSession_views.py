@@ -3,14 +3,14 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from .adding_forms import CoreDiaProSessionForm
-from admin_section.models import CoreDiaProSession, Department
+from admin_section.models import CoreDiaProSession
 from ..models import ActivityType
 import logging
 from django.http import JsonResponse, HttpResponse
 from django.db.models import Q
-import io
-import csv
 import tablib
+from ..core_session_import import import_core_sessions, read_session_rows
+from ..import_jobs import job_max_bytes, queue_import, queued_response, requested_job, sync_max_bytes
 
 logger = logging.getLogger(__name__)
 
@@ -43,74 +43,30 @@ def core_dia_pro_session_list(request):
     # Bulk upload
     if request.method == 'POST' and request.FILES.get('bulk_file'):
         bulk_file = request.FILES['bulk_file']
-        filename = bulk_file.name.lower()
-        try:
-            content = bulk_file.read()
-            rows = []
-            if filename.endswith('.csv'):
-                text = content.decode('utf-8-sig')
-                reader = csv.DictReader(io.StringIO(text))
-                rows = list(reader)
-            elif filename.endswith(('.xls', '.xlsx')):
-                dataset = tablib.Dataset().load(content, format='xlsx')
-                rows = list(dataset.dict)
-            else:
+        # Large files are imported by the run_import_worker command
+        if request.POST.get('background') or bulk_file.size > sync_max_bytes():
+            if not bulk_file.name.lower().endswith(('.csv', '.xls', '.xlsx')):
                 messages.error(request, 'Unsupported file type. Upload a .csv, .xls, or .xlsx file.')
-                return redirect('admin_section:core_dia_pro_session_list')
-
-            if not rows:
-                messages.error(request, 'Uploaded file contains no rows.')
-                return redirect('admin_section:core_dia_pro_session_list')
-
-            # Normalize headers from first row
-            first_row = rows[0]
-            headers = [str(h).strip().lower() for h in first_row.keys()]
-            required = ['name', 'department', 'activity_type']
-            missing = [c for c in required if c not in headers]
-            if missing:
-                messages.error(request, f'Missing required columns: {", ".join(missing)}. Expected columns: name, department, activity_type')
-                return redirect('admin_section:core_dia_pro_session_list')
-
-            create_objs = []
-            errors = []
-            for idx, raw_row in enumerate(rows, start=1):
-                # Normalize each row: keys lowercased
-                row = {str(k).strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in raw_row.items()}
-                name = row.get('name')
-                dept_name = row.get('department')
-                activity_name = row.get('activity_type')
-
-                if not name:
-                    errors.append(f'Row {idx}: missing session name')
-                    continue
-                if not dept_name:
-                    errors.append(f'Row {idx}: missing department')
-                    continue
-                if not activity_name:
-                    errors.append(f'Row {idx}: missing activity_type')
-                    continue
-
-                dept = Department.objects.filter(name__iexact=str(dept_name).strip()).first()
-                if not dept:
-                    errors.append(f'Row {idx}: department "{dept_name}" not found')
-                    continue
-
-                activity = ActivityType.objects.filter(name__iexact=str(activity_name).strip(), department=dept).first()
-                if not activity:
-                    errors.append(f'Row {idx}: activity_type "{activity_name}" not found for department "{dept.name}"')
-                    continue
-
-                # Skip if duplicate exists
-                if CoreDiaProSession.objects.filter(name__iexact=str(name).strip(), department=dept, activity_type=activity).exists():
-                    errors.append(f'Row {idx}: session "{name}" already exists for department "{dept.name}" and activity "{activity.name}"')
-                    continue
+            elif bulk_file.size > job_max_bytes():
+                messages.error(request, f'File size must be under {job_max_bytes() // (1024 * 1024)}MB.')
+            else:
+                job = queue_import(request.user, 'core_sessions', bulk_file)
+                messages.success(request, f'{bulk_file.name} is being imported in the background.')
+                return queued_response(request, job, 'admin_section:core_dia_pro_session_list')
+            return redirect('admin_section:core_dia_pro_session_list')
 
-                create_objs.append(CoreDiaProSession(name=str(name).strip(), department=dept, activity_type=activity))
+        try:
+            rows = read_session_rows(bulk_file.read(), bulk_file.name)
+        except ValueError as exc:
+            messages.error(request, str(exc))
+            return redirect('admin_section:core_dia_pro_session_list')
 
-            if create_objs:
-                CoreDiaProSession.objects.bulk_create(create_objs)
-                messages.success(request, f'Created {len(create_objs)} session(s)')
+        try:
+            result = import_core_sessions(rows)
+            if result.success_count:
+                messages.success(request, f'Created {result.success_count} session(s)')
 
+            errors = result.error_messages
             if errors:
                 for err in errors[:30]:
                     messages.error(request, err)
@@ -141,6 +97,7 @@ def core_dia_pro_session_list(request):
         'form': CoreDiaProSessionForm(),
         'editing': False,
         'search_query': search_query,
+        'import_job': requested_job(request),
     }
     return render(request, 'admin_section/core_dia_pro_session_list.html', context)
 
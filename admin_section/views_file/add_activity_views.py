@@ -8,6 +8,8 @@ from django.http import HttpResponseRedirect, HttpResponse
 import io
 import csv
 import tablib
+from student_section.catalog import invalidate_catalog
+from utils.conditional import bump_model_versions
 
 @login_required
 def add_activity_type(request):
@@ -93,6 +95,9 @@ def add_activity_type(request):
 
             if create_objs:
                 ActivityType.objects.bulk_create(create_objs)
+                # bulk_create sends no signals
+                bump_model_versions(ActivityType)
+                invalidate_catalog()
                 successes.append(f'Created {len(create_objs)} activity type(s)')
 
             if successes:
@@ -2,7 +2,6 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.contrib.auth.hashers import make_password
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from django.http import HttpResponse
@@ -11,6 +10,7 @@ import csv
 import io
 from accounts.models import CustomUser, Doctor
 from admin_section.models import Department, AdminNotification
+from admin_section.user_import import import_users, read_rows
 from admin_section.forms import DoctorUserForm, DoctorForm, AssignDoctorToDepartmentForm, BulkDoctorUploadForm
 
 
@@ -146,45 +146,16 @@ def add_doctor(request):
                     messages.error(request, f'Missing required fields: {", ".join(missing_fields)}')
                     return redirect('admin_section:add_doctor')
 
-                # Process CSV data
-                success_count = 0
-                error_count = 0
-                errors = []
-
-                for row in reader:
-                    try:
-                        with transaction.atomic():
-                            # Create user
-                            user = CustomUser.objects.create(
-                                username=row['username'].strip(),
-                                email=row['email'].strip(),
-                                password=make_password(row['password'].strip()),
-                                first_name=row['first_name'].strip(),
-                                last_name=row['last_name'].strip(),
-                                phone_no=row['phone_no'].strip(),
-                                city=row['city'].strip(),
-                                country=row['country'].strip(),
-                                speciality=row.get('speciality', '').strip(),
-                                bio=row.get('bio', '').strip(),
-                                role='doctor'
-                            )
-
-                            # Create doctor profile
-                            doctor = Doctor.objects.create(user=user)
-
-                            # Add to department
-                            doctor.departments.add(department)
-
-                            success_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"Row {reader.line_num}: {str(e)}")
+                # Rows are checked up front and created in batches
+                result = import_users(read_rows(reader), role='doctor', departments=[department])
+                success_count = result.success_count
+                error_count = result.error_count
 
                 # Prepare results for display
                 bulk_results = {
                     'success_count': success_count,
                     'error_count': error_count,
-                    'errors': errors[:10]  # Limit to first 10 errors
+                    'errors': result.error_messages,
                 }
 
                 if success_count > 0:
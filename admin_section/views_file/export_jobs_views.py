@@ -0,0 +1,28 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from ..export_jobs import job_payload
+from ..models import ExportJob
+
+
+@login_required
+def export_job_status(request, token):
+    """Return the progress of one of the user's export jobs for polling"""
+    job = get_object_or_404(ExportJob, token=token, user=request.user)
+    return JsonResponse(job_payload(job))
+
+
+@login_required
+def export_job_download(request, token):
+    """Download the artifact of a finished export job"""
+    job = get_object_or_404(ExportJob, token=token, user=request.user, status=ExportJob.STATUS_DONE)
+    if not job.file:
+        raise Http404("Export file is no longer available")
+    try:
+        artifact = job.file.open('rb')
+    except FileNotFoundError:
+        raise Http404("Export file is no longer available")
+    return FileResponse(
+        artifact, as_attachment=True, filename=job.filename,
+        content_type=job.content_type or 'application/octet-stream'
+    )
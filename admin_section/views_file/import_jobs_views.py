@@ -0,0 +1,20 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from ..import_jobs import job_payload
+from ..models import ImportJob
+
+
+@login_required
+def import_job_status(request, token):
+    """Return the progress and row errors of one of the user's import jobs for polling
+
+    Pollers pass ``errors_from`` with the number of row errors they already
+    have to receive only the new ones.
+    """
+    job = get_object_or_404(ImportJob, token=token, user=request.user)
+    try:
+        errors_from = max(0, int(request.GET.get('errors_from', 0)))
+    except ValueError:
+        errors_from = 0
+    return JsonResponse(job_payload(job, errors_from=errors_from))
@@ -1,59 +1,53 @@
-from import_export import resources, fields
-from import_export.widgets import ForeignKeyWidget
-from admin_section.models import CoreDiaProSession, ActivityType, Department
-from django.db.models import Q
-from django.db import transaction
+from import_export import resources
+
+from admin_section.core_session_import import BATCH_SIZE, SessionIndex, normalize_row
+from admin_section.models import CoreDiaProSession
+from student_section.catalog import invalidate_catalog
+from utils.conditional import bump_model_versions
+
 
 class CoreDiaProSessionResource(resources.ModelResource):
-    activity_type = fields.Field(
-        column_name='activity_type',
-        attribute='activity_type',
-        widget=ForeignKeyWidget(ActivityType, field='name')
-    )
-    department = fields.Field(
-        column_name='department',
-        attribute='department',
-        widget=ForeignKeyWidget(Department, field='name')
-    )
+    """
+    Import sessions named by ``name``, ``department`` and ``activity_type``
+
+    Every row is a new session: rows are resolved against a SessionIndex
+    loaded once in ``before_import`` (which also creates missing activity
+    types), rows repeating an existing session are skipped, and the rest
+    are inserted with ``bulk_create``.
+    """
 
     class Meta:
         model = CoreDiaProSession
         fields = ('name', 'activity_type', 'department')
         import_id_fields = ('name', 'activity_type', 'department')
-        skip_unchanged = True
         report_skipped = True
+        # Existing sessions are recognised in memory, see skip_row()
+        force_init_instance = True
+        skip_diff = True
+        use_bulk = True
+        batch_size = BATCH_SIZE
 
-    def before_import_row(self, row, **kwargs):
-        activity_type_name = row.get('name', '').strip()
-        department_name = row.get('department', '').strip()
-        
-        if not activity_type_name or not department_name:
-            raise ValueError("Activity type and department are required")
+    def before_import(self, dataset, **kwargs):
+        self._index = SessionIndex([normalize_row(row) for row in dataset.dict], create_activity_types=True)
+        self._created = 0
 
+    def import_instance(self, instance, row, **kwargs):
+        session = self._index.resolve(normalize_row(row))
+        instance.name = session.name
+        instance.department = session.department
+        instance.activity_type = session.activity_type
+
+    def skip_row(self, instance, original, row, import_validation_errors=None):
         try:
-            # Get department first
-            department = Department.objects.get(name=department_name)
-            
-            # Use get_or_create instead of filter/create
-            activity_type, created = ActivityType.objects.get_or_create(
-                name=activity_type_name,
-                department=department,
-                defaults={'name': activity_type_name}
-            )
-            
-            # Update row with the correct activity type name
-            row['activity_type'] = activity_type.name
-            row['department'] = department.name
-
-        except Department.DoesNotExist:
-            raise ValueError(f"Department '{department_name}' not found")
-        except Exception as e:
-            raise ValueError(f"Error processing row: {str(e)}")
-
-    def skip_row(self, instance, original):
-        # Skip if exact duplicate exists
-        return CoreDiaProSession.objects.filter(
-            name=instance.name,
-            activity_type=instance.activity_type,
-            department=instance.department
-        ).exists()
+            self._index.claim(instance)
+        except ValueError:
+            return True
+        self._created += 1
+        return False
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if self._created and not self._is_dry_run(kwargs):
+            # bulk_create sends no signals
+            bump_model_versions(CoreDiaProSession)
+            invalidate_catalog()
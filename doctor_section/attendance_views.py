@@ -10,16 +10,21 @@ from datetime import date, timedelta
 import csv
 import io
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.units import inch
-import tablib
-from utils.pdf_utils import add_agu_header, get_common_styles, add_footer_info
+from admin_section.export_jobs import background_export
+from utils.pdf_utils import (
+    add_agu_header, get_common_styles, add_footer_info, add_table, get_table_style, LazyFlowables, build_pdf,
+)
+from utils.csv_export import streaming_csv_response, iter_values, full_name
+from utils.excel_export import new_workbook, write_table, workbook_response
+from utils.conditional import conditional_json
 from .models import StudentAttendance
 from .forms import AttendanceForm, StudentAttendanceForm
-from accounts.models import Student, Doctor
-from admin_section.models import MappedAttendance, TrainingSite, Group, DateRestrictionSettings
+from accounts.models import Student, Doctor, CustomUser
+from admin_section.date_settings import get_date_settings
+from admin_section.models import MappedAttendance, TrainingSite, Group
 
 
 @login_required
@@ -31,7 +36,7 @@ def take_attendance(request):
         return redirect('doctor_section:doctor_dash')
 
     # Check if attendance tracking is enabled
-    settings = DateRestrictionSettings.objects.first()
+    settings = get_date_settings()
     if settings and not settings.attendance_tracking_enabled:
         messages.error(request, "Student attendance tracking is currently disabled by the administrator.")
         return redirect('doctor_section:doctor_dash')
@@ -92,7 +97,7 @@ def take_attendance(request):
         form = AttendanceForm(doctor=doctor)
 
     # Get date restriction settings
-    date_settings = DateRestrictionSettings.objects.first()
+    date_settings = get_date_settings()
     doctor_past_days_limit = date_settings.doctor_past_days_limit if date_settings else 30
 
     context = {
@@ -188,7 +193,7 @@ def process_attendance_submission(request, doctor, training_site, attendance_dat
 def attendance_history(request):
     """View attendance history for the doctor with enhanced filtering"""
     # Check if attendance tracking is enabled
-    settings = DateRestrictionSettings.objects.first()
+    settings = get_date_settings()
     if settings and not settings.attendance_tracking_enabled:
         messages.error(request, "Student attendance tracking is currently disabled by the administrator.")
         return redirect('doctor_section:doctor_dash')
@@ -308,6 +313,8 @@ def attendance_history(request):
 
 
 @login_required
+@conditional_json(MappedAttendance, MappedAttendance.doctors.through, MappedAttendance.groups.through,
+                  TrainingSite, Group, Student, CustomUser, StudentAttendance, daily=True)
 def get_students_for_site(request):
     """AJAX endpoint to get students for a selected training site"""
     try:
@@ -350,7 +357,7 @@ def get_students_for_site(request):
 def attendance_summary(request):
     """View attendance summary and statistics"""
     # Check if attendance tracking is enabled
-    settings = DateRestrictionSettings.objects.first()
+    settings = get_date_settings()
     if settings and not settings.attendance_tracking_enabled:
         messages.error(request, "Student attendance tracking is currently disabled by the administrator.")
         return redirect('doctor_section:doctor_dash')
@@ -455,10 +462,11 @@ def debug_doctor_status(request):
 
 
 @login_required
+@background_export('doctor_section:export_attendance')
 def export_attendance(request):
     """Export attendance records as CSV, PDF, or Excel based on the current filters"""
     # Check if attendance tracking is enabled
-    settings = DateRestrictionSettings.objects.first()
+    settings = get_date_settings()
     if settings and not settings.attendance_tracking_enabled:
         messages.error(request, "Student attendance tracking is currently disabled by the administrator.")
         return redirect('doctor_section:doctor_dash')
@@ -549,32 +557,34 @@ def export_attendance(request):
 
 
 def export_attendance_csv(attendances, filename_base):
-    """Export attendance records as CSV file"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-
-    writer = csv.writer(response)
-
-    # Write header row
-    writer.writerow([
-        'Student ID', 'Student Name', 'Training Site', 'Group',
-        'Date', 'Status', 'Marked At', 'Notes'
-    ])
-
-    # Write data rows
-    for attendance in attendances:
-        writer.writerow([
-            attendance.student.student_id,
-            attendance.student.user.get_full_name() or attendance.student.user.username,
-            attendance.training_site.name,
-            attendance.group.group_name,
-            attendance.date.strftime('%Y-%m-%d'),
-            attendance.status.title(),
-            attendance.marked_at.strftime('%Y-%m-%d %H:%M:%S'),
-            attendance.notes or ''
-        ])
+    """Export attendance records as a streamed CSV file"""
+    values = iter_values(
+        attendances,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'training_site__name', 'group__group_name',
+        'date', 'status', 'marked_at', 'notes',
+    )
 
-    return response
+    def rows():
+        # Header row
+        yield [
+            'Student ID', 'Student Name', 'Training Site', 'Group',
+            'Date', 'Status', 'Marked At', 'Notes'
+        ]
+        for (student_id, first_name, last_name, username, training_site, group,
+             attendance_date, status, marked_at, notes) in values:
+            yield [
+                student_id,
+                full_name(first_name, last_name, username),
+                training_site,
+                group,
+                attendance_date.strftime('%Y-%m-%d'),
+                status.title(),
+                marked_at.strftime('%Y-%m-%d %H:%M:%S'),
+                notes or ''
+            ]
+
+    return streaming_csv_response(f"{filename_base}.csv", rows())
 
 
 def export_attendance_pdf(attendances, filename_base, doctor):
@@ -587,7 +597,7 @@ def export_attendance_pdf(attendances, filename_base, doctor):
 
     # Create the PDF document with landscape orientation for better table fit
     doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
+    elements = LazyFlowables()
 
     # Add AGU header with logo and university name
     elements = add_agu_header(elements, "Attendance Records Report")
@@ -601,45 +611,29 @@ def export_attendance_pdf(attendances, filename_base, doctor):
     elements.append(Paragraph(f"Total Records: {attendances.count()}", custom_styles['normal']))
     elements.append(Spacer(1, 0.3*inch))
 
-    if attendances.exists():
-        # Create table data
-        table_data = [
-            ['Student ID', 'Student Name', 'Training Site', 'Group', 'Date', 'Status', 'Marked At', 'Notes']
+    # Rows are read in chunks while the document is built
+    values = iter_values(
+        attendances,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'training_site__name', 'group__group_name',
+        'date', 'status', 'marked_at', 'notes',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name, username),
+            training_site,
+            group,
+            attendance_date.strftime('%Y-%m-%d'),
+            status.title(),
+            marked_at.strftime('%Y-%m-%d %H:%M'),
+            notes[:50] + '...' if notes and len(notes) > 50 else (notes or '')
         ]
-
-        for attendance in attendances:
-            table_data.append([
-                attendance.student.student_id,
-                attendance.student.user.get_full_name() or attendance.student.user.username,
-                attendance.training_site.name,
-                attendance.group.group_name,
-                attendance.date.strftime('%Y-%m-%d'),
-                attendance.status.title(),
-                attendance.marked_at.strftime('%Y-%m-%d %H:%M'),
-                attendance.notes[:50] + '...' if attendance.notes and len(attendance.notes) > 50 else (attendance.notes or '')
-            ])
-
-        # Create table
-        table = Table(table_data)
-
-        # Define table style
-        table_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ])
-
-        table.setStyle(table_style)
-        elements.append(table)
-    else:
+        for (student_id, first_name, last_name, username, training_site, group,
+             attendance_date, status, marked_at, notes) in values
+    )
+    headers = ['Student ID', 'Student Name', 'Training Site', 'Group', 'Date', 'Status', 'Marked At', 'Notes']
+    if not add_table(elements, headers, rows, get_table_style('grey', 10, 8)):
         elements.append(Paragraph("No attendance records found for the selected criteria.", custom_styles['normal']))
 
     # Add footer information
@@ -650,7 +644,7 @@ def export_attendance_pdf(attendances, filename_base, doctor):
     )
 
     # Build the PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get the value of the buffer and write it to the response
     pdf = buffer.getvalue()
@@ -661,37 +655,35 @@ def export_attendance_pdf(attendances, filename_base, doctor):
 
 
 def export_attendance_excel(attendances, filename_base):
-    """Export attendance records as Excel file"""
-    # Create a new dataset
-    data = tablib.Dataset()
-
-    # Add headers
-    data.headers = [
+    """Export attendance records as a write-only Excel workbook"""
+    headers = [
         'Student ID', 'Student Name', 'Training Site', 'Group',
         'Date', 'Status', 'Marked At', 'Notes'
     ]
-
-    # Add data rows
-    for attendance in attendances:
-        data.append([
-            attendance.student.student_id,
-            attendance.student.user.get_full_name() or attendance.student.user.username,
-            attendance.training_site.name,
-            attendance.group.group_name,
-            attendance.date.strftime('%Y-%m-%d'),
-            attendance.status.title(),
-            attendance.marked_at.strftime('%Y-%m-%d %H:%M:%S'),
-            attendance.notes or ''
-        ])
-
-    # Create HTTP response with Excel content type
-    response = HttpResponse(
-        data.export('xlsx'),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    values = iter_values(
+        attendances,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'training_site__name', 'group__group_name',
+        'date', 'status', 'marked_at', 'notes',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name, username),
+            training_site,
+            group,
+            attendance_date.strftime('%Y-%m-%d'),
+            status.title(),
+            marked_at.strftime('%Y-%m-%d %H:%M:%S'),
+            notes or ''
+        ]
+        for (student_id, first_name, last_name, username, training_site, group,
+             attendance_date, status, marked_at, notes) in values
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
 
-    return response
+    wb = new_workbook()
+    write_table(wb, 'Attendance', headers, rows)
+    return workbook_response(wb, f"{filename_base}.xlsx")
 
 
 @login_required
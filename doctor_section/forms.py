@@ -4,7 +4,8 @@ from datetime import date, timedelta
 from .models import DoctorSupportTicket, StudentAttendance
 from student_section.models import StudentLogFormModel
 from accounts.models import Student
-from admin_section.models import MappedAttendance, TrainingSite, DateRestrictionSettings
+from admin_section.date_settings import get_date_settings
+from admin_section.models import MappedAttendance, TrainingSite
 
 class DoctorSupportTicketForm(forms.ModelForm):
     class Meta:
@@ -124,7 +125,7 @@ class AttendanceForm(forms.Form):
         super().__init__(*args, **kwargs)
         
         # Get date restriction settings
-        settings = DateRestrictionSettings.objects.first()
+        settings = get_date_settings()
         today = date.today()
         
         # Set date limits based on admin settings
@@ -174,7 +175,7 @@ class AttendanceForm(forms.Form):
         today = date.today()
         
         # Get date restriction settings
-        settings = DateRestrictionSettings.objects.first()
+        settings = get_date_settings()
         
         if settings and settings.is_active:
             # Use doctor-specific settings
@@ -2,12 +2,11 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db.models import Q
 from datetime import timedelta
-from django.core.mail import send_mail
-from django.conf import settings as django_settings
 
 from student_section.models import StudentLogFormModel
 from doctor_section.models import Notification
 from admin_section.models import DateRestrictionSettings
+from admin_section.outbox import queue_email
 
 
 class Command(BaseCommand):
@@ -78,17 +77,8 @@ class Command(BaseCommand):
                 message=notification_message
             )
             
-            # Send email notification
-            try:
-                send_mail(
-                    subject=notification_title,
-                    message=notification_message,
-                    from_email=django_settings.EMAIL_HOST_USER,
-                    recipient_list=[doctor.user.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error sending email to {doctor.user.email}: {e}"))
+            # Sent by the run_email_worker command
+            queue_email([doctor.user.email], notification_title, notification_message)
             
             notification_count += 1
         
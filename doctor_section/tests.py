@@ -1,3 +1,177 @@
-from django.test import TestCase
+from datetime import date
+from unittest.mock import patch
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser, Student
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+from admin_section.tests import LogStatsFixtureMixin, make_log
+from student_section.models import StudentLogFormModel
+from utils.conditional import bump_model_versions
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DoctorDashTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=2)
+        self.client = Client()
+        self.client.force_login(self.doctor.user)
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('doctor_section:doctor_dash'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def _add_student(self, index):
+        user = CustomUser.objects.create_user(
+            username=f'stud{index}', email=f'stud{index}@example.com', password='pass', role='student'
+        )
+        student = Student.objects.get(user=user)
+        student.group = self.group
+        student.save()
+        return student
+
+    def test_student_performance_and_priority(self):
+        make_log(self.student, self.departments[1], self.doctor, date=date(2024, 12, 1))
+        _, response = self._get()
+        performance = response.context['student_performance']
+        self.assertEqual(len(performance), 1)
+        self.assertEqual(performance[0]['total_logs'], 7)
+        self.assertEqual(performance[0]['pending_logs'], 3)
+        self.assertEqual(performance[0]['approved_logs'], 2)
+        self.assertEqual(performance[0]['rejected_logs'], 2)
+        priority = response.context['priority_records']
+        self.assertEqual(len(priority), 1)
+        self.assertEqual(priority[0]['due_date'], date(2024, 12, 1))
+        self.assertEqual(priority[0]['department'], self.departments[1].name)
+
+    def test_priority_skips_logs_reviewed_meanwhile(self):
+        from doctor_section import views
+
+        def counted_then_reviewed(*args, **kwargs):
+            students = list(annotate_status_counts(*args, **kwargs))
+            StudentLogFormModel.objects.filter(review_status=StudentLogFormModel.STATUS_PENDING).update(
+                is_reviewed=True, reviewer_comments='Good', review_status=StudentLogFormModel.STATUS_APPROVED
+            )
+            return students
+
+        annotate_status_counts = views.annotate_status_counts
+        with patch.object(views, 'annotate_status_counts', counted_then_reviewed):
+            _, response = self._get()
+        self.assertEqual(response.context['priority_records'], [])
+
+    def test_query_count_independent_of_student_count(self):
+        # The first request loads the user into the user cache
+        self._get()
+        small, _ = self._get()
+        for index in range(5):
+            make_log(self._add_student(index), self.departments[0], self.doctor)
+        large, response = self._get()
+        self.assertEqual(len(response.context['student_performance']), 6)
+        self.assertEqual(small, large)
+
+    def test_export_logs_csv_streams_rows(self):
+        response = self.client.get(reverse('doctor_section:export_logs'), {'format': 'csv', 'status': 'all'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(any('Rejected' in line for line in lines[1:]))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class ConditionalJsonTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=1)
+        self.client = Client()
+        self.client.force_login(self.doctor.user)
+        self.url = reverse('doctor_section:get_log_ids') + '?status=pending'
+
+    def _log_queries(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, **headers)
+        return response, [q['sql'] for q in ctx.captured_queries if 'student_section_studentlogformmodel' in q['sql']]
+
+    def test_unchanged_logs_are_not_queried_again(self):
+        response, _ = self._log_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        response, queries = self._log_queries(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, [])
+
+    def test_saving_a_log_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        log = StudentLogFormModel.objects.filter(is_reviewed=False).first()
+        log.is_reviewed = True
+        log.review_status = StudentLogFormModel.STATUS_APPROVED
+        log.save()
+
+        response, _ = self._log_queries(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(log.id, response.json()['log_ids'])
+
+    def test_bulk_writes_bump_the_version(self):
+        etag = self.client.get(self.url)['ETag']
+        StudentLogFormModel.objects.update(is_reviewed=True)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        bump_model_versions(StudentLogFormModel)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json(), {'log_ids': []})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class BatchReviewTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=1)
+        self.client = Client()
+        self.client.force_login(self.doctor.user)
+
+    def _review(self, logs, action='approve', comments=''):
+        ids = ','.join(str(log.id) for log in logs)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse('doctor_section:batch_review'),
+                {'log_ids': ids, 'action': action, 'comments': comments},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_reject_updates_logs_and_queues_notifications(self):
+        from admin_section.models import OutboundEmail
+        from student_section.models import StudentLogRollup, StudentNotification
+        logs = [make_log(self.student, self.departments[0], self.doctor) for _ in range(3)]
+        updated_before = {log.id: log.updated_at for log in logs}
+        data, _ = self._review(logs, action='reject', comments='Missing details')
+        self.assertEqual(data['count'], 3)
+        for log in logs:
+            log.refresh_from_db()
+            self.assertGreater(log.updated_at, updated_before[log.id])
+            self.assertEqual(log.updated_at, log.review_date)
+            self.assertEqual(log.review_status, StudentLogFormModel.STATUS_REJECTED)
+            self.assertEqual(log.reviewer_comments, 'REJECTED: Missing details')
+            self.assertIsNotNone(log.review_date)
+        self.assertEqual(StudentNotification.objects.filter(log_entry__in=logs).count(), 3)
+        emails = OutboundEmail.objects.all()
+        self.assertEqual(len(emails), 3)
+        self.assertEqual(emails[0].recipients, [self.student.user.email])
+        self.assertIn('Comments: REJECTED: Missing details', emails[0].body)
+        rollup = StudentLogRollup.objects.get(department=self.departments[0])
+        self.assertEqual((rollup.total, rollup.rejected), (6, 4))
+
+    def test_query_count_independent_of_selection_size(self):
+        small = [make_log(self.student, self.departments[0], self.doctor) for _ in range(2)]
+        large = [make_log(self.student, self.departments[0], self.doctor) for _ in range(20)]
+        # Warm the user cache and date settings
+        self._review(small[:1])
+        _, small_queries = self._review(small[1:])
+        data, large_queries = self._review(large)
+        self.assertEqual(data['count'], 20)
+        self.assertEqual(small_queries, large_queries)
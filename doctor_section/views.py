@@ -8,57 +8,37 @@ from django.core.paginator import Paginator
 from django.db import models, transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.core.mail import send_mail
-from django.conf import settings
 import os
 import json
-import csv
 import io
-from threading import Thread
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from utils.pdf_utils import add_agu_header, get_common_styles, add_footer_info
+from admin_section.export_jobs import background_export
+from admin_section.outbox import queue_email
+from utils.pdf_utils import (
+    add_agu_header, get_common_styles, add_footer_info, add_table, get_table_style, LazyFlowables, build_pdf,
+)
+from utils.csv_export import streaming_csv_response, iter_values, full_name, format_datetime
+from utils.notification_counts import forget_unread_counts, invalidate_unread_counts
+from utils.conditional import conditional_json
+from utils.log_stats import (
+    summarize_logs, summarize_rollups, group_rollup_counts, empty_status_counts, approval_rate,
+    annotate_status_counts
+)
 from .models import DoctorSupportTicket, Notification
 from .forms import DoctorSupportTicketForm, LogReviewForm, BatchReviewForm
-from student_section.models import StudentLogFormModel, StudentNotification
+from student_section.models import StudentLogFormModel, StudentLogRollup, StudentNotification
+from student_section.rollup import deferred_rollup
+from student_section.reviews import batch_comment, review_logs
+from admin_section.date_settings import get_date_settings
 from admin_section.models import AdminNotification, DateRestrictionSettings
 from django.db.models import Count
 from django.db.models.functions import TruncMonth
 
 
-# Helper functions for asynchronous email sending
-def send_admin_emails_doctor(admin_emails, subject, message):
-    """Send emails to admins in a separate thread"""
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=admin_emails,
-            fail_silently=True,
-        )
-    except Exception as e:
-        print(f"Error sending email: {e}")
-
-
-def send_student_email(student_email, subject, message):
-    """Send email to student in a separate thread"""
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[student_email],
-            fail_silently=True,
-        )
-    except Exception as e:
-        print(f"Error sending email: {e}")
-
-
 @login_required
 def doctor_dash(request):
     doctor = request.user.doctor_profile
@@ -78,30 +58,37 @@ def doctor_dash(request):
     today = timezone.now()
     start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
+    # Pre-aggregated status counts for the same departments
+    rollups = StudentLogRollup.objects.filter(department__in=departments)
+    if selected_department:
+        rollups = rollups.filter(department_id=selected_department)
+    summary = summarize_rollups(rollups)
+    dept_counts = group_rollup_counts(rollups, 'department_id')
+
     # Performance metrics
     performance_data = {
-        'total_reviews': logs.filter(is_reviewed=True).count(),
-        'pending_reviews': logs.filter(is_reviewed=False).count(),
+        'total_reviews': summary['reviewed'],
+        'pending_reviews': summary['pending'],
         'monthly_reviews': logs.filter(review_date__gte=start_of_month).count(),
-        'approval_rate': calculate_approval_rate(logs),
+        'approval_rate': approval_rate(summary),
     }
 
     # Basic chart data (without student performance data yet)
     chart_data = {
         'daily_reviews': get_daily_reviews_data(logs),
-        'department_stats': get_department_stats(logs, departments),
-        'review_status': get_review_status_data(logs),
+        'department_stats': get_department_stats(dept_counts, departments),
+        'review_status': get_review_status_data(summary),
         'monthly_trend': get_monthly_trend_data(logs),
         'activity_distribution': get_activity_distribution_data(logs),
         'participation_distribution': get_participation_distribution_data(logs),
-        'student_status_distribution': get_student_status_distribution(logs),
-        'department_performance': get_department_performance_data(logs, departments),
+        'student_status_distribution': get_student_status_distribution(summary),
+        'department_performance': get_department_performance_data(dept_counts, departments),
     }
 
     # Calculate total records, left to review, and reviewed counts
-    total_records = logs.count()
-    left_to_review = logs.filter(is_reviewed=False).count()
-    reviewed = logs.filter(is_reviewed=True).count()
+    total_records = summary['total']
+    left_to_review = summary['pending']
+    reviewed = summary['reviewed']
 
     # Calculate percentage for progress circle
     review_percentage = 0
@@ -112,9 +99,14 @@ def doctor_dash(request):
     student_performance = []
     priority_records = []
 
-    # Get unique students who submitted logs in the doctor's departments
-    student_ids = logs.values_list('student', flat=True).distinct()
-    students = Student.objects.filter(id__in=student_ids)
+    # Get students who submitted logs in the doctor's departments, with their
+    # status counts and oldest pending date computed in one grouped query
+    log_filters = {'department__in': departments}
+    if selected_department:
+        log_filters['department_id'] = selected_department
+    students = annotate_status_counts(
+        Student.objects.select_related('user', 'group'), 'log_forms__', **log_filters
+    )
 
     # Filter students by search query if provided
     if search_query:
@@ -125,19 +117,12 @@ def doctor_dash(request):
             models.Q(student_id__icontains=search_query)
         )
 
-    # Get performance data for each student
+    # Build performance data for each student
     for student in students:
-        student_logs = logs.filter(student=student)
-        total_student_logs = student_logs.count()
-        reviewed_logs = student_logs.filter(is_reviewed=True).count()
-        pending_logs = total_student_logs - reviewed_logs
-        approved_logs = student_logs.filter(is_reviewed=True).exclude(reviewer_comments__startswith='REJECTED').count()
-        rejected_logs = student_logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED').count()
-
         # Calculate completion percentage
         completion_percentage = 0
-        if total_student_logs > 0:
-            completion_percentage = int((reviewed_logs / total_student_logs) * 100)
+        if student.total > 0:
+            completion_percentage = int((student.reviewed / student.total) * 100)
 
         student_performance.append({
             'id': student.id,
@@ -145,28 +130,43 @@ def doctor_dash(request):
             'student_id': student.student_id,
             'email': student.user.email,
             'group': student.group.group_name if student.group else 'No Group',
-            'total_logs': total_student_logs,
-            'reviewed_logs': reviewed_logs,
-            'pending_logs': pending_logs,
-            'approved_logs': approved_logs,
-            'rejected_logs': rejected_logs,
+            'total_logs': student.total,
+            'reviewed_logs': student.reviewed,
+            'pending_logs': student.pending,
+            'approved_logs': student.approved,
+            'rejected_logs': student.rejected,
             'completion_percentage': completion_percentage
         })
 
         # Add to priority records if there are pending logs
-        if pending_logs > 0:
-            # Get the oldest pending log for this student
-            oldest_pending = student_logs.filter(is_reviewed=False).order_by('date').first()
-            if oldest_pending:
-                priority_records.append({
-                    'id': oldest_pending.id,
-                    'student_name': student.user.get_full_name() or student.user.username,
-                    'due_date': oldest_pending.date,
-                    'department': oldest_pending.department.name
-                })
-
-    # Sort priority records by due date (oldest first)
-    priority_records = sorted(priority_records, key=lambda x: x['due_date'])
+        if student.oldest_pending:
+            priority_records.append({
+                'student_id': student.id,
+                'student_name': student.user.get_full_name() or student.user.username,
+                'due_date': student.oldest_pending,
+            })
+
+    # Keep the five oldest and look up their log id and department in one query
+    priority_records = sorted(priority_records, key=lambda x: x['due_date'])[:5]
+    if priority_records:
+        oldest_logs = {}
+        pending_logs = logs.filter(
+            review_status=StudentLogFormModel.STATUS_PENDING,
+            student_id__in=[record['student_id'] for record in priority_records],
+            date__lte=priority_records[-1]['due_date'],
+        ).order_by('date', 'id').values('id', 'student_id', 'date', 'department__name')
+        for log in pending_logs:
+            oldest_logs.setdefault((log['student_id'], log['date']), log)
+        found = []
+        for record in priority_records:
+            log = oldest_logs.get((record.pop('student_id'), record['due_date']))
+            if log is None:
+                # Reviewed since the counts above were taken
+                continue
+            record['id'] = log['id']
+            record['department'] = log['department__name']
+            found.append(record)
+        priority_records = found
 
     # Add top students data to chart_data after student_performance is populated
     chart_data['top_students'] = get_top_students_data(student_performance[:5] if student_performance else [])
@@ -197,20 +197,12 @@ def doctor_dash(request):
         'reviewed': reviewed,
         'review_percentage': review_percentage,
         'student_performance': student_performance,
-        'priority_records': priority_records[:5],  # Limit to top 5 priority records
+        'priority_records': priority_records,
         'search_query': search_query
     }
 
     return render(request, "doctor_dash.html", context)
 
-def calculate_approval_rate(logs):
-    reviewed_logs = logs.filter(is_reviewed=True)
-    total_reviewed = reviewed_logs.count()
-    if total_reviewed == 0:
-        return 0
-    approved = reviewed_logs.filter(reviewer_comments__startswith='REJECTED').count()
-    return round((1 - approved / total_reviewed) * 100)
-
 def get_daily_reviews_data(logs):
     last_7_days = timezone.now() - timedelta(days=7)
     daily_reviews = logs.filter(
@@ -224,21 +216,20 @@ def get_daily_reviews_data(logs):
         'data': [d['count'] for d in daily_reviews]
     }
 
-def get_department_stats(logs, departments):
+def get_department_stats(dept_counts, departments):
+    """Build per-department rows from counts keyed by department id"""
     dept_stats = []
     for dept in departments:
-        dept_logs = logs.filter(department=dept)
-        total = dept_logs.count()
-        reviewed = dept_logs.filter(is_reviewed=True).count()
+        counts = dept_counts.get(dept.id, empty_status_counts())
         dept_stats.append({
             'name': dept.name,
-            'total': total,
-            'reviewed': reviewed,
-            'pending': total - reviewed
+            'total': counts['total'],
+            'reviewed': counts['reviewed'],
+            'pending': counts['pending']
         })
     return dept_stats
 
-def get_department_performance_data(logs, departments):
+def get_department_performance_data(dept_counts, departments):
     """Get data for department performance chart"""
     # If no departments, return default values
     if not departments:
@@ -248,7 +239,7 @@ def get_department_performance_data(logs, departments):
             'pending': [0]
         }
 
-    dept_stats = get_department_stats(logs, departments)
+    dept_stats = get_department_stats(dept_counts, departments)
 
     # Sort by total logs (descending)
     dept_stats = sorted(dept_stats, key=lambda x: x['total'], reverse=True)
@@ -259,12 +250,10 @@ def get_department_performance_data(logs, departments):
         'pending': [dept['pending'] for dept in dept_stats]
     }
 
-def get_review_status_data(logs):
-    total = logs.count()
-    reviewed = logs.filter(is_reviewed=True).count()
+def get_review_status_data(counts):
     return {
         'labels': ['Reviewed', 'Pending'],
-        'data': [reviewed, total - reviewed]
+        'data': [counts['reviewed'], counts['pending']]
     }
 
 def get_monthly_trend_data(logs):
@@ -328,10 +317,10 @@ def get_participation_distribution_data(logs):
     }
 
 
-def get_student_status_distribution(logs):
+def get_student_status_distribution(counts):
     """Get distribution of logs by review status"""
-    reviewed = logs.filter(is_reviewed=True).count()
-    pending = logs.filter(is_reviewed=False).count()
+    reviewed = counts['reviewed']
+    pending = counts['pending']
 
     # If there are no logs, return default values to avoid empty charts
     if reviewed == 0 and pending == 0:
@@ -412,7 +401,7 @@ def doctor_profile(request):
         reviewed_logs = logs.filter(is_reviewed=True)
         total_reviewed = reviewed_logs.count()
         if total_reviewed > 0:
-            rejected = reviewed_logs.filter(reviewer_comments__startswith='REJECTED').count()
+            rejected = reviewed_logs.filter(review_status=StudentLogFormModel.STATUS_REJECTED).count()
             approval_rate = round(((total_reviewed - rejected) / total_reviewed) * 100)
         else:
             approval_rate = 0
@@ -533,33 +522,22 @@ def update_profile_photo(request):
 
 
 @login_required
+@conditional_json(DateRestrictionSettings, daily=True)
 def get_date_restrictions(request):
     """API endpoint to get date restriction settings for doctors"""
     try:
         # Get date restriction settings or create default if none exist
-        settings = DateRestrictionSettings.objects.first()
-        if not settings:
-            settings = DateRestrictionSettings.objects.create(
-                past_days_limit=7,
-                allow_future_dates=False,
-                future_days_limit=0,
-                doctor_past_days_limit=30,
-                doctor_allow_future_dates=False,
-                doctor_future_days_limit=0,
-                allowed_days_for_students='0,1,2,3,4,5,6',
-                allowed_days_for_doctors='0,1,2,3,4,5,6',
-                is_active=True
-            )
+        date_settings = get_date_settings(create=True)
 
         # Get current day of week (0=Monday, 6=Sunday)
         current_day = timezone.now().weekday()
 
         # Get settings from the model
-        doctor_past_days_limit = settings.doctor_past_days_limit
-        doctor_allow_future_dates = settings.doctor_allow_future_dates
-        doctor_future_days_limit = settings.doctor_future_days_limit
-        allowed_days = settings.get_allowed_days_for_doctors()
-        is_active = settings.is_active
+        doctor_past_days_limit = date_settings.doctor_past_days_limit
+        doctor_allow_future_dates = date_settings.doctor_allow_future_dates
+        doctor_future_days_limit = date_settings.doctor_future_days_limit
+        allowed_days = date_settings.doctor_allowed_days
+        is_active = date_settings.is_active
 
         # Return settings as JSON
         data = {
@@ -567,7 +545,7 @@ def get_date_restrictions(request):
             "allowFutureDates": doctor_allow_future_dates,
             "futureDaysLimit": doctor_future_days_limit,
             "isCurrentDayAllowed": current_day in allowed_days,
-            "allowedDays": allowed_days,
+            "allowedDays": sorted(allowed_days),
             "isActive": is_active
         }
         return JsonResponse(data)
@@ -618,15 +596,10 @@ def doctor_help(request):
 
                 if notifications:
                     AdminNotification.objects.bulk_create(notifications)
+                    invalidate_unread_counts(AdminNotification, [n.recipient_id for n in notifications])
 
-                # Start a separate thread to send emails
-                if admin_emails:
-                    email_thread = Thread(
-                        target=send_admin_emails_doctor,
-                        args=(admin_emails, notification_title, notification_message)
-                    )
-                    email_thread.daemon = True
-                    email_thread.start()
+                # Sent by the run_email_worker command once this commits
+                queue_email(admin_emails, notification_title, notification_message)
 
             messages.success(request, "Support ticket submitted successfully. We will respond to your issue soon.")
             return redirect("doctor_section:doctor_help")
@@ -703,12 +676,9 @@ def doctor_reviews(request):
     if status == 'pending':
         logs = logs.filter(is_reviewed=False)
     elif status == 'approved':
-        logs = logs.filter(is_reviewed=True).filter(
-            models.Q(reviewer_comments__isnull=True) |
-            ~models.Q(reviewer_comments__startswith='REJECTED:')
-        )
+        logs = logs.filter(review_status=StudentLogFormModel.STATUS_APPROVED)
     elif status == 'rejected':
-        logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED:')
+        logs = logs.filter(review_status=StudentLogFormModel.STATUS_REJECTED)
     # 'all' shows everything
 
     if department_id:
@@ -728,15 +698,7 @@ def doctor_reviews(request):
 
     # Calculate statistics
     all_logs = StudentLogFormModel.objects.filter(department__in=doctor_departments)
-    stats = {
-        'total': all_logs.count(),
-        'pending': all_logs.filter(is_reviewed=False).count(),
-        'approved': all_logs.filter(is_reviewed=True).filter(
-            models.Q(reviewer_comments__isnull=True) |
-            ~models.Q(reviewer_comments__startswith='REJECTED:')
-        ).count(),
-        'rejected': all_logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED:').count(),
-    }
+    stats = summarize_logs(all_logs)
 
     # Pagination
     paginator = Paginator(logs, 15)  # 15 items per page
@@ -744,26 +706,20 @@ def doctor_reviews(request):
     page_obj = paginator.get_page(page_number)
 
     # Get review settings
-    settings = DateRestrictionSettings.objects.first()
-    review_period_enabled = settings and settings.doctor_review_enabled if settings else False
+    date_settings = get_date_settings()
+    review_period_enabled = date_settings and date_settings.doctor_review_enabled if date_settings else False
 
     # Add computed fields to logs for template
     for log in page_obj:
         # Determine review status
-        if log.is_reviewed:
-            if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:'):
-                log.review_status = 'rejected'
-                log.review_status_display = 'Rejected'
-                log.review_status_class = 'bg-red-100 text-red-800 dark:bg-red-800 dark:text-red-100'
-                log.review_status_icon = 'fas fa-times-circle'
-            else:
-                log.review_status = 'approved'
-                log.review_status_display = 'Approved'
-                log.review_status_class = 'bg-green-100 text-green-800 dark:bg-green-800 dark:text-green-100'
-                log.review_status_icon = 'fas fa-check-circle'
+        log.review_status_display = log.get_review_status_display()
+        if log.review_status == StudentLogFormModel.STATUS_REJECTED:
+            log.review_status_class = 'bg-red-100 text-red-800 dark:bg-red-800 dark:text-red-100'
+            log.review_status_icon = 'fas fa-times-circle'
+        elif log.review_status == StudentLogFormModel.STATUS_APPROVED:
+            log.review_status_class = 'bg-green-100 text-green-800 dark:bg-green-800 dark:text-green-100'
+            log.review_status_icon = 'fas fa-check-circle'
         else:
-            log.review_status = 'pending'
-            log.review_status_display = 'Pending'
             log.review_status_class = 'bg-yellow-100 text-yellow-800 dark:bg-yellow-800 dark:text-yellow-100'
             log.review_status_icon = 'fas fa-clock'
 
@@ -773,7 +729,7 @@ def doctor_reviews(request):
             if not log.deadline_passed:
                 time_remaining = log.review_deadline - timezone.now()
                 log.days_remaining = time_remaining.days
-                log.deadline_warning = log.days_remaining <= (settings.doctor_notification_days if settings else 3)
+                log.deadline_warning = log.days_remaining <= (date_settings.doctor_notification_days if date_settings else 3)
             else:
                 log.days_remaining = 0
                 log.deadline_warning = False
@@ -790,8 +746,8 @@ def doctor_reviews(request):
         'search_query': search_query,
         'stats': stats,
         'review_period_enabled': review_period_enabled,
-        'review_period_days': settings.doctor_review_period if settings else 30,
-        'notification_days': settings.doctor_notification_days if settings else 3,
+        'review_period_days': date_settings.doctor_review_period if date_settings else 30,
+        'notification_days': date_settings.doctor_notification_days if date_settings else 3,
     }
 
     return render(request, "doctor_reviews.html", context)
@@ -821,6 +777,7 @@ def notifications(request):
     # Mark all as read if requested
     if request.GET.get('mark_all_read'):
         notifications_list.filter(is_read=False).update(is_read=True)
+        forget_unread_counts('doctor', [request.user.pk])
         messages.success(request, "All notifications marked as read.")
         return redirect('doctor_section:notifications')
 
@@ -860,10 +817,10 @@ def review_log(request, log_id):
         return redirect('doctor_section:doctor_reviews')
 
     # Check if review deadline has passed
-    settings = DateRestrictionSettings.objects.first()
-    if settings and settings.doctor_review_enabled and log.review_deadline:
+    date_settings = get_date_settings()
+    if date_settings and date_settings.doctor_review_enabled and log.review_deadline:
         if timezone.now() > log.review_deadline:
-            messages.error(request, f"The review period for this log has expired. Logs must be reviewed within {settings.doctor_review_period} days of submission.")
+            messages.error(request, f"The review period for this log has expired. Logs must be reviewed within {date_settings.doctor_review_period} days of submission.")
             return redirect('doctor_section:doctor_reviews')
 
     if request.method == 'POST':
@@ -903,14 +860,8 @@ def review_log(request, log_id):
                 message=notification_message
             )
 
-            # Send email notification to the student in a separate thread
-            if log.student.user.email:
-                email_thread = Thread(
-                    target=send_student_email,
-                    args=(log.student.user.email, notification_title, notification_message)
-                )
-                email_thread.daemon = True
-                email_thread.start()
+            # Email the student through the outbox
+            queue_email([log.student.user.email], notification_title, notification_message)
 
             messages.success(request, f"Log entry has been {is_approved_text}.")
             return redirect('doctor_section:doctor_reviews')
@@ -925,7 +876,7 @@ def review_log(request, log_id):
         days_remaining = max(0, time_remaining.days)
 
     # Get date restriction settings for doctor
-    date_settings = DateRestrictionSettings.objects.first()
+    date_settings = get_date_settings()
     doctor_past_days_limit = date_settings.doctor_past_days_limit if date_settings else 30
 
     context = {
@@ -965,8 +916,8 @@ def batch_review(request):
     )
 
     # Check for review deadline
-    settings = DateRestrictionSettings.objects.first()
-    if settings and settings.doctor_review_enabled:
+    date_settings = get_date_settings()
+    if date_settings and date_settings.doctor_review_enabled:
         # Filter out logs that have passed their review deadline
         logs = logs.filter(
             models.Q(review_deadline__isnull=True) |
@@ -975,53 +926,19 @@ def batch_review(request):
 
         # If all logs were filtered out due to expired deadlines
         if not logs.exists():
-            messages.error(request, f"Cannot review the selected logs as their review periods have expired. Logs must be reviewed within {settings.doctor_review_period} days of submission.")
+            messages.error(request, f"Cannot review the selected logs as their review periods have expired. Logs must be reviewed within {date_settings.doctor_review_period} days of submission.")
             return redirect('doctor_section:doctor_reviews')
 
-    # Process each log
-    with transaction.atomic():
-        for log in logs:
-            log.is_reviewed = True
-            log.review_date = timezone.now()
-
-            # Set comments based on action
-            if action == 'reject':
-                prefix = "REJECTED: "
-                log.reviewer_comments = prefix + comments if comments else prefix + "Batch rejected"
-            else:  # approve
-                log.reviewer_comments = comments if comments else "Approved"
-
-            log.save()
-
-            # Create notification for the student
-            doctor_name = request.user.get_full_name() or request.user.username
-            is_approved_text = 'approved' if action == 'approve' else 'rejected'
-            notification_title = f"Your log entry has been {is_approved_text}"
-            notification_message = f"Dr. {doctor_name} has {is_approved_text} your log entry for {log.department.name} department on {log.date}."
-
-            if log.reviewer_comments:
-                notification_message += f" Comments: {log.reviewer_comments}"
-
-            # Create notification in the database
-            StudentNotification.objects.create(
-                recipient=log.student,
-                log_entry=log,
-                title=notification_title,
-                message=notification_message
-            )
-
-            # Send email notification to the student in a separate thread
-            if log.student.user.email:
-                email_thread = Thread(
-                    target=send_student_email,
-                    args=(log.student.user.email, notification_title, notification_message)
-                )
-                email_thread.daemon = True
-                email_thread.start()
+    # One UPDATE and one INSERT of notifications for the whole selection
+    doctor_name = request.user.get_full_name() or request.user.username
+    with deferred_rollup():
+        reviewed = review_logs(
+            logs, action, batch_comment(action, comments), reviewer=f"Dr. {doctor_name}", email=True
+        )
 
-    count = logs.count()
+    count = len(reviewed)
     # If this was an AJAX request, return JSON
-    if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.is_ajax():
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
             'success': True,
             'count': count,
@@ -1033,6 +950,7 @@ def batch_review(request):
 
 
 @login_required
+@conditional_json(StudentLogFormModel, Student, CustomUser, Doctor.departments.through)
 def get_log_ids(request):
     """Return a JSON array of log IDs matching current filters for the logged-in doctor."""
     try:
@@ -1049,12 +967,9 @@ def get_log_ids(request):
     if status == 'pending':
         logs = logs.filter(is_reviewed=False)
     elif status == 'approved':
-        logs = logs.filter(is_reviewed=True).filter(
-            models.Q(reviewer_comments__isnull=True) |
-            ~models.Q(reviewer_comments__startswith='REJECTED:')
-        )
+        logs = logs.filter(review_status=StudentLogFormModel.STATUS_APPROVED)
     elif status == 'rejected':
-        logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED:')
+        logs = logs.filter(review_status=StudentLogFormModel.STATUS_REJECTED)
 
     if department_id:
         logs = logs.filter(department_id=department_id)
@@ -1074,6 +989,7 @@ def get_log_ids(request):
 
 
 @login_required
+@background_export('doctor_section:export_logs')
 def export_logs(request):
     """Export logs as CSV or PDF based on the current filters"""
     doctor = request.user.doctor_profile
@@ -1096,12 +1012,9 @@ def export_logs(request):
     if status == 'pending':
         logs = logs.filter(is_reviewed=False)
     elif status == 'approved':
-        logs = logs.filter(is_reviewed=True).filter(
-            models.Q(reviewer_comments__isnull=True) |
-            ~models.Q(reviewer_comments__startswith='REJECTED:')
-        )
+        logs = logs.filter(review_status=StudentLogFormModel.STATUS_APPROVED)
     elif status == 'rejected':
-        logs = logs.filter(is_reviewed=True, reviewer_comments__startswith='REJECTED:')
+        logs = logs.filter(review_status=StudentLogFormModel.STATUS_REJECTED)
     # 'all' shows everything
 
     if department_id:
@@ -1133,37 +1046,36 @@ def export_logs(request):
 
 
 def export_logs_csv(logs, filename_base):
-    """Export logs as CSV file"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-
-    writer = csv.writer(response)
-
-    # Write header row
-    writer.writerow([
-        'Student ID', 'Student Name', 'Date', 'Department',
-        'Activity Type', 'Core Diagnosis', 'Status', 'Review Date', 'Comments'
-    ])
-
-    # Write data rows
-    for log in logs:
-        status = 'Pending'
-        if log.is_reviewed:
-            status = 'Rejected' if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:') else 'Approved'
-
-        writer.writerow([
-            log.student.student_id,
-            log.student.user.get_full_name(),
-            log.date.strftime('%Y-%m-%d'),
-            log.department.name,
-            log.activity_type.name,
-            log.core_diagnosis.name,
-            status,
-            log.review_date.strftime('%Y-%m-%d') if log.review_date else '',
-            log.reviewer_comments or ''
-        ])
+    """Export logs as a streamed CSV file"""
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name', 'date',
+        'department__name', 'activity_type__name', 'core_diagnosis__name', 'review_status',
+        'review_date', 'reviewer_comments',
+    )
 
-    return response
+    def rows():
+        # Header row
+        yield [
+            'Student ID', 'Student Name', 'Date', 'Department',
+            'Activity Type', 'Core Diagnosis', 'Status', 'Review Date', 'Comments'
+        ]
+        for (student_id, first_name, last_name, log_date, department, activity_type,
+             core_diagnosis, review_status, review_date, comments) in values:
+            yield [
+                student_id,
+                full_name(first_name, last_name),
+                log_date.strftime('%Y-%m-%d'),
+                department,
+                activity_type,
+                core_diagnosis,
+                status_labels[review_status],
+                format_datetime(review_date, '', '%Y-%m-%d'),
+                comments or ''
+            ]
+
+    return streaming_csv_response(f"{filename_base}.csv", rows())
 
 
 def export_logs_pdf(logs, filename_base, doctor):
@@ -1176,7 +1088,7 @@ def export_logs_pdf(logs, filename_base, doctor):
 
     # Create the PDF document
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
+    elements = LazyFlowables()
 
     # Add AGU header with logo and university name
     elements = add_agu_header(elements, "Student Logs Report")
@@ -1188,52 +1100,30 @@ def export_logs_pdf(logs, filename_base, doctor):
     doctor_name = doctor.user.get_full_name() or doctor.user.username
     elements.append(Paragraph(f"Doctor: {doctor_name}", custom_styles['subtitle']))
     elements.append(Paragraph(f"Departments: {', '.join([dept.name for dept in doctor.departments.all()])}", custom_styles['normal']))
-    elements.append(Paragraph(f"Total Records: {len(logs)}", custom_styles['normal']))
+    elements.append(Paragraph(f"Total Records: {logs.count()}", custom_styles['normal']))
     elements.append(Spacer(1, 0.3*inch))
 
-    # Create table data
-    data = [
-        ['Student ID', 'Student Name', 'Date', 'Department', 'Activity Type', 'Status']
-    ]
-
-    # Add log data to table
-    for log in logs:
-        status = 'Pending'
-        if log.is_reviewed:
-            status = 'Rejected' if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:') else 'Approved'
-
-        data.append([
-            log.student.student_id,
-            log.student.user.get_full_name(),
-            log.date.strftime('%Y-%m-%d'),
-            log.department.name,
-            log.activity_type.name,
-            status
-        ])
-
-    # Create the table
-    table = Table(data, repeatRows=1)
-
-    # Style the table
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ])
-
-    # Add alternating row colors
-    for i in range(1, len(data)):
-        if i % 2 == 0:
-            table_style.add('BACKGROUND', (0, i), (-1, i), colors.lightgrey)
-
-    table.setStyle(table_style)
-    elements.append(table)
+    # Rows are read in chunks while the document is built
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name', 'date',
+        'department__name', 'activity_type__name', 'review_status',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name),
+            log_date.strftime('%Y-%m-%d'),
+            department,
+            activity_type,
+            status_labels[review_status]
+        ]
+        for (student_id, first_name, last_name, log_date, department, activity_type, review_status) in values
+    )
+    headers = ['Student ID', 'Student Name', 'Date', 'Department', 'Activity Type', 'Status']
+    if not add_table(elements, headers, rows, get_table_style('lightblue', 12, row_colors=('white', 'lightgrey'))):
+        elements.append(Paragraph("No logs found for the selected criteria.", custom_styles['normal']))
 
     # Add footer information
     elements = add_footer_info(
@@ -1243,7 +1133,7 @@ def export_logs_pdf(logs, filename_base, doctor):
     )
 
     # Build the PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get the value of the buffer and write it to the response
     pdf = buffer.getvalue()
@@ -29,6 +29,7 @@ from student_section.models import (
     ParticipationType
 )
 from admin_section.models import AdminNotification
+from utils.log_stats import annotate_status_counts
 from .decorators import doctor_required
 
 # -----------------------------------------------------------------------------
@@ -279,23 +280,30 @@ def doctor_dash(request):
             })
 
         # --- Student Performance Data ---
-        # Get unique students from the filtered log set
-        student_ids_in_logs = base_log_queryset.values_list('student_id', flat=True).distinct()
-        students_for_perf = Student.objects.filter(id__in=student_ids_in_logs).select_related('user', 'department')
-        
+        # Annotate students with their counts for the filtered logs in one grouped query
+        log_filters = {'department__in': doctor_departments}
+        if selected_department_id:
+            log_filters['department_id'] = selected_department_id
+        students_for_perf = annotate_status_counts(
+            Student.objects.select_related('user', 'department'), 'log_forms__', **log_filters
+        )
+        if search_query:
+            students_for_perf = students_for_perf.filter(
+                Q(user__first_name__icontains=search_query) |
+                Q(user__last_name__icontains=search_query) |
+                Q(user__email__icontains=search_query) |
+                Q(student_id__icontains=search_query)
+            )
+        students_for_perf = list(students_for_perf)
+
         student_performance_list = []
-        max_logs_for_perf_calc = 1  # Avoid division by zero
-        
-        log_counts = [base_log_queryset.filter(student=st).count() for st in students_for_perf]
-        if log_counts:
-            max_logs_for_perf_calc = max(log_counts) if max(log_counts) > 0 else 1
-        
+        max_logs_for_perf_calc = max((student.total for student in students_for_perf), default=0) or 1
+
         for student in students_for_perf:
-            student_logs = base_log_queryset.filter(student=student)
-            total_student_logs = student_logs.count()
-            reviewed_logs = student_logs.filter(is_reviewed=True).count()
-            pending_logs = total_student_logs - reviewed_logs
-            
+            total_student_logs = student.total
+            reviewed_logs = student.reviewed
+            pending_logs = student.pending
+
             # Calculate percentages
             s_reviewed_percentage = 0
             s_pending_percentage = 0
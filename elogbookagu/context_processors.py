@@ -1,3 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from utils.notification_counts import NOTIFICATION_MODELS, unread_count
+
+
+# User attributes mirrored into the session for templates that read
+# `request.session.<name>`
+SESSION_USER_FIELDS = ('first_name', 'last_name', 'username', 'email', 'role')
+
+
 def user_data(request):
     """Context processor to add user data to all templates.
 
@@ -14,29 +24,52 @@ def user_data(request):
     # Add user object
     context['user'] = user
 
-    # Populate session values safely and keep `role` in-sync with the DB.
-    # We intentionally write the session fields so that admin changes to the
-    # user's role are reflected on the next request instead of being masked
-    # by stale session values created at login time.
-    session = getattr(request, 'session', {})
-    if isinstance(session, dict) or hasattr(session, 'get'):
-        # Always update session values from the authoritative user object.
+    # Values come from the authoritative user object so admin changes to the
+    # role show up on the next request.
+    for field in SESSION_USER_FIELDS:
+        context[field] = getattr(user, field, '') or ''
+    context['full_name'] = f"{context['first_name']} {context['last_name']}".strip()
+
+    # Keep the session copies in sync, but only write the keys that changed:
+    # any write marks the session modified and costs a session UPDATE.
+    session = getattr(request, 'session', None)
+    if session is not None and hasattr(session, 'get'):
         try:
-            session['first_name'] = getattr(user, 'first_name', '')
-            session['last_name'] = getattr(user, 'last_name', '')
-            session['username'] = getattr(user, 'username', '')
-            session['email'] = getattr(user, 'email', '')
-            session['role'] = getattr(user, 'role', '')
+            for field in SESSION_USER_FIELDS:
+                if session.get(field) != context[field]:
+                    session[field] = context[field]
         except Exception:
             # Be defensive - don't fail template rendering if session isn't writable
             pass
 
-        context['username'] = session.get('username', '')
-        context['first_name'] = session.get('first_name', '')
-        context['last_name'] = session.get('last_name', '')
-        context['email'] = session.get('email', '')
-        context['role'] = session.get('role', '')
+    return context
+
+
+def notification_counts(request):
+    """Context processor adding the unread notification count of the user's role.
+
+    Every role's count variable is present (0 for other roles). The count of
+    the user's own role is lazy: it is only looked up (from the cache, or
+    with one COUNT query) when a template actually reads it.
+    """
+    context = {key: 0 for _, _, key in NOTIFICATION_MODELS.values()}
+    try:
+        user = getattr(request, 'user', None)
+        if not user or not getattr(user, 'is_authenticated', False):
+            return context
+
+        role = getattr(user, 'role', None)
+        if role in NOTIFICATION_MODELS:
+            user_id = user.pk
 
-        context['full_name'] = f"{context['first_name']} {context['last_name']}".strip()
+            def count():
+                try:
+                    return unread_count(role, user_id)
+                except Exception:
+                    # swallow any errors in context processors to avoid breaking error pages
+                    return 0
 
+            context[NOTIFICATION_MODELS[role][2]] = SimpleLazyObject(count)
+    except Exception:
+        pass
     return context
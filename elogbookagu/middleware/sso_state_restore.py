@@ -18,11 +18,13 @@ class SSOStateRestoreMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
         try:
+            # Only the callback needs the session; loading it on any other
+            # path would cost a session read on every request.
             if request.path.startswith(self.CALLBACK_PATH):
-                logger.debug('SSOStateRestoreMiddleware: callback path hit=%s session_keys=%s', request.path, list(request.session.keys()) if hasattr(request, 'session') else None)
-                qs_state = request.GET.get('state')
                 # If session already has socialaccount_states, nothing to do
                 session_keys = list(request.session.keys()) if hasattr(request, 'session') else []
+                logger.debug('SSOStateRestoreMiddleware: callback path hit=%s session_keys=%s', request.path, session_keys)
+                qs_state = request.GET.get('state')
                 if qs_state and 'socialaccount_states' not in session_keys:
                     # Lazy import to avoid circular imports at startup
                     from accounts.models import SSOState
@@ -12,10 +12,12 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import config
 import dj_database_url
 import warnings
 from django.utils.deprecation import RemovedInDjango60Warning
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -100,7 +102,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # allauth middleware (required by django-allauth) - must run before RefreshUserMiddleware
     'allauth.account.middleware.AccountMiddleware',
-    # Refresh user from DB each request so role changes in admin take effect immediately
+    # Load request.user lazily from the shared user cache (accounts.user_cache); role and
+    # profile changes bump the user's cache version, so they apply on the next request
     # This runs after allauth to ensure authentication is fully established
     'accounts.middleware.RefreshUserMiddleware',
 ]
@@ -119,10 +122,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'doctor_section.context_processors.notification_count',
-                'student_section.context_processors.student_notification_count',
-                'admin_section.context_processors.admin_notification_count',
-                'staff_section.context_processors.staff_notification_count',
+                'elogbookagu.context_processors.notification_counts',
                 'elogbookagu.context_processors.user_data',
                 'django.template.context_processors.media',
             ],
@@ -215,6 +215,103 @@ STATIC_ROOT = '/home/ubuntu/projects/Elogforlinux/elogbookagu/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/home/ubuntu/projects/Elogforlinux/elogbookagu/media/'
 
+# Hours a finished background export stays downloadable (see run_export_worker)
+EXPORT_JOB_TTL_HOURS = config("EXPORT_JOB_TTL_HOURS", default=24, cast=int)
+
+# Seconds the public home page statistics snapshot is served before a
+# background refresh (see publicpage.site_stats / refresh_site_statistics)
+SITE_STATISTICS_TTL = config("SITE_STATISTICS_TTL", default=300, cast=int)
+
+# Page visits are buffered per process and written in batches of this many
+# visits, or after this many seconds (see publicpage.visit_buffer)
+PAGE_VISIT_FLUSH_SIZE = config("PAGE_VISIT_FLUSH_SIZE", default=50, cast=int)
+PAGE_VISIT_FLUSH_SECONDS = config("PAGE_VISIT_FLUSH_SECONDS", default=30, cast=int)
+# Days raw page visits are kept before rollup_page_visits compacts them
+PAGE_VISIT_RETENTION_DAYS = config("PAGE_VISIT_RETENTION_DAYS", default=90, cast=int)
+
+# Processes hashing passwords during bulk user imports, 0 for one per CPU
+# (see admin_section.user_import)
+USER_IMPORT_HASH_WORKERS = config("USER_IMPORT_HASH_WORKERS", default=0, cast=int)
+
+# Uploads larger than this many MB (or sent with "run in the background") are
+# imported by the run_import_worker command instead of inside the request; the
+# stored files live in IMPORT_JOB_ROOT, which must not be served
+IMPORT_SYNC_MAX_MB = config("IMPORT_SYNC_MAX_MB", default=5, cast=int)
+IMPORT_JOB_MAX_MB = config("IMPORT_JOB_MAX_MB", default=100, cast=int)
+IMPORT_JOB_ROOT = config("IMPORT_JOB_ROOT", default=os.path.join(BASE_DIR, 'import_jobs'))
+# Hours a finished import job's report stays available
+IMPORT_JOB_TTL_HOURS = config("IMPORT_JOB_TTL_HOURS", default=72, cast=int)
+
+# Notification emails are queued in the outbox and sent by the
+# run_email_worker command, EMAIL_OUTBOX_BATCH_SIZE messages per connection
+# of EMAIL_OUTBOX_BACKEND (defaults to EMAIL_BACKEND; "console" or "file",
+# which writes to EMAIL_FILE_PATH, keep the mail local). Failed messages are
+# retried after EMAIL_OUTBOX_RETRY_SECONDS, doubling each time, and given up
+# after EMAIL_OUTBOX_MAX_ATTEMPTS tries (see admin_section.outbox)
+EMAIL_OUTBOX_BACKEND = config("EMAIL_OUTBOX_BACKEND", default="")
+EMAIL_FILE_PATH = config("EMAIL_FILE_PATH", default=os.path.join(BASE_DIR, 'sent_emails'))
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", default=50, cast=int)
+EMAIL_OUTBOX_RETRY_SECONDS = config("EMAIL_OUTBOX_RETRY_SECONDS", default=60, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config("EMAIL_OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+# Days sent and failed messages are kept in the outbox
+EMAIL_OUTBOX_KEEP_DAYS = config("EMAIL_OUTBOX_KEEP_DAYS", default=14, cast=int)
+
+# Caches. "users" holds data that must be shared by every worker process
+# (accounts.user_cache versions, unread notification counts, the home page
+# statistics snapshot), hence a file cache by default.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'users': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('USER_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'elogbookagu_user_cache')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Sessions. SESSION_BACKEND selects the engine:
+#   db        - every request with a session cookie reads django_session
+#   cached_db - reads are served from the "sessions" cache, writes go to both
+#   cache     - cache only (sessions are lost when the cache is cleared)
+# The "sessions" cache is Redis when SESSION_REDIS_URL is set, otherwise a file
+# cache shared by the workers of one host (SESSION_CACHE_BACKEND=file) or a
+# per-process memory cache (SESSION_CACHE_BACKEND=locmem, single process only,
+# since a logout in one process would not evict the copy held by another).
+# Anonymous pages never create a session: messages and CSRF tokens live in
+# signed cookies, and the session is only read when a session cookie is sent.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+SESSION_BACKEND = config('SESSION_BACKEND', default='db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"SESSION_BACKEND must be one of {', '.join(SESSION_ENGINES)}")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+SESSION_REDIS_URL = config('SESSION_REDIS_URL', default='')
+if SESSION_REDIS_URL:
+    # Needs the optional redis package
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SESSION_REDIS_URL,
+    }
+elif config('SESSION_CACHE_BACKEND', default='file') == 'locmem':
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+else:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('SESSION_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'elogbookagu_sessions')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+SESSION_CACHE_ALIAS = 'sessions'
+
 # Prevent STATICFILES_DIRS from containing STATIC_ROOT (avoids staticfiles.E002)
 _possible_static_dir = os.path.join(BASE_DIR, 'static')
 if os.path.abspath(_possible_static_dir) == os.path.abspath(STATIC_ROOT):
@@ -271,6 +368,8 @@ if os.environ.get('RUNNING_TESTS'):
     CSRF_COOKIE_SECURE = False
     SESSION_COOKIE_SECURE = False
     SECURE_SSL_REDIRECT = False
+    # Write visits right away so none are left buffered for the test database
+    PAGE_VISIT_FLUSH_SIZE = 1
 
 
 # After successful login (including SSO) send all logins to a central
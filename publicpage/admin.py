@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PageVisit
+from .models import PageVisit, PageVisitDaily
 
 
 @admin.register(PageVisit)
@@ -14,4 +14,17 @@ class PageVisitAdmin(admin.ModelAdmin):
         return False  # Don't allow manual addition
 
     def has_change_permission(self, request, obj=None):
-        return False  # Don't allow editing
\ No newline at end of file
+        return False  # Don't allow editing
+
+
+@admin.register(PageVisitDaily)
+class PageVisitDailyAdmin(admin.ModelAdmin):
+    list_display = ('page_name', 'date', 'visits', 'unique_visits')
+    list_filter = ('page_name',)
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False  # Written by the rollup_page_visits command
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from publicpage.site_stats import refresh_site_statistics
+
+
+class Command(BaseCommand):
+    help = 'Recompute the cached site statistics shown on the public home page'
+
+    def handle(self, *args, **options):
+        stats = refresh_site_statistics()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed site statistics: {stats['total_users']} users, {stats['log_entries']} log entries"
+        ))
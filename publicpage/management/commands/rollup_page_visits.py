@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from publicpage.visit_rollup import retention_days, rollup_page_visits
+
+
+class Command(BaseCommand):
+    help = 'Compact page visits older than the retention period into daily counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Keep raw visits of the last N days (default: PAGE_VISIT_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else retention_days()
+        rows, deleted = rollup_page_visits(days)
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {deleted} page visits older than {days} days into {rows} daily rows'
+        ))
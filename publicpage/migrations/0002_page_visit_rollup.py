@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publicpage', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageVisitDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_name', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('unique_visits', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Page Visits',
+                'verbose_name_plural': 'Daily Page Visits',
+                'ordering': ['-date', 'page_name'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pagevisit',
+            index=models.Index(fields=['page_name', 'ip_address', 'visited_at'], name='visit_page_ip_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagevisit',
+            index=models.Index(fields=['visited_at'], name='visit_time_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pagevisitdaily',
+            unique_together={('page_name', 'date')},
+        ),
+    ]
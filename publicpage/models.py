@@ -1,4 +1,3 @@
-
 from django.db import models
 from django.utils import timezone
 
@@ -15,32 +14,30 @@ class PageVisit(models.Model):
         ordering = ['-visited_at']
         verbose_name = "Page Visit"
         verbose_name_plural = "Page Visits"
+        indexes = [
+            models.Index(fields=['page_name', 'ip_address', 'visited_at'], name='visit_page_ip_time_idx'),
+            models.Index(fields=['visited_at'], name='visit_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.page_name} - {self.visited_at.strftime('%Y-%m-%d %H:%M')}"
 
     @classmethod
     def record_visit(cls, page_name, request):
-        """Record a page visit"""
-        ip_address = cls.get_client_ip(request)
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        """
+        Record a page visit
 
-        # Check if this IP visited this page in the last hour (to determine uniqueness)
-        recent_visit = cls.objects.filter(
-            page_name=page_name,
-            ip_address=ip_address,
-            visited_at__gte=timezone.now() - timezone.timedelta(hours=1)
-        ).exists()
+        The visit is buffered in process memory and written together with
+        other visits (see ``publicpage.visit_buffer``), so this normally runs
+        no query. Returns the unsaved PageVisit.
+        """
+        from .visit_buffer import record
 
-        # Create the visit record
-        visit = cls.objects.create(
+        return record(cls(
             page_name=page_name,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            is_unique=not recent_visit
-        )
-
-        return visit
+            ip_address=cls.get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        ))
 
     @staticmethod
     def get_client_ip(request):
@@ -51,3 +48,25 @@ class PageVisit(models.Model):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class PageVisitDaily(models.Model):
+    """Daily visit counts per page.
+
+    Rows are written by the ``rollup_page_visits`` management command, which
+    compacts PageVisit rows older than the retention period into one row per
+    page and day and deletes them.
+    """
+    page_name = models.CharField(max_length=100)
+    date = models.DateField()
+    visits = models.PositiveIntegerField(default=0)
+    unique_visits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', 'page_name']
+        unique_together = ['page_name', 'date']
+        verbose_name = "Daily Page Visits"
+        verbose_name_plural = "Daily Page Visits"
+
+    def __str__(self):
+        return f"{self.page_name} {self.date:%Y-%m-%d}: {self.visits}"
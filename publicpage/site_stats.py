@@ -0,0 +1,225 @@
+"""
+Cached site statistics for the public home page
+
+The statistics are aggregates over most of the database, so they are computed
+into a snapshot instead of on every home page view. The snapshot is kept in
+the shared ``users`` cache (so all workers on a host share one copy) and in
+process memory. A snapshot older than SITE_STATISTICS_TTL seconds is still
+served while one request refreshes it in a background thread; the
+``refresh_site_statistics`` command refreshes it from cron. Without a usable
+shared cache every process keeps and refreshes its own snapshot.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Count
+
+from accounts.models import CustomUser
+from admin_section.models import Department, TrainingSite
+from student_section.models import StudentLogRollup
+from utils.log_stats import summarize_rollups
+
+from .visit_rollup import visit_totals
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'site-statistics'
+REFRESH_LOCK_KEY = 'site-statistics:refreshing'
+DEFAULT_TTL = 300
+# A refresh that takes longer than this is assumed to have died
+REFRESH_LOCK_TIMEOUT = 120
+
+ROLES = ('doctor', 'staff', 'student', 'admin')
+
+# Process-local (computed_at, statistics) snapshot
+_local_snapshot = None
+_refresh_lock = threading.Lock()
+
+
+def statistics_ttl():
+    """Seconds a snapshot is served before it is refreshed (SITE_STATISTICS_TTL setting)"""
+    return getattr(settings, 'SITE_STATISTICS_TTL', DEFAULT_TTL)
+
+
+def _cache():
+    return caches['users' if 'users' in settings.CACHES else 'default']
+
+
+def compute_site_statistics():
+    """
+    Calculate and format the site statistics
+
+    Returns:
+        Dictionary of formatted statistics for the home page template
+    """
+    # Count active users by role in one query
+    role_counts = dict(
+        CustomUser.objects.filter(role__in=ROLES, is_active=True)
+        .values_list('role').annotate(count=Count('id')).order_by()
+    )
+    doctor_count = role_counts.get('doctor', 0)
+    staff_count = role_counts.get('staff', 0)
+    student_count = role_counts.get('student', 0)
+    admin_count = role_counts.get('admin', 0)
+
+    # Total active users
+    total_users = doctor_count + staff_count + student_count + admin_count
+
+    # Count institutions/departments (more comprehensive)
+    total_training_sites = TrainingSite.objects.count()
+    total_departments = Department.objects.count()
+    total_institutions = total_training_sites + total_departments
+
+    # Calculate real resources accessed (summed from the log rollup)
+    log_entries = summarize_rollups(StudentLogRollup.objects.all())['total']
+
+    # Add attendance records from doctor section
+    try:
+        from doctor_section.models import DoctorAttendance
+        attendance_records = DoctorAttendance.objects.count()
+    except ImportError:
+        attendance_records = 0
+
+    # Add emergency attendance records from staff section
+    try:
+        from staff_section.models import StaffEmergencyAttendance
+        emergency_attendance_records = StaffEmergencyAttendance.objects.count()
+    except ImportError:
+        emergency_attendance_records = 0
+
+    # Add blog posts and other content
+    try:
+        from admin_section.models import Blog
+        blog_posts = Blog.objects.filter(is_published=True).count()
+    except ImportError:
+        blog_posts = 0
+
+    # Add page visits tracking (recent visits plus the daily rollup)
+    total_page_visits, unique_visitors = visit_totals()
+
+    # Calculate total logs (focus on actual log entries)
+    total_logs = log_entries  # Use actual student log entries
+
+    # Ensure minimum display values for better presentation
+    display_users = max(total_users, 8)  # Minimum 8 for demo
+    display_institutions = max(total_institutions, 1)  # Minimum 1 for demo
+    display_logs = max(total_logs, 30)  # Minimum 30 for demo to look professional
+
+    # Format numbers with commas for thousands
+    formatted_users = f"{display_users:,}+"
+    formatted_institutions = f"{display_institutions:,}+"
+    formatted_logs = f"{display_logs:,}+"
+
+    return {
+        'active_users': formatted_users,
+        'institutions': formatted_institutions,
+        'total_logs': formatted_logs,  # Changed from resources_accessed to total_logs
+        'support_available': '24/7',  # This is a static value
+        'doctor_count': f"{doctor_count:,}",
+        'staff_count': f"{staff_count:,}",
+        'student_count': f"{student_count:,}",
+        'admin_count': f"{admin_count:,}",
+        'total_users': f"{total_users:,}",
+        # Additional detailed stats
+        'log_entries': f"{log_entries:,}",  # Raw log entries count
+        'total_attendance': f"{attendance_records + emergency_attendance_records:,}",
+        'total_blogs': f"{blog_posts:,}",
+        'training_sites': f"{total_training_sites:,}",
+        'departments': f"{total_departments:,}",
+        'page_visits': f"{total_page_visits:,}",
+        'unique_visitors': f"{unique_visitors:,}",
+        # Raw numbers for calculations
+        'raw_users': total_users,
+        'raw_institutions': total_institutions,
+        'raw_logs': total_logs,
+    }
+
+
+def _read_shared():
+    try:
+        return _cache().get(SNAPSHOT_KEY)
+    except Exception:
+        logger.exception('Site statistics cache unavailable')
+        return None
+
+
+def refresh_site_statistics():
+    """
+    Compute a new snapshot and store it in process memory and the shared cache
+
+    Returns:
+        The new statistics dictionary
+    """
+    global _local_snapshot
+    snapshot = (time.time(), compute_site_statistics())
+    _local_snapshot = snapshot
+    try:
+        _cache().set(SNAPSHOT_KEY, snapshot, timeout=None)
+        _cache().delete(REFRESH_LOCK_KEY)
+    except Exception:
+        logger.exception('Could not store site statistics in the cache')
+    return snapshot[1]
+
+
+def clear_site_statistics():
+    """Drop the cached snapshot so the next request recomputes it"""
+    global _local_snapshot
+    _local_snapshot = None
+    try:
+        _cache().delete(SNAPSHOT_KEY)
+    except Exception:
+        logger.exception('Could not clear site statistics from the cache')
+
+
+def _refresh_worker():
+    try:
+        refresh_site_statistics()
+    except Exception:
+        logger.exception('Background site statistics refresh failed')
+    finally:
+        _refresh_lock.release()
+        # The thread's own connections are not reused by request handling
+        connections.close_all()
+
+
+def _refresh_in_background():
+    # One refresh per process, and per host while the shared lock is held
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        claimed = _cache().add(REFRESH_LOCK_KEY, 1, timeout=REFRESH_LOCK_TIMEOUT)
+    except Exception:
+        claimed = True
+    if not claimed:
+        _refresh_lock.release()
+        return
+    threading.Thread(target=_refresh_worker, name='site-statistics-refresh', daemon=True).start()
+
+
+def get_site_statistics():
+    """
+    Return the site statistics for the home page
+
+    Serves the newest snapshot held in process memory or the shared cache.
+    Only the very first call (no snapshot anywhere) computes the statistics
+    inline; a stale snapshot is returned while a background refresh runs.
+    """
+    global _local_snapshot
+    now = time.time()
+    ttl = statistics_ttl()
+    snapshot = _local_snapshot
+    if snapshot is not None and now - snapshot[0] < ttl:
+        return snapshot[1]
+
+    shared = _read_shared()
+    if shared is not None and (snapshot is None or shared[0] > snapshot[0]):
+        snapshot = _local_snapshot = shared
+    if snapshot is None:
+        return refresh_site_statistics()
+    if now - snapshot[0] >= ttl:
+        _refresh_in_background()
+    return snapshot[1]
@@ -1,3 +1,118 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+from publicpage import site_stats, visit_buffer
+from publicpage.models import PageVisit, PageVisitDaily
+
+
+def aggregate_queries(queries):
+    return [query['sql'] for query in queries if 'COUNT(' in query['sql'] or 'SUM(' in query['sql']]
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class SiteStatisticsTests(TestCase):
+    def setUp(self):
+        site_stats.clear_site_statistics()
+        self.addCleanup(site_stats.clear_site_statistics)
+        CustomUser.objects.create_user(username='doc', email='doc@example.com', password='pass', role='doctor')
+
+    def test_home_runs_no_aggregate_queries(self):
+        call_command('refresh_site_statistics', stdout=StringIO())
+        with CaptureQueriesContext(connection) as ctx:
+            response = Client().get(reverse('home_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(aggregate_queries(ctx.captured_queries), [])
+        self.assertEqual(response.context['doctor_count'], '1')
+
+    def test_snapshot_is_shared_between_processes(self):
+        site_stats.refresh_site_statistics()
+        # Another process has no snapshot in memory but reads the cached one
+        site_stats._local_snapshot = None
+        with CaptureQueriesContext(connection) as ctx:
+            stats = site_stats.get_site_statistics()
+        self.assertEqual(ctx.captured_queries, [])
+        self.assertEqual(stats['doctor_count'], '1')
+
+    def test_stale_snapshot_is_served_while_refreshing(self):
+        site_stats.refresh_site_statistics()
+        CustomUser.objects.create_user(username='doc2', email='doc2@example.com', password='pass', role='doctor')
+        computed_at, stats = site_stats._local_snapshot
+        site_stats._local_snapshot = (computed_at - site_stats.statistics_ttl(), stats)
+        caches['users'].set(site_stats.SNAPSHOT_KEY, site_stats._local_snapshot)
+
+        with patch.object(site_stats, '_refresh_in_background') as refresh:
+            self.assertEqual(site_stats.get_site_statistics()['doctor_count'], '1')
+        refresh.assert_called_once_with()
+
+        site_stats.refresh_site_statistics()
+        self.assertEqual(site_stats.get_site_statistics()['doctor_count'], '2')
+
+    def test_works_without_shared_cache(self):
+        with patch.object(site_stats, '_cache', side_effect=RuntimeError('cache down')):
+            self.assertEqual(site_stats.get_site_statistics()['doctor_count'], '1')
+            # The process keeps its own snapshot until it expires
+            with CaptureQueriesContext(connection) as ctx:
+                site_stats.get_site_statistics()
+        self.assertEqual(ctx.captured_queries, [])
+        self.assertGreater(site_stats._local_snapshot[0], time.time() - 60)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES,
+                   PAGE_VISIT_FLUSH_SIZE=3, PAGE_VISIT_FLUSH_SECONDS=3600)
+class PageVisitBufferTests(TestCase):
+    def setUp(self):
+        visit_buffer.reset()
+        self.addCleanup(visit_buffer.reset)
+        site_stats.refresh_site_statistics()
+        self.addCleanup(site_stats.clear_site_statistics)
+
+    def test_home_visits_are_written_in_batches(self):
+        client = Client()
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                client.get(reverse('home_page'), REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(ctx.captured_queries, [])
+        self.assertEqual(visit_buffer.pending_count(), 2)
+
+        client.get(reverse('home_page'), REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(visit_buffer.pending_count(), 0)
+        visits = PageVisit.objects.order_by('id')
+        self.assertEqual([(v.ip_address, v.is_unique) for v in visits],
+                         [('10.0.0.1', True), ('10.0.0.1', False), ('10.0.0.2', True)])
+
+    def test_malformed_forwarded_address_is_dropped(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='unknown, 10.0.0.3')
+        visit = PageVisit.record_visit('home', request)
+        self.assertIsNone(visit.ip_address)
+        visit_buffer.flush()
+        self.assertEqual(PageVisit.objects.count(), 1)
+
+    def test_rollup_compacts_old_visits(self):
+        now = timezone.now()
+        old = now - timedelta(days=100)
+        PageVisit.objects.bulk_create([
+            PageVisit(page_name='home', ip_address='10.0.0.1', visited_at=old, is_unique=True),
+            PageVisit(page_name='home', ip_address='10.0.0.1', visited_at=old, is_unique=False),
+            PageVisit(page_name='home', ip_address='10.0.0.2', visited_at=now, is_unique=True),
+        ])
+        call_command('rollup_page_visits', days=90, stdout=StringIO())
+        PageVisit.objects.create(page_name='home', ip_address='10.0.0.4', visited_at=old)
+        call_command('rollup_page_visits', days=90, stdout=StringIO())
+
+        self.assertEqual(PageVisit.objects.count(), 1)
+        daily = PageVisitDaily.objects.get()
+        self.assertEqual((daily.visits, daily.unique_visits), (3, 2))
+        stats = site_stats.refresh_site_statistics()
+        self.assertEqual((stats['page_visits'], stats['unique_visitors']), ('4', '3'))
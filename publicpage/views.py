@@ -1,110 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from admin_section.models import Department, TrainingSite
 from django.contrib.auth import authenticate, login as auth_login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 import time
 import datetime
 from django.core.exceptions import ValidationError
-from accounts.models import CustomUser, Student, Staff, Doctor
+from accounts.models import Student, Staff, Doctor
 import os  # Moved os import here
 from django.http import FileResponse
 from django.conf import settings
 from django.db import models
 from django.core.paginator import Paginator
 from django.db.models import Sum
-from student_section.models import StudentLogFormModel
+from .site_stats import get_site_statistics
 
 
-def get_site_statistics():
-    """
-    Helper function to calculate and format site statistics
-    Returns a dictionary with formatted statistics
-    """
-    # Count users by role (only active users)
-    doctor_count = CustomUser.objects.filter(role='doctor', is_active=True).count()
-    staff_count = CustomUser.objects.filter(role='staff', is_active=True).count()
-    student_count = CustomUser.objects.filter(role='student', is_active=True).count()
-    admin_count = CustomUser.objects.filter(role='admin', is_active=True).count()
-
-    # Total active users
-    total_users = doctor_count + staff_count + student_count + admin_count
-
-    # Count institutions/departments (more comprehensive)
-    total_training_sites = TrainingSite.objects.count()
-    total_departments = Department.objects.count()
-    total_institutions = total_training_sites + total_departments
-
-    # Calculate real resources accessed
-    log_entries = StudentLogFormModel.objects.count()
-
-    # Add attendance records from doctor section
-    try:
-        from doctor_section.models import DoctorAttendance
-        attendance_records = DoctorAttendance.objects.count()
-    except ImportError:
-        attendance_records = 0
-
-    # Add emergency attendance records from staff section
-    try:
-        from staff_section.models import StaffEmergencyAttendance
-        emergency_attendance_records = StaffEmergencyAttendance.objects.count()
-    except ImportError:
-        emergency_attendance_records = 0
-
-    # Add blog posts and other content
-    try:
-        from admin_section.models import Blog
-        blog_posts = Blog.objects.filter(is_published=True).count()
-    except ImportError:
-        blog_posts = 0
-
-    # Add page visits tracking
-    try:
-        from .models import PageVisit
-        total_page_visits = PageVisit.objects.count()
-        unique_visitors = PageVisit.objects.filter(is_unique=True).count()
-    except ImportError:
-        total_page_visits = 0
-        unique_visitors = 0
-
-    # Calculate total logs (focus on actual log entries)
-    total_logs = log_entries  # Use actual student log entries
-
-    # Ensure minimum display values for better presentation
-    display_users = max(total_users, 8)  # Minimum 8 for demo
-    display_institutions = max(total_institutions, 1)  # Minimum 1 for demo
-    display_logs = max(total_logs, 30)  # Minimum 30 for demo to look professional
-
-    # Format numbers with commas for thousands
-    formatted_users = f"{display_users:,}+"
-    formatted_institutions = f"{display_institutions:,}+"
-    formatted_logs = f"{display_logs:,}+"
-
-    return {
-        'active_users': formatted_users,
-        'institutions': formatted_institutions,
-        'total_logs': formatted_logs,  # Changed from resources_accessed to total_logs
-        'support_available': '24/7',  # This is a static value
-        'doctor_count': f"{doctor_count:,}",
-        'staff_count': f"{staff_count:,}",
-        'student_count': f"{student_count:,}",
-        'admin_count': f"{admin_count:,}",
-        'total_users': f"{total_users:,}",
-        # Additional detailed stats
-        'log_entries': f"{log_entries:,}",  # Raw log entries count
-        'total_attendance': f"{attendance_records + emergency_attendance_records:,}",
-        'total_blogs': f"{blog_posts:,}",
-        'training_sites': f"{total_training_sites:,}",
-        'departments': f"{total_departments:,}",
-        'page_visits': f"{total_page_visits:,}",
-        'unique_visitors': f"{unique_visitors:,}",
-        # Raw numbers for calculations
-        'raw_users': total_users,
-        'raw_institutions': total_institutions,
-        'raw_logs': total_logs,
-    }
-
 # Create your views here.
 
 
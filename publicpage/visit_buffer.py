@@ -0,0 +1,130 @@
+"""
+Buffered PageVisit recording
+
+Visits are collected in process memory and written with one ``bulk_create``
+once PAGE_VISIT_FLUSH_SIZE visits are pending or PAGE_VISIT_FLUSH_SECONDS have
+passed since the last write (checked on each visit), and when the process
+exits. Whether a visit is unique (no visit to the same page from the same IP
+in the last hour) is decided from an in-memory map of recently seen IPs
+instead of a query; each worker process keeps its own map.
+"""
+import atexit
+import ipaddress
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SIZE = 50
+DEFAULT_FLUSH_SECONDS = 30
+UNIQUE_WINDOW = 3600
+# Number of (page, IP) pairs remembered per process
+MAX_RECENT_VISITORS = 50000
+
+_pending = []
+_recent = OrderedDict()
+_last_flush = time.monotonic()
+_lock = threading.Lock()
+
+
+def flush_size():
+    return getattr(settings, 'PAGE_VISIT_FLUSH_SIZE', DEFAULT_FLUSH_SIZE)
+
+
+def flush_seconds():
+    return getattr(settings, 'PAGE_VISIT_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+
+
+def _clean_ip(ip):
+    # A malformed forwarded address would make the whole batch fail to insert
+    try:
+        return str(ipaddress.ip_address((ip or '').strip()))
+    except ValueError:
+        return None
+
+
+def _seen_recently(key, now):
+    """Remember ``key`` as seen at ``now``; return whether it was seen within the window"""
+    seen_at = _recent.pop(key, None)
+    _recent[key] = now
+    # Entries are kept in the order they were last seen, so expired ones are at the front
+    while _recent:
+        oldest_key, oldest = next(iter(_recent.items()))
+        if now - oldest < UNIQUE_WINDOW and len(_recent) <= MAX_RECENT_VISITORS:
+            break
+        del _recent[oldest_key]
+    return seen_at is not None and now - seen_at < UNIQUE_WINDOW
+
+
+def record(visit):
+    """
+    Buffer an unsaved PageVisit
+
+    Args:
+        visit: PageVisit with page_name, ip_address and user_agent set
+
+    Returns:
+        The visit, with ip_address normalised and is_unique set. Every
+        ``flush_size()`` visits (or after ``flush_seconds()``) the buffer is
+        written before returning.
+    """
+    visit.ip_address = _clean_ip(visit.ip_address)
+    with _lock:
+        if visit.ip_address:
+            visit.is_unique = not _seen_recently((visit.page_name, visit.ip_address), time.time())
+        _pending.append(visit)
+        due = len(_pending) >= flush_size() or time.monotonic() - _last_flush >= flush_seconds()
+    if due:
+        flush()
+    return visit
+
+
+def flush():
+    """
+    Write all buffered visits with one bulk_create
+
+    Returns:
+        Number of visits written. Visits that fail to write are logged and
+        dropped rather than retried, so the buffer cannot grow without bound.
+    """
+    global _pending, _last_flush
+    with _lock:
+        batch, _pending = _pending, []
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+
+    from .models import PageVisit
+
+    try:
+        PageVisit.objects.bulk_create(batch)
+    except Exception:
+        logger.exception('Could not write %s buffered page visits', len(batch))
+        return 0
+    return len(batch)
+
+
+def pending_count():
+    """Number of visits waiting to be written"""
+    with _lock:
+        return len(_pending)
+
+
+def reset():
+    """Drop buffered visits and the recent-visitor map without writing them"""
+    global _pending
+    with _lock:
+        _pending = []
+        _recent.clear()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
@@ -0,0 +1,79 @@
+"""
+Retention of the PageVisit table.
+
+Raw visits older than the retention period are compacted into PageVisitDaily
+rows (one per page and day) and deleted, so the visit table only holds recent
+rows while the site statistics keep their all-time totals.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PageVisit, PageVisitDaily
+
+
+DEFAULT_RETENTION_DAYS = 90
+BATCH_SIZE = 1000
+
+
+def retention_days():
+    """Days raw visits are kept (PAGE_VISIT_RETENTION_DAYS setting)"""
+    return getattr(settings, 'PAGE_VISIT_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+
+
+def rollup_page_visits(days=None, now=None):
+    """
+    Compact visits older than ``days`` into daily counts and delete them
+
+    Args:
+        days: Retention period in days (defaults to ``retention_days()``)
+        now: Reference time, for tests
+
+    Returns:
+        (daily rows written, visits deleted)
+    """
+    days = retention_days() if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+
+    with transaction.atomic():
+        old_visits = PageVisit.objects.filter(visited_at__lt=cutoff)
+        rows = (
+            old_visits.order_by()
+            .annotate(date=TruncDate('visited_at'))
+            .values('page_name', 'date')
+            .annotate(visits=Count('id'), unique_visits=Count('id', filter=Q(is_unique=True)))
+        )
+        counts = {(row['page_name'], row['date']): row for row in rows}
+        if not counts:
+            return 0, 0
+
+        # A day may already hold visits compacted by an earlier run
+        existing = PageVisitDaily.objects.filter(
+            page_name__in={page for page, _ in counts}, date__in={date for _, date in counts}
+        )
+        for daily in existing:
+            row = counts.get((daily.page_name, daily.date))
+            if row:
+                row['visits'] += daily.visits
+                row['unique_visits'] += daily.unique_visits
+
+        PageVisitDaily.objects.bulk_create(
+            [PageVisitDaily(**row) for row in counts.values()],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['page_name', 'date'],
+            update_fields=['visits', 'unique_visits'],
+        )
+        deleted, _ = old_visits.delete()
+    return len(counts), deleted
+
+
+def visit_totals():
+    """Return (visits, unique visits) over the raw and compacted visits"""
+    raw = PageVisit.objects.aggregate(total=Count('id'), unique=Count('id', filter=Q(is_unique=True)))
+    daily = PageVisitDaily.objects.aggregate(total=Sum('visits'), unique=Sum('unique_visits'))
+    return raw['total'] + (daily['total'] or 0), raw['unique'] + (daily['unique'] or 0)
@@ -5,18 +5,21 @@ from django.http import JsonResponse, HttpResponse
 from django.db import transaction
 from django.utils import timezone
 from datetime import date
-import csv
 import io
-import tablib
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.lib import colors
-from utils.pdf_utils import add_agu_header, get_common_styles, add_footer_info
+from admin_section.export_jobs import background_export
+from utils.pdf_utils import (
+    add_agu_header, get_common_styles, add_footer_info, add_table, get_table_style, LazyFlowables, build_pdf,
+)
+from utils.csv_export import streaming_csv_response, iter_values, full_name
+from utils.excel_export import new_workbook, write_table, workbook_response
+from utils.conditional import conditional_json
 from .models import StaffEmergencyAttendance
 from .forms import EmergencyAttendanceForm, StudentEmergencyAttendanceForm
-from accounts.models import Student, Staff
+from accounts.models import Student, Staff, CustomUser
 from admin_section.models import Department, TrainingSite, Group
 
 
@@ -276,6 +279,7 @@ def emergency_attendance_summary(request):
 
 
 @login_required
+@conditional_json(Department, TrainingSite, Group, Student, CustomUser, StaffEmergencyAttendance, daily=True)
 def get_students_for_department(request):
     """AJAX endpoint to get students for a selected department"""
     try:
@@ -323,6 +327,7 @@ def get_students_for_department(request):
 
 
 @login_required
+@background_export('staff_section:export_emergency_attendance')
 def export_emergency_attendance(request):
     """Export emergency attendance records as CSV, PDF, or Excel based on the current filters"""
     try:
@@ -378,68 +383,68 @@ def export_emergency_attendance(request):
 
 
 def export_emergency_attendance_csv(attendances, filename_base):
-    """Export emergency attendance records as CSV file"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-
-    writer = csv.writer(response)
-
-    # Write header row
-    writer.writerow([
-        'Student ID', 'Student Name', 'Department', 'Training Site', 'Group',
-        'Date', 'Status', 'Marked At', 'Notes'
-    ])
-
-    # Write data rows
-    for attendance in attendances:
-        writer.writerow([
-            attendance.student.student_id,
-            attendance.student.user.get_full_name() or attendance.student.user.username,
-            attendance.department.name,
-            attendance.training_site.name if attendance.training_site else 'N/A',
-            attendance.group.group_name,
-            attendance.date.strftime('%Y-%m-%d'),
-            attendance.status.title(),
-            attendance.marked_at.strftime('%Y-%m-%d %H:%M:%S'),
-            attendance.notes or ''
-        ])
+    """Export emergency attendance records as a streamed CSV file"""
+    values = iter_values(
+        attendances,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'department__name', 'training_site__name', 'group__group_name',
+        'date', 'status', 'marked_at', 'notes',
+    )
 
-    return response
+    def rows():
+        # Header row
+        yield [
+            'Student ID', 'Student Name', 'Department', 'Training Site', 'Group',
+            'Date', 'Status', 'Marked At', 'Notes'
+        ]
+        for (student_id, first_name, last_name, username, department, training_site, group,
+             attendance_date, status, marked_at, notes) in values:
+            yield [
+                student_id,
+                full_name(first_name, last_name, username),
+                department,
+                training_site or 'N/A',
+                group,
+                attendance_date.strftime('%Y-%m-%d'),
+                status.title(),
+                marked_at.strftime('%Y-%m-%d %H:%M:%S'),
+                notes or ''
+            ]
+
+    return streaming_csv_response(f"{filename_base}.csv", rows())
 
 
 def export_emergency_attendance_excel(attendances, filename_base):
-    """Export emergency attendance records as Excel file"""
-    # Create a new dataset
-    data = tablib.Dataset()
-
-    # Add headers
-    data.headers = [
+    """Export emergency attendance records as a write-only Excel workbook"""
+    headers = [
         'Student ID', 'Student Name', 'Department', 'Training Site', 'Group',
         'Date', 'Status', 'Marked At', 'Notes'
     ]
-
-    # Add data rows
-    for attendance in attendances:
-        data.append([
-            attendance.student.student_id,
-            attendance.student.user.get_full_name() or attendance.student.user.username,
-            attendance.department.name,
-            attendance.training_site.name if attendance.training_site else 'N/A',
-            attendance.group.group_name,
-            attendance.date.strftime('%Y-%m-%d'),
-            attendance.status.title(),
-            attendance.marked_at.strftime('%Y-%m-%d %H:%M:%S'),
-            attendance.notes or ''
-        ])
-
-    # Create HTTP response with Excel content type
-    response = HttpResponse(
-        data.export('xlsx'),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    values = iter_values(
+        attendances,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'department__name', 'training_site__name', 'group__group_name',
+        'date', 'status', 'marked_at', 'notes',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name, username),
+            department,
+            training_site or 'N/A',
+            group,
+            attendance_date.strftime('%Y-%m-%d'),
+            status.title(),
+            marked_at.strftime('%Y-%m-%d %H:%M:%S'),
+            notes or ''
+        ]
+        for (student_id, first_name, last_name, username, department, training_site, group,
+             attendance_date, status, marked_at, notes) in values
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
 
-    return response
+    wb = new_workbook()
+    write_table(wb, 'Emergency Attendance', headers, rows)
+    return workbook_response(wb, f"{filename_base}.xlsx")
 
 
 def export_emergency_attendance_pdf(attendances, filename_base, staff):
@@ -452,7 +457,7 @@ def export_emergency_attendance_pdf(attendances, filename_base, staff):
 
     # Create the PDF document with landscape orientation for better table fit
     doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
+    elements = LazyFlowables()
 
     # Add AGU header with logo and university name
     elements = add_agu_header(elements, "Emergency Attendance Records Report")
@@ -465,42 +470,30 @@ def export_emergency_attendance_pdf(attendances, filename_base, staff):
     elements.append(Paragraph(f"Generated by: {staff_name}", custom_styles['subtitle']))
     elements.append(Spacer(1, 0.2*inch))
 
-    # Create table data
-    data = [['Student ID', 'Student Name', 'Department', 'Training Site', 'Group', 'Date', 'Status', 'Notes']]
-
-    # Add attendance data to table
-    for attendance in attendances:
-        data.append([
-            attendance.student.student_id,
-            attendance.student.user.get_full_name() or attendance.student.user.username,
-            attendance.department.name,
-            attendance.training_site.name if attendance.training_site else 'N/A',
-            attendance.group.group_name,
-            attendance.date.strftime('%Y-%m-%d'),
-            attendance.status.title(),
-            attendance.notes[:50] + '...' if attendance.notes and len(attendance.notes) > 50 else (attendance.notes or '')
-        ])
-
-    # Create table
-    table = Table(data, repeatRows=1)
-
-    # Style the table
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ])
-
-    table.setStyle(table_style)
-    elements.append(table)
+    # Rows are read in chunks while the document is built
+    values = iter_values(
+        attendances,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name',
+        'student__user__username', 'department__name', 'training_site__name', 'group__group_name',
+        'date', 'status', 'notes',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name, username),
+            department,
+            training_site or 'N/A',
+            group,
+            attendance_date.strftime('%Y-%m-%d'),
+            status.title(),
+            notes[:50] + '...' if notes and len(notes) > 50 else (notes or '')
+        ]
+        for (student_id, first_name, last_name, username, department, training_site, group,
+             attendance_date, status, notes) in values
+    )
+    headers = ['Student ID', 'Student Name', 'Department', 'Training Site', 'Group', 'Date', 'Status', 'Notes']
+    if not add_table(elements, headers, rows, get_table_style('#2563eb', 10, 8)):
+        elements.append(Paragraph("No emergency attendance records found for the selected criteria.", custom_styles['normal']))
 
     # Add footer information
     elements = add_footer_info(
@@ -510,7 +503,7 @@ def export_emergency_attendance_pdf(attendances, filename_base, staff):
     )
 
     # Build the PDF
-    doc.build(elements)
+    build_pdf(doc, elements)
 
     # Get the value of the buffer and write it to the response
     pdf = buffer.getvalue()
@@ -1,3 +1,58 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import CustomUser, Doctor, Staff
+from admin_section.tests import LogStatsFixtureMixin, make_log
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class StaffDashTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=2)
+        user = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', role='staff'
+        )
+        self.staff, _ = Staff.objects.get_or_create(user=user)
+        self.staff.departments.add(*self.departments)
+        self.client = Client()
+        self.client.force_login(user)
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('staff_section:staff_dash'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def _add_doctor(self, index):
+        user = CustomUser.objects.create_user(
+            username=f'doc{index}', email=f'doc{index}@example.com', password='pass', role='doctor'
+        )
+        doctor = Doctor.objects.get(user=user)
+        doctor.departments.add(self.departments[0])
+        return doctor
+
+    def test_doctor_table(self):
+        _, response = self._get()
+        doctors = {row['id']: row for row in response.context['doctors']}
+        self.assertEqual(doctors[self.doctor.id]['total_logs'], 6)
+        self.assertEqual(doctors[self.doctor.id]['reviewed_logs'], 4)
+        self.assertEqual(doctors[self.doctor.id]['departments'], 'Dept 0, Dept 1')
+        self.assertEqual(response.context['total_records'], 6)
+        self.assertEqual(response.context['left_to_review'], 2)
+
+    def test_query_count_independent_of_doctor_count(self):
+        self._get()  # first visit populates the session
+        small, _ = self._get()
+        for index in range(5):
+            make_log(self.student, self.departments[0], self._add_doctor(index), reviewed=True)
+        large, response = self._get()
+        self.assertEqual(len(response.context['doctors']), 6)
+        self.assertEqual(small, large)
+
+    def test_export_reviews_csv_streams_rows(self):
+        response = self.client.get(reverse('staff_section:export_staff_reviews'), {'format': 'csv', 'status': 'reviewed'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
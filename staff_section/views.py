@@ -8,21 +8,27 @@ from django.utils import timezone
 from django.db.models import Count
 from django.db.models.functions import TruncMonth
 from datetime import timedelta
-from threading import Thread
 from accounts.models import Staff, CustomUser
-from student_section.models import StudentLogFormModel
+from student_section.models import StudentLogFormModel, StudentLogRollup
+from student_section.rollup import deferred_rollup
+from student_section.reviews import REJECTED_PREFIX, review_logs
 from admin_section.models import Department, AdminNotification
 from .models import StaffSupportTicket, StaffNotification
 from .forms import LogReviewForm, BatchReviewForm, ProfileUpdateForm, StaffSupportTicketForm
 from django.http import HttpResponse
-import csv
 import io
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
 from reportlab.lib.units import inch
-from utils.pdf_utils import add_agu_header, get_common_styles, add_footer_info
-import tablib
+from admin_section.export_jobs import background_export
+from admin_section.outbox import queue_email
+from utils.pdf_utils import (
+    add_agu_header, get_common_styles, add_footer_info, add_table, get_table_style, LazyFlowables, build_pdf,
+)
+from utils.csv_export import streaming_csv_response, iter_values, full_name, format_datetime
+from utils.excel_export import new_workbook, write_table, workbook_response
+from utils.log_stats import group_rollup_counts, empty_status_counts, approval_rate
+from utils.notification_counts import forget_unread_counts, invalidate_unread_counts
 from django.conf import settings
 from datetime import datetime
 
@@ -98,74 +104,63 @@ def staff_dash(request):
     today = timezone.now()
     start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-    # Get accurate counts for performance metrics
-    reviewed_logs = StudentLogFormModel.objects.filter(
-        department__in=departments,
-        is_reviewed=True
+    # Pre-aggregated status counts for the staff's departments
+    dept_counts = group_rollup_counts(
+        StudentLogRollup.objects.filter(department__in=departments), 'department_id'
     )
-
-    pending_logs = StudentLogFormModel.objects.filter(
-        department__in=departments,
-        is_reviewed=False
-    )
-
-    monthly_reviews = StudentLogFormModel.objects.filter(
-        department__in=departments,
-        is_reviewed=True,
-        review_date__gte=start_of_month
-    ).count()
+    summary = empty_status_counts()
+    for counts in dept_counts.values():
+        for key in summary:
+            summary[key] += counts[key]
+    if selected_department:
+        selected_counts = dept_counts.get(int(selected_department), empty_status_counts())
+    else:
+        selected_counts = summary
+
+    # Per-doctor counts for the staff's departments in one grouped query; the
+    # monthly review headline is summed from the same rows
+    tutor_counts = {
+        row['tutor_id']: row
+        for row in StudentLogFormModel.objects.filter(department__in=departments)
+        .order_by()
+        .values('tutor_id')
+        .annotate(
+            total=Count('id'),
+            reviewed=Count('id', filter=models.Q(is_reviewed=True)),
+            monthly=Count('id', filter=models.Q(date__gte=start_of_month)),
+            monthly_reviews=Count('id', filter=models.Q(is_reviewed=True, review_date__gte=start_of_month)),
+        )
+    }
+    monthly_reviews = sum(row['monthly_reviews'] for row in tutor_counts.values())
 
     # Performance metrics
     performance_data = {
-        'total_reviews': reviewed_logs.count(),
-        'pending_reviews': pending_logs.count(),
+        'total_reviews': summary['reviewed'],
+        'pending_reviews': summary['pending'],
         'monthly_reviews': monthly_reviews,
-        'approval_rate': calculate_approval_rate(reviewed_logs),
+        'approval_rate': approval_rate(summary),
     }
 
     # Chart data
     chart_data = {
         'daily_reviews': get_daily_reviews_data(logs),
-        'department_stats': get_department_stats(logs, departments),
-        'review_status': get_review_status_data(logs),
+        'department_stats': get_department_stats(dept_counts, departments),
+        'review_status': get_review_status_data(selected_counts),
         'monthly_trend': get_monthly_trend_data(logs),
     }
 
-    # Get accurate counts directly from the database
-    # Total records in staff's departments
-    total_records = StudentLogFormModel.objects.filter(department__in=departments).count()
-
-    # Records that have been reviewed
-    reviewed_count = StudentLogFormModel.objects.filter(
-        department__in=departments,
-        is_reviewed=True
-    ).count()
-
-    # Records left to review
-    left_to_review = StudentLogFormModel.objects.filter(
-        department__in=departments,
-        is_reviewed=False
-    ).count()
-
-    # Double-check that counts are consistent
-    if total_records != (reviewed_count + left_to_review):
-        # If there's a discrepancy, recalculate to ensure consistency
-        total_records = reviewed_count + left_to_review
+    # Total, reviewed and pending records in staff's departments
+    total_records = summary['total']
+    reviewed_count = summary['reviewed']
+    left_to_review = summary['pending']
 
     # Get doctor information for display
     doctors_info = []
-    for doctor in filtered_doctors:
-        # Get performance metrics for this doctor
-        # Use tutor field instead of reviewer since there's no reviewer field
-        doctor_logs = StudentLogFormModel.objects.filter(
-            department__in=departments,
-            tutor=doctor
-        )
-
-        # Count total logs and reviewed logs
-        total_logs = doctor_logs.count()
-        reviewed_logs = doctor_logs.filter(is_reviewed=True).count()
-        monthly_logs = doctor_logs.filter(date__gte=start_of_month).count()
+    for doctor in filtered_doctors.select_related('user').prefetch_related('departments'):
+        counts = tutor_counts.get(doctor.id, {})
+        total_logs = counts.get('total', 0)
+        reviewed_logs = counts.get('reviewed', 0)
+        monthly_logs = counts.get('monthly', 0)
 
         doctors_info.append({
             'id': doctor.id,
@@ -248,18 +243,10 @@ def staff_support(request):
 
                 if notifications:
                     AdminNotification.objects.bulk_create(notifications)
+                    invalidate_unread_counts(AdminNotification, [n.recipient_id for n in notifications])
 
-                # Start a separate thread to send emails
-                if admin_emails:
-                    from threading import Thread
-                    from admin_section.views import send_admin_emails
-
-                    email_thread = Thread(
-                        target=send_admin_emails,
-                        args=(admin_emails, notification_title, notification_message)
-                    )
-                    email_thread.daemon = True
-                    email_thread.start()
+                # Sent by the run_email_worker command once this commits
+                queue_email(admin_emails, notification_title, notification_message)
 
             messages.success(request, "Support ticket submitted successfully. We will respond to your issue soon.")
             return redirect("staff_section:staff_support")
@@ -386,19 +373,6 @@ def staff_profile(request):
     return render(request, "staff_section/staff_profile.html", data)
 
 
-def calculate_approval_rate(reviewed_logs):
-    # reviewed_logs should already be filtered for is_reviewed=True
-    total_reviewed = reviewed_logs.count()
-    if total_reviewed == 0:
-        return 0
-
-    # Count rejected logs (those with REJECTED in comments)
-    rejected = reviewed_logs.filter(reviewer_comments__startswith='REJECTED').count()
-
-    # Calculate approval rate (percentage of non-rejected logs)
-    return round((1 - rejected / total_reviewed) * 100)
-
-
 def get_daily_reviews_data(logs):
     last_7_days = timezone.now() - timedelta(days=7)
     daily_reviews = logs.filter(
@@ -413,40 +387,24 @@ def get_daily_reviews_data(logs):
     }
 
 
-def get_department_stats(logs, departments):
+def get_department_stats(dept_counts, departments):
+    """Build per-department rows from counts keyed by department id"""
     dept_stats = []
     for dept in departments:
-        # Get accurate counts for each department
-        reviewed = StudentLogFormModel.objects.filter(
-            department=dept,
-            is_reviewed=True
-        ).count()
-
-        pending = StudentLogFormModel.objects.filter(
-            department=dept,
-            is_reviewed=False
-        ).count()
-
-        total = reviewed + pending
-
+        counts = dept_counts.get(dept.id, empty_status_counts())
         dept_stats.append({
             'name': dept.name,
-            'total': total,
-            'reviewed': reviewed,
-            'pending': pending
+            'total': counts['total'],
+            'reviewed': counts['reviewed'],
+            'pending': counts['pending']
         })
     return dept_stats
 
 
-def get_review_status_data(logs):
-    # Get accurate counts directly
-    reviewed = logs.filter(is_reviewed=True).count()
-    pending = logs.filter(is_reviewed=False).count()
-    total = reviewed + pending
-
+def get_review_status_data(counts):
     return {
         'labels': ['Reviewed', 'Pending'],
-        'data': [reviewed, pending]
+        'data': [counts['reviewed'], counts['pending']]
     }
 
 
@@ -487,6 +445,7 @@ def notifications(request):
     # Mark all as read if requested
     if request.GET.get('mark_all_read'):
         notifications_list.filter(is_read=False).update(is_read=True)
+        forget_unread_counts('staff', [request.user.pk])
         messages.success(request, "All notifications marked as read.")
         return redirect('staff_section:notifications')
 
@@ -608,44 +567,18 @@ def batch_review(request):
         messages.warning(request, "No logs found to review.")
         return redirect('staff_section:staff_reviews')
 
-    # Process logs in a transaction
-    with transaction.atomic():
-        for log in logs:
-            log.is_reviewed = True
-
-            # Set comments if provided
-            if comments:
-                log.reviewer_comments = comments
-
-            # Add rejection prefix if rejecting
-            if action == 'reject':
-                prefix = "REJECTED: "
-                if not log.reviewer_comments.startswith(prefix):
-                    log.reviewer_comments = prefix + log.reviewer_comments
-
-            # Set review date
-            log.review_date = timezone.now()
-            log.save()
+    def new_comment(log):
+        # Without a comment, a log keeps the one it has
+        comment = comments or log.reviewer_comments
+        if action == 'reject' and not comment.startswith(REJECTED_PREFIX):
+            comment = REJECTED_PREFIX + comment
+        return comment
 
-            # Create notification for the student
-            staff_name = request.user.get_full_name() or request.user.username
-            is_approved_text = 'approved' if action == 'approve' else 'rejected'
-            notification_title = f"Your log entry has been {is_approved_text}"
-            notification_message = f"{staff_name} has {is_approved_text} your log entry for {log.department.name} department on {log.date}."
-
-            if log.reviewer_comments:
-                notification_message += f" Comments: {log.reviewer_comments}"
+    staff_name = request.user.get_full_name() or request.user.username
+    with deferred_rollup():
+        reviewed = review_logs(logs, action, new_comment, reviewer=staff_name)
 
-            # Create notification in the database
-            from student_section.models import StudentNotification
-            StudentNotification.objects.create(
-                recipient=log.student,
-                log_entry=log,
-                title=notification_title,
-                message=notification_message
-            )
-
-    messages.success(request, f"{logs.count()} log entries have been {'approved' if action == 'approve' else 'rejected'}.")
+    messages.success(request, f"{len(reviewed)} log entries have been {'approved' if action == 'approve' else 'rejected'}.")
     return redirect('staff_section:staff_reviews')
 
 
@@ -664,6 +597,7 @@ def delete_support_ticket(request, ticket_id):
     return redirect('staff_section:staff_support')
 
 @login_required
+@background_export('staff_section:export_staff_reviews')
 def export_staff_reviews(request):
     staff = request.user.staff_profile
     export_format = request.GET.get('format', 'csv').lower()
@@ -700,109 +634,105 @@ def export_staff_reviews(request):
         return export_staff_reviews_csv(logs, filename_base)
 
 def export_staff_reviews_csv(logs, filename_base):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-    writer = csv.writer(response)
-    writer.writerow([
-        'Student ID', 'Student Name', 'Date', 'Department',
-        'Activity Type', 'Core Diagnosis', 'Status', 'Review Date', 'Comments'
-    ])
-    for log in logs:
-        status = 'Pending'
-        if log.is_reviewed:
-            status = 'Rejected' if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:') else 'Approved'
-        writer.writerow([
-            log.student.student_id,
-            log.student.user.get_full_name(),
-            log.date.strftime('%Y-%m-%d'),
-            log.department.name,
-            log.activity_type.name,
-            getattr(log.core_diagnosis, 'name', ''),
-            status,
-            log.review_date.strftime('%Y-%m-%d') if log.review_date else '',
-            log.reviewer_comments or ''
-        ])
-    return response
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name', 'date',
+        'department__name', 'activity_type__name', 'core_diagnosis__name', 'review_status',
+        'review_date', 'reviewer_comments',
+    )
+
+    def rows():
+        yield [
+            'Student ID', 'Student Name', 'Date', 'Department',
+            'Activity Type', 'Core Diagnosis', 'Status', 'Review Date', 'Comments'
+        ]
+        for (student_id, first_name, last_name, log_date, department, activity_type,
+             core_diagnosis, review_status, review_date, comments) in values:
+            yield [
+                student_id,
+                full_name(first_name, last_name),
+                log_date.strftime('%Y-%m-%d'),
+                department,
+                activity_type,
+                core_diagnosis or '',
+                status_labels[review_status],
+                format_datetime(review_date, '', '%Y-%m-%d'),
+                comments or ''
+            ]
+
+    return streaming_csv_response(f"{filename_base}.csv", rows())
 
 def export_staff_reviews_excel(logs, filename_base):
-    data = tablib.Dataset()
-    data.headers = [
+    headers = [
         'Student ID', 'Student Name', 'Date', 'Department',
         'Activity Type', 'Core Diagnosis', 'Status', 'Review Date', 'Comments'
     ]
-    for log in logs:
-        status = 'Pending'
-        if log.is_reviewed:
-            status = 'Rejected' if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:') else 'Approved'
-        data.append([
-            log.student.student_id,
-            log.student.user.get_full_name(),
-            log.date.strftime('%Y-%m-%d'),
-            log.department.name,
-            log.activity_type.name,
-            getattr(log.core_diagnosis, 'name', ''),
-            status,
-            log.review_date.strftime('%Y-%m-%d') if log.review_date else '',
-            log.reviewer_comments or ''
-        ])
-    response = HttpResponse(
-        data.export('xlsx'),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name', 'date',
+        'department__name', 'activity_type__name', 'core_diagnosis__name', 'review_status',
+        'review_date', 'reviewer_comments',
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-    return response
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name),
+            log_date.strftime('%Y-%m-%d'),
+            department,
+            activity_type,
+            core_diagnosis or '',
+            status_labels[review_status],
+            format_datetime(review_date, '', '%Y-%m-%d'),
+            comments or ''
+        ]
+        for (student_id, first_name, last_name, log_date, department, activity_type,
+             core_diagnosis, review_status, review_date, comments) in values
+    )
+    wb = new_workbook()
+    write_table(wb, 'Staff Reviews', headers, rows)
+    return workbook_response(wb, f"{filename_base}.xlsx")
 
 def export_staff_reviews_pdf(logs, filename_base, staff):
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{filename_base}.pdf"'
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
+    elements = LazyFlowables()
     elements = add_agu_header(elements, "Staff Reviews Report")
     custom_styles = get_common_styles()
     staff_name = staff.user.get_full_name() or staff.user.username
     elements.append(Paragraph(f"Staff: {staff_name}", custom_styles['subtitle']))
     elements.append(Paragraph(f"Departments: {', '.join([dept.name for dept in staff.departments.all()])}", custom_styles['normal']))
-    elements.append(Paragraph(f"Total Records: {len(logs)}", custom_styles['normal']))
+    elements.append(Paragraph(f"Total Records: {logs.count()}", custom_styles['normal']))
     elements.append(Spacer(1, 0.3*inch))
-    data = [
-        ['Student ID', 'Student Name', 'Date', 'Department', 'Activity Type', 'Status']
-    ]
-    for log in logs:
-        status = 'Pending'
-        if log.is_reviewed:
-            status = 'Rejected' if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:') else 'Approved'
-        data.append([
-            log.student.student_id,
-            log.student.user.get_full_name(),
-            log.date.strftime('%Y-%m-%d'),
-            log.department.name,
-            log.activity_type.name,
-            status
-        ])
-    table = Table(data, repeatRows=1)
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ])
-    for i in range(1, len(data)):
-        if i % 2 == 0:
-            table_style.add('BACKGROUND', (0, i), (-1, i), colors.lightgrey)
-    table.setStyle(table_style)
-    elements.append(table)
+    status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+    values = iter_values(
+        logs,
+        'student__student_id', 'student__user__first_name', 'student__user__last_name', 'date',
+        'department__name', 'activity_type__name', 'review_status',
+    )
+    rows = (
+        [
+            student_id,
+            full_name(first_name, last_name),
+            log_date.strftime('%Y-%m-%d'),
+            department,
+            activity_type,
+            status_labels[review_status]
+        ]
+        for (student_id, first_name, last_name, log_date, department, activity_type, review_status) in values
+    )
+    headers = ['Student ID', 'Student Name', 'Date', 'Department', 'Activity Type', 'Status']
+    if not add_table(elements, headers, rows, get_table_style('lightblue', 12, row_colors=('white', 'lightgrey'))):
+        elements.append(Paragraph("No logs found for the selected criteria.", custom_styles['normal']))
     elements = add_footer_info(
         elements,
         generated_by=staff_name,
         export_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     )
-    doc.build(elements)
+    build_pdf(doc, elements)
     pdf = buffer.getvalue()
     buffer.close()
     response.write(pdf)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StudentSectionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'student_section'
+
+    def ready(self):
+        import student_section.signals  # Import signals to register them
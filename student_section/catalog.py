@@ -0,0 +1,114 @@
+"""
+Cached lookup catalog for the student log form
+
+The log form's dependent dropdowns (department -> activity type -> core
+diagnosis, and department -> tutor) are served from one JSON document per log
+year, built with four queries and kept in the shared ``users`` cache together
+with its ETag. Saving or deleting a department, activity type, core diagnosis
+or tutor (see ``student_section.signals``) replaces the catalog version, so
+the next request rebuilds the document and browsers revalidating with
+``If-None-Match`` receive the new one.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+
+from accounts.models import Doctor
+from admin_section.models import ActivityType, CoreDiaProSession, Department
+from utils.conditional import bump_versions, get_versions, version_cache
+from utils.csv_export import full_name
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'log-catalog-version'
+CATALOG_KEY = 'log-catalog:{}:{}'
+# Catalogs of old versions are never read again and expire on their own
+CATALOG_TIMEOUT = 24 * 60 * 60
+
+
+def invalidate_catalog():
+    """Make every process rebuild the catalogs on their next request"""
+    bump_versions(VERSION_KEY)
+
+
+def build_catalog(log_year_id):
+    """
+    Return the department tree of a log year
+
+    Returns:
+        ``{"log_year": id, "departments": [{"id", "name", "activity_types":
+        [{"id", "name", "core_diagnoses": [{"id", "name"}]}], "tutors":
+        [{"id", "name"}]}]}`` with every list ordered like the per-field
+        lookup endpoints.
+    """
+    departments = list(
+        Department.objects.filter(log_year_id=log_year_id).order_by('name').values_list('id', 'name')
+    )
+    department_ids = [dept_id for dept_id, _ in departments]
+
+    diagnoses = defaultdict(list)
+    core_rows = (
+        CoreDiaProSession.objects.filter(activity_type__department_id__in=department_ids)
+        .order_by('name').values_list('activity_type_id', 'id', 'name')
+    )
+    for activity_type_id, core_id, name in core_rows:
+        diagnoses[activity_type_id].append({'id': core_id, 'name': name})
+
+    activity_types = defaultdict(list)
+    activity_rows = (
+        ActivityType.objects.filter(department_id__in=department_ids)
+        .order_by('name').values_list('department_id', 'id', 'name')
+    )
+    for department_id, activity_id, name in activity_rows:
+        activity_types[department_id].append(
+            {'id': activity_id, 'name': name, 'core_diagnoses': diagnoses[activity_id]}
+        )
+
+    tutors = defaultdict(list)
+    tutor_rows = (
+        Doctor.departments.through.objects.filter(department_id__in=department_ids)
+        .order_by('doctor__user__first_name', 'doctor_id')
+        .values_list('department_id', 'doctor_id', 'doctor__user__first_name', 'doctor__user__last_name')
+    )
+    for department_id, doctor_id, first_name, last_name in tutor_rows:
+        tutors[department_id].append({'id': doctor_id, 'name': full_name(first_name, last_name)})
+
+    return {
+        'log_year': log_year_id,
+        'departments': [
+            {
+                'id': dept_id,
+                'name': name,
+                'activity_types': activity_types[dept_id],
+                'tutors': tutors[dept_id],
+            }
+            for dept_id, name in departments
+        ],
+    }
+
+
+def get_catalog(log_year_id):
+    """
+    Return ``(etag, json_bytes)`` for the catalog of a log year
+
+    The document is built once per catalog version and served from the
+    cache afterwards; the ETag is a hash of its content.
+    """
+    try:
+        key = CATALOG_KEY.format(log_year_id, *get_versions(VERSION_KEY))
+        cached = version_cache().get(key)
+    except Exception:
+        logger.exception('Log catalog cache unavailable')
+        key = cached = None
+    if cached is not None:
+        return cached
+
+    body = json.dumps(build_catalog(log_year_id), separators=(',', ':')).encode()
+    etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+    if key is not None:
+        try:
+            version_cache().set(key, (etag, body), CATALOG_TIMEOUT)
+        except Exception:
+            logger.exception('Could not store the log catalog')
+    return etag, body
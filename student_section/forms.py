@@ -2,7 +2,8 @@ from django import forms
 from django.utils import timezone
 from datetime import timedelta
 from .models import StudentLogFormModel, SupportTicket
-from admin_section.models import Department, ActivityType, CoreDiaProSession, DateRestrictionSettings, TrainingSite, MappedAttendance
+from admin_section.date_settings import get_date_settings
+from admin_section.models import Department, ActivityType, CoreDiaProSession, TrainingSite, MappedAttendance
 from accounts.models import Doctor, Student
 
 
@@ -91,41 +92,26 @@ class StudentLogFormModelForm(forms.ModelForm):
                 else:
                     self.fields["training_site"].queryset = TrainingSite.objects.none()
 
-                # Department selection logic
-                department = None
-                if self.instance.pk and self.instance.department:
-                    department = self.instance.department
-                elif "department" in self.data:
-                    try:
-                        department_id = self.data.get("department")
-                        department = Department.objects.get(id=department_id)
-                    except (ValueError, Department.DoesNotExist):
-                        pass
-
-                if department:
+                # Department selection logic; only the ids are needed to
+                # narrow the dependent querysets, so no rows are fetched here
+                department_id = self._selected_id("department")
+
+                if department_id:
                     # Activity Type queryset based on department
                     self.fields["activity_type"].queryset = ActivityType.objects.filter(
-                        department=department
+                        department_id=department_id
                     ).order_by('name')
                     # Tutor queryset based on department
                     self.fields["tutor"].queryset = Doctor.objects.filter(
-                        departments=department
+                        departments=department_id
                     ).distinct()
-                    
+
                     # Activity Type selection logic
-                    activity_type = None
-                    if self.instance.pk and self.instance.activity_type:
-                        activity_type = self.instance.activity_type
-                    elif "activity_type" in self.data:
-                        try:
-                            activity_type_id = self.data.get("activity_type")
-                            activity_type = ActivityType.objects.get(id=activity_type_id)
-                        except (ValueError, ActivityType.DoesNotExist):
-                            pass
-
-                    if activity_type:
+                    activity_type_id = self._selected_id("activity_type")
+
+                    if activity_type_id:
                         self.fields["core_diagnosis"].queryset = CoreDiaProSession.objects.filter(
-                            activity_type=activity_type
+                            activity_type_id=activity_type_id
                         )
                     else:
                         self.fields["core_diagnosis"].queryset = CoreDiaProSession.objects.none()
@@ -140,6 +126,16 @@ class StudentLogFormModelForm(forms.ModelForm):
                 self.fields["tutor"].queryset = Doctor.objects.none()
                 self.fields["training_site"].queryset = TrainingSite.objects.none()
 
+    def _selected_id(self, field):
+        """Return the id chosen for ``field`` on the instance or in the submitted data"""
+        instance_id = getattr(self.instance, f"{field}_id", None)
+        if self.instance.pk and instance_id:
+            return instance_id
+        try:
+            return int(self.data.get(field, ""))
+        except (TypeError, ValueError):
+            return None
+
     def clean(self):
         cleaned_data = super().clean()
         department = cleaned_data.get("department")
@@ -170,13 +166,7 @@ class StudentLogFormModelForm(forms.ModelForm):
             request = self.request if hasattr(self, 'request') else None
 
             try:
-                settings = DateRestrictionSettings.objects.first()
-                if not settings:
-                    settings = DateRestrictionSettings.objects.create(
-                        past_days_limit=7,
-                        allow_future_dates=False,
-                        future_days_limit=0
-                    )
+                settings = get_date_settings(create=True)
 
                 is_active = True
                 if request and hasattr(request, 'session'):
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from student_section.models import StudentLogFormModel
+from student_section.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the StudentLogRollup table from all student log entries'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING(
+            f'Rebuilding log rollup from {StudentLogFormModel.objects.count()} logs'
+        ))
+        rows = rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {rows} rollup rows'))
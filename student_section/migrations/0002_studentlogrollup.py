@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-16 22:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollup(apps, schema_editor):
+    StudentLogFormModel = apps.get_model('student_section', 'StudentLogFormModel')
+    StudentLogRollup = apps.get_model('student_section', 'StudentLogRollup')
+
+    rejected = Q(is_reviewed=True, reviewer_comments__startswith='REJECTED')
+    rows = (
+        StudentLogFormModel.objects.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('department_id', 'tutor_id', 'student_id', 'log_year_id', 'month')
+        .annotate(
+            total=Count('id'),
+            reviewed=Count('id', filter=Q(is_reviewed=True)),
+            approved=Count('id', filter=Q(is_reviewed=True) & ~rejected),
+            rejected=Count('id', filter=rejected),
+        )
+    )
+    StudentLogRollup.objects.bulk_create((StudentLogRollup(**row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_merge_0006_add_soft_delete_fields_0006_ssostate'),
+        ('admin_section', '0002_blogcategory_alter_blog_category_blog_category_new'),
+        ('student_section', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the logs are dated in')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('reviewed', models.PositiveIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_rollups', to='admin_section.department')),
+                ('log_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_rollups', to='admin_section.logyear')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_rollups', to='accounts.student')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_rollups', to='accounts.doctor')),
+            ],
+            options={
+                'verbose_name': 'Student Log Rollup',
+                'verbose_name_plural': 'Student Log Rollups',
+                'unique_together': {('department', 'tutor', 'student', 'log_year', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+def backfill_review_status(apps, schema_editor):
+    StudentLogFormModel = apps.get_model('student_section', 'StudentLogFormModel')
+    reviewed = StudentLogFormModel.objects.filter(is_reviewed=True)
+    reviewed.filter(reviewer_comments__startswith='REJECTED').update(review_status='rejected')
+    reviewed.exclude(reviewer_comments__startswith='REJECTED').update(review_status='approved')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_section', '0002_studentlogrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentlogformmodel',
+            name='review_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(backfill_review_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='studentlogformmodel',
+            index=models.Index(fields=['department', 'review_status', 'date'], name='log_dept_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentlogformmodel',
+            index=models.Index(fields=['tutor', 'review_status'], name='log_tutor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentlogformmodel',
+            index=models.Index(fields=['student', 'review_status'], name='log_student_status_idx'),
+        ),
+    ]
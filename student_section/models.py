@@ -4,7 +4,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from datetime import timedelta
 from accounts.models import Student, CustomUser, Doctor
-from admin_section.models import LogYear, LogYearSection, Group, Department, TrainingSite, ActivityType, CoreDiaProSession, DateRestrictionSettings
+from admin_section.date_settings import get_date_settings
+from admin_section.models import LogYear, LogYearSection, Group, Department, TrainingSite, ActivityType, CoreDiaProSession
 
 # Create your models here.
 
@@ -62,17 +63,90 @@ class StudentLogFormModel(models.Model):
     reviewer_comments = models.TextField(blank=True)
     review_deadline = models.DateTimeField(null=True, blank=True, help_text="Deadline by which the doctor must review this log")
 
+    # Outcome of the review, derived from is_reviewed and the "REJECTED" comment
+    # prefix on save so status filters and counts can use an index.
+    STATUS_PENDING = 'pending'
+    STATUS_APPROVED = 'approved'
+    STATUS_REJECTED = 'rejected'
+    REVIEW_STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_APPROVED, 'Approved'),
+        (STATUS_REJECTED, 'Rejected'),
+    ]
+    review_status = models.CharField(max_length=10, choices=REVIEW_STATUS_CHOICES, default=STATUS_PENDING)
+
     class Meta:
         ordering = ['-date', '-created_at']
         verbose_name = "Student Log Form"
         verbose_name_plural = "Student Log Forms"
+        indexes = [
+            models.Index(fields=['department', 'review_status', 'date'], name='log_dept_status_date_idx'),
+            models.Index(fields=['tutor', 'review_status'], name='log_tutor_status_idx'),
+            models.Index(fields=['student', 'review_status'], name='log_student_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        self.review_status = self.derive_review_status(self.is_reviewed, self.reviewer_comments)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'is_reviewed', 'reviewer_comments'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'review_status'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def derive_review_status(cls, is_reviewed, reviewer_comments):
+        """Return the review_status value for the given review fields"""
+        if not is_reviewed:
+            return cls.STATUS_PENDING
+        if reviewer_comments and reviewer_comments.startswith('REJECTED'):
+            return cls.STATUS_REJECTED
+        return cls.STATUS_APPROVED
+
     def get_status(self):
         return "Reviewed" if self.is_reviewed else "Pending Review"
 
+    @property
+    def is_rejected(self):
+        return self.review_status == self.STATUS_REJECTED
+
+
+# Log Statistics Rollup Model
+class StudentLogRollup(models.Model):
+    """Pre-aggregated review counts for StudentLogFormModel.
+
+    One row per (department, tutor, student, log year, month) bucket. Rows are
+    kept in sync by the signal handlers in ``student_section.signals`` and can
+    be rebuilt from scratch with the ``rebuild_log_rollup`` management command.
+    Dashboards sum these rows instead of counting the full log table.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='log_rollups')
+    tutor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='log_rollups')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='log_rollups')
+    log_year = models.ForeignKey(LogYear, on_delete=models.CASCADE, related_name='log_rollups')
+    month = models.DateField(help_text="First day of the month the logs are dated in")
+
+    # Counters
+    total = models.PositiveIntegerField(default=0)
+    reviewed = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['department', 'tutor', 'student', 'log_year', 'month']
+        verbose_name = "Student Log Rollup"
+        verbose_name_plural = "Student Log Rollups"
+
+    def __str__(self):
+        return f"{self.department_id}/{self.tutor_id}/{self.student_id} {self.month:%Y-%m}: {self.total}"
+
+    @property
+    def pending(self):
+        return self.total - self.reviewed
+
 
 # Support Ticket Model
 class SupportTicket(models.Model):
@@ -137,7 +211,7 @@ def set_review_deadline(sender, instance, created, **kwargs):
         # Only set deadline for newly created logs
         try:
             # Get the review period from settings
-            settings = DateRestrictionSettings.objects.first()
+            settings = get_date_settings()
             if settings and settings.doctor_review_enabled:
                 # Calculate deadline based on creation date and review period
                 review_period = settings.doctor_review_period
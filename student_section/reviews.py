@@ -0,0 +1,93 @@
+"""
+Set-based batch review of student logs
+
+``review_logs`` marks a selection of logs as reviewed with one UPDATE (one
+``bulk_update`` per batch when each log keeps its own comment), creates the
+students' notifications with one ``bulk_create`` and queues their emails in
+the outbox with another (see ``admin_section.outbox``). These writes send no
+signals, so the rollup buckets, cached model versions and unread notification
+counts are refreshed here.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from admin_section.outbox import queue_emails
+from utils.conditional import bump_model_versions
+from utils.notification_counts import forget_unread_counts
+from .models import StudentLogFormModel, StudentNotification
+from .rollup import mark_dirty, rollup_key
+
+REJECTED_PREFIX = "REJECTED: "
+BATCH_SIZE = 500
+REVIEW_FIELDS = ['is_reviewed', 'review_date', 'reviewer_comments', 'review_status', 'updated_at']
+
+
+def batch_comment(action, comments):
+    """Return the comment doctors and admins give every log of a batch review"""
+    if action == 'reject':
+        return REJECTED_PREFIX + (comments or "Batch rejected")
+    return comments or "Approved"
+
+
+def review_logs(logs, action, comments, reviewer=None, email=False):
+    """
+    Mark logs as reviewed and notify their students
+
+    Args:
+        logs: Queryset of the logs to review
+        action: ``'approve'`` or ``'reject'``
+        comments: Reviewer comment given to every log, or a function
+            returning the new comment of a log
+        reviewer: How notifications name the reviewer ("Dr. Jane Doe");
+            no notifications are created when None
+        email: Also email the notifications to the students
+
+    Returns:
+        The reviewed logs
+    """
+    logs = list(logs.select_related('department', 'student__user').order_by('pk'))
+    if not logs:
+        return logs
+
+    now = timezone.now()
+    for log in logs:
+        log.is_reviewed = True
+        log.review_date = now
+        # bulk writes skip auto_now
+        log.updated_at = now
+        log.reviewer_comments = comments(log) if callable(comments) else comments
+        log.review_status = StudentLogFormModel.derive_review_status(True, log.reviewer_comments)
+
+    with transaction.atomic():
+        if callable(comments):
+            StudentLogFormModel.objects.bulk_update(logs, REVIEW_FIELDS, batch_size=BATCH_SIZE)
+        else:
+            StudentLogFormModel.objects.filter(pk__in=[log.pk for log in logs]).update(
+                **{field: getattr(logs[0], field) for field in REVIEW_FIELDS}
+            )
+        mark_dirty(*(rollup_key(log) for log in logs))
+        bump_model_versions(StudentLogFormModel)
+
+        if reviewer is not None:
+            _notify(logs, action, reviewer, email)
+    return logs
+
+
+def _notify(logs, action, reviewer, email):
+    is_approved_text = 'approved' if action == 'approve' else 'rejected'
+    title = f"Your log entry has been {is_approved_text}"
+    notifications = []
+    emails = []
+    for log in logs:
+        message = f"{reviewer} has {is_approved_text} your log entry for {log.department.name} department on {log.date}."
+        if log.reviewer_comments:
+            message += f" Comments: {log.reviewer_comments}"
+        notifications.append(StudentNotification(recipient=log.student, log_entry=log, title=title, message=message))
+        if email:
+            emails.append(([log.student.user.email], title, message))
+
+    StudentNotification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+    user_ids = {log.student.user_id for log in logs}
+    forget_unread_counts('student', user_ids)
+    transaction.on_commit(lambda: forget_unread_counts('student', user_ids))
+    queue_emails(emails)
@@ -0,0 +1,143 @@
+"""
+Maintenance of the StudentLogRollup table.
+
+Every write to StudentLogFormModel marks the rollup bucket(s) it touches as
+dirty; dirty buckets are recounted from the log table and upserted. Inside
+``deferred_rollup()`` the dirty buckets are collected and recounted once when
+the block exits, so batch operations pay for one grouped query instead of one
+per log.
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import TruncMonth
+
+from utils.log_stats import status_aggregates
+from .models import StudentLogFormModel, StudentLogRollup
+
+
+KEY_FIELDS = ('department_id', 'tutor_id', 'student_id', 'log_year_id', 'month')
+COUNTER_FIELDS = ('total', 'reviewed', 'approved', 'rejected')
+BATCH_SIZE = 1000
+
+RollupKey = namedtuple('RollupKey', KEY_FIELDS)
+
+_local = threading.local()
+
+
+def rollup_key(log):
+    """Return the rollup bucket a log instance belongs to, or None if incomplete"""
+    if log.date is None or None in (log.department_id, log.tutor_id, log.student_id, log.log_year_id):
+        return None
+    return RollupKey(log.department_id, log.tutor_id, log.student_id, log.log_year_id, log.date.replace(day=1))
+
+
+def _grouped_counts(logs):
+    """Yield (key, counters) for every bucket present in ``logs``"""
+    aggregates = status_aggregates()
+    rows = (
+        logs.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values(*KEY_FIELDS)
+        .annotate(**{name: aggregates[name] for name in COUNTER_FIELDS})
+    )
+    for row in rows:
+        yield RollupKey(*(row[field] for field in KEY_FIELDS)), {name: row[name] for name in COUNTER_FIELDS}
+
+
+def _key_filter(keys):
+    return reduce(or_, (Q(**key._asdict()) for key in keys))
+
+
+def _upsert(counts):
+    objs = [StudentLogRollup(**key._asdict(), **counters) for key, counters in counts.items()]
+    StudentLogRollup.objects.bulk_create(
+        objs,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['department', 'tutor', 'student', 'log_year', 'month'],
+        update_fields=list(COUNTER_FIELDS) + ['updated_at'],
+    )
+
+
+def refresh_rollup(keys):
+    """
+    Recount the given rollup buckets from the log table
+
+    Args:
+        keys: Iterable of RollupKey (None entries are ignored)
+
+    Buckets that no longer contain any logs are deleted.
+    """
+    keys = {key for key in keys if key is not None}
+    if not keys:
+        return
+
+    logs = StudentLogFormModel.objects.filter(
+        department_id__in={key.department_id for key in keys},
+        tutor_id__in={key.tutor_id for key in keys},
+        student_id__in={key.student_id for key in keys},
+        log_year_id__in={key.log_year_id for key in keys},
+        date__gte=min(key.month for key in keys),
+    )
+    counts = {key: counters for key, counters in _grouped_counts(logs) if key in keys}
+    empty = keys - set(counts)
+
+    with transaction.atomic():
+        if counts:
+            _upsert(counts)
+        if empty:
+            StudentLogRollup.objects.filter(_key_filter(empty)).delete()
+
+
+def rebuild_rollup():
+    """
+    Rebuild the whole rollup table from StudentLogFormModel
+
+    Returns:
+        Number of rollup rows written
+    """
+    with transaction.atomic():
+        StudentLogRollup.objects.all().delete()
+        objs = [
+            StudentLogRollup(**key._asdict(), **counters)
+            for key, counters in _grouped_counts(StudentLogFormModel.objects.all())
+        ]
+        StudentLogRollup.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    return len(objs)
+
+
+def mark_dirty(*keys):
+    """Recount ``keys`` now, or when the enclosing deferred_rollup() block exits"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(key for key in keys if key is not None)
+    else:
+        refresh_rollup(keys)
+
+
+@contextmanager
+def deferred_rollup():
+    """
+    Collect rollup updates made inside the block and apply them once at the end
+
+    Nested blocks are merged into the outermost one. If the block raises, the
+    pending updates are dropped along with the failed writes.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = set()
+    try:
+        yield
+    except BaseException:
+        _local.pending = None
+        raise
+    pending, _local.pending = _local.pending, None
+    refresh_rollup(pending)
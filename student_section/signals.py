@@ -0,0 +1,56 @@
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import CustomUser, Doctor
+from admin_section.models import ActivityType, CoreDiaProSession, Department
+from .catalog import invalidate_catalog
+from .models import StudentLogFormModel
+from .rollup import rollup_key, mark_dirty
+
+# Attributes a log needs loaded for its rollup bucket to be known without
+# triggering a deferred-field query.
+ROLLUP_ATTNAMES = ('date', 'department_id', 'tutor_id', 'student_id', 'log_year_id')
+
+
+@receiver(post_init, sender=StudentLogFormModel)
+def remember_rollup_key(sender, instance, **kwargs):
+    """Remember which rollup bucket a log was loaded in, so moves can be detected"""
+    if all(name in instance.__dict__ for name in ROLLUP_ATTNAMES):
+        instance._rollup_key = rollup_key(instance)
+
+
+@receiver(post_save, sender=StudentLogFormModel)
+def update_rollup_on_save(sender, instance, created, **kwargs):
+    """Recount the bucket a log was saved into (and the one it left, if any)"""
+    new_key = rollup_key(instance)
+    old_key = None if created else getattr(instance, '_rollup_key', None)
+    mark_dirty(old_key, new_key)
+    instance._rollup_key = new_key
+
+
+@receiver(post_delete, sender=StudentLogFormModel)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Recount the bucket a deleted log was counted in"""
+    mark_dirty(getattr(instance, '_rollup_key', None) or rollup_key(instance))
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=ActivityType)
+@receiver(post_delete, sender=ActivityType)
+@receiver(post_save, sender=CoreDiaProSession)
+@receiver(post_delete, sender=CoreDiaProSession)
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(m2m_changed, sender=Doctor.departments.through)
+def invalidate_catalog_on_change(sender, action='post_save', **kwargs):
+    """Rebuild the log form catalog after a department, activity, diagnosis or tutor change"""
+    if action.startswith('post_'):
+        invalidate_catalog()
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_catalog_on_tutor_rename(sender, instance, update_fields=None, **kwargs):
+    """Tutor names are part of the catalog; logins only touch last_login"""
+    if instance.role == 'doctor' and update_fields != frozenset({'last_login'}):
+        invalidate_catalog()
@@ -1,3 +1,150 @@
-from django.test import TestCase
+from datetime import date
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.tests.test_user_cache import USER_CACHE_TEST_CACHES
+from admin_section.models import ActivityType
+from admin_section.tests import LogStatsFixtureMixin, make_log
+from student_section.models import StudentLogFormModel, StudentLogRollup
+from student_section.rollup import deferred_rollup, rebuild_rollup
+from utils.log_stats import summarize_logs, summarize_rollups
+
+
+class StudentLogRollupTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture()
+
+    def assertRollupMatchesLogs(self):
+        self.assertEqual(
+            summarize_rollups(StudentLogRollup.objects.all()),
+            summarize_logs(StudentLogFormModel.objects.all()),
+        )
+        snapshot = sorted(StudentLogRollup.objects.values_list(
+            'department', 'tutor', 'student', 'log_year', 'month', 'total', 'reviewed', 'approved', 'rejected'
+        ))
+        rebuild_rollup()
+        rebuilt = sorted(StudentLogRollup.objects.values_list(
+            'department', 'tutor', 'student', 'log_year', 'month', 'total', 'reviewed', 'approved', 'rejected'
+        ))
+        self.assertEqual(snapshot, rebuilt)
+
+    def test_create_updates_rollup(self):
+        self.assertEqual(StudentLogRollup.objects.count(), 2)
+        self.assertRollupMatchesLogs()
+
+    def test_review_updates_rollup(self):
+        log = StudentLogFormModel.objects.filter(is_reviewed=False).first()
+        log.is_reviewed = True
+        log.reviewer_comments = 'REJECTED: missing details'
+        log.save()
+        counts = summarize_rollups(StudentLogRollup.objects.filter(department=log.department))
+        self.assertEqual(counts['rejected'], 2)
+        self.assertEqual(counts['pending'], 0)
+        self.assertRollupMatchesLogs()
+
+    def test_moving_log_to_another_month_updates_both_buckets(self):
+        log = StudentLogFormModel.objects.first()
+        log.date = date(2025, 3, 2)
+        log.save()
+        self.assertEqual(StudentLogRollup.objects.count(), 3)
+        self.assertRollupMatchesLogs()
+
+    def test_delete_removes_empty_bucket(self):
+        StudentLogFormModel.objects.filter(department=self.departments[0]).delete()
+        self.assertFalse(StudentLogRollup.objects.filter(department=self.departments[0]).exists())
+        self.assertRollupMatchesLogs()
+
+    def test_deferred_rollup_refreshes_once(self):
+        with deferred_rollup():
+            for log in StudentLogFormModel.objects.filter(is_reviewed=False):
+                log.is_reviewed = True
+                log.save()
+            self.assertEqual(summarize_rollups(StudentLogRollup.objects.all())['pending'], 2)
+        self.assertEqual(summarize_rollups(StudentLogRollup.objects.all())['pending'], 0)
+        self.assertRollupMatchesLogs()
+
+    def test_rebuild_command(self):
+        StudentLogRollup.objects.all().delete()
+        call_command('rebuild_log_rollup', stdout=StringIO())
+        self.assertEqual(StudentLogRollup.objects.count(), 2)
+        self.assertEqual(summarize_rollups(StudentLogRollup.objects.all())['total'], 6)
+
+    def test_new_log_in_same_bucket(self):
+        make_log(self.student, self.departments[0], self.doctor, reviewed=True, comments='Fine')
+        counts = summarize_rollups(StudentLogRollup.objects.filter(department=self.departments[0]))
+        self.assertEqual(counts['total'], 4)
+        self.assertEqual(counts['approved'], 2)
+        self.assertRollupMatchesLogs()
+
+
+class ReviewStatusTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=1)
+
+    def test_status_derived_on_save(self):
+        statuses = sorted(StudentLogFormModel.objects.values_list('review_status', flat=True))
+        self.assertEqual(statuses, ['approved', 'pending', 'rejected'])
+
+    def test_update_fields_includes_review_status(self):
+        log = StudentLogFormModel.objects.get(review_status=StudentLogFormModel.STATUS_PENDING)
+        log.is_reviewed = True
+        log.reviewer_comments = 'REJECTED: wrong date'
+        log.save(update_fields=['is_reviewed', 'reviewer_comments'])
+        log.refresh_from_db()
+        self.assertTrue(log.is_rejected)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=USER_CACHE_TEST_CACHES)
+class LogCatalogTests(LogStatsFixtureMixin, TestCase):
+    def setUp(self):
+        self.create_fixture(departments=2)
+        self.client = Client()
+        self.client.force_login(self.student.user)
+        self.url = reverse('student_section:get_log_catalog')
+
+    def test_catalog_tree(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        catalog = response.json()
+        self.assertEqual(catalog['log_year'], self.year.id)
+        self.assertEqual([dept['name'] for dept in catalog['departments']], ['Dept 0', 'Dept 1'])
+        dept = catalog['departments'][0]
+        self.assertEqual([activity['name'] for activity in dept['activity_types']], ['Procedure'])
+        self.assertEqual([core['name'] for core in dept['activity_types'][0]['core_diagnoses']], ['Core'])
+        self.assertEqual(dept['tutors'], [{'id': self.doctor.id, 'name': self.doctor.user.get_full_name()}])
+
+    def test_unchanged_catalog_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        catalog_tables = ('admin_section_department', 'admin_section_activitytype', 'admin_section_coredia')
+        self.assertFalse([q for q in ctx.captured_queries if any(t in q['sql'] for t in catalog_tables)])
+
+    def test_admin_changes_invalidate_catalog(self):
+        etag = self.client.get(self.url)['ETag']
+        ActivityType.objects.create(name='Audit', department=self.departments[0])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        names = [activity['name'] for activity in response.json()['departments'][0]['activity_types']]
+        self.assertEqual(names, ['Audit', 'Procedure'])
+
+        etag = response['ETag']
+        user = self.doctor.user
+        user.first_name = 'Gregory'
+        user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['departments'][0]['tutors'][0]['name'], 'Gregory')
+
+    def test_activity_types_ignore_invalid_department(self):
+        url = reverse('student_section:get_activity_types')
+        response = self.client.get(url, {'department': self.departments[0].id})
+        self.assertEqual([activity['name'] for activity in response.json()], ['Procedure'])
+        response = self.client.get(url, {'department': 'abc'})
+        self.assertEqual((response.status_code, response.json()), (200, []))
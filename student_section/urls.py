@@ -33,6 +33,7 @@ urlpatterns = [
     path("get-activity-types/", views.get_activity_types, name="get_activity_types"),
     path("get-core-diagnosis/", views.get_core_diagnosis, name="get_core_diagnosis"),
     path("get-tutors/", views.get_tutors, name="get_tutors"),
+    path("log-catalog/", views.get_log_catalog, name="get_log_catalog"),
     path("get-date-restrictions/", views.get_date_restrictions, name="get_date_restrictions"),
     path("generate-records-pdf/", views.generate_records_pdf, name="generate_records_pdf"),
     path("delete-support-ticket/<int:ticket_id>/", views.delete_support_ticket, name="delete_support_ticket"),
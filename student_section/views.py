@@ -1,25 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, Http404
 from django.core.paginator import Paginator
 from django.db import models
 from django.template.loader import render_to_string
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
+from django.utils.http import parse_etags
 from datetime import datetime
+import json
 from xhtml2pdf import pisa
 import os
+from .catalog import get_catalog
 from .forms import StudentLogFormModelForm, SupportTicketForm
-from .models import StudentLogFormModel, SupportTicket, StudentNotification
-from admin_section.models import ActivityType, CoreDiaProSession, LogYear, Department, AdminNotification, DateRestrictionSettings
+from .models import StudentLogFormModel, StudentLogRollup, SupportTicket, StudentNotification
+from admin_section.date_settings import get_date_settings
+from admin_section.models import (
+    ActivityType, CoreDiaProSession, LogYear, LogYearSection, Department, Group, TrainingSite,
+    DateRestrictionSettings, AdminNotification,
+)
 from accounts.models import Doctor, Student, CustomUser
 from django.contrib import messages
 from doctor_section.models import Notification
-import openpyxl
 from openpyxl.drawing.image import Image as OpenpyxlImage
-from io import BytesIO
 from urllib.parse import quote
+from admin_section.export_jobs import background_export
+from admin_section.outbox import queue_email
+from utils.log_stats import summarize_rollups
+from utils.csv_export import iter_values, full_name
+from utils.excel_export import new_workbook, write_table, workbook_response
+from utils.notification_counts import forget_unread_counts, invalidate_unread_counts
+from utils.conditional import conditional_json
 # Create your views here.
 
 
@@ -52,18 +63,15 @@ def student_dash(request):
     except Student.DoesNotExist:
         return redirect("student_section:student_profile")
 
-    # count the log of student (use the Student instance we fetched above)
-    total_records = StudentLogFormModel.objects.filter(student=student_group).count()
+    # count the log of student from the pre-aggregated rollup
+    counts = summarize_rollups(StudentLogRollup.objects.filter(student=student_group))
+    total_records = counts['total']
 
     # yet to be reviewed
-    yet_to_be_reviewed = StudentLogFormModel.objects.filter(
-        student=student_group, is_reviewed=False
-    ).count()
+    yet_to_be_reviewed = counts['pending']
 
     # reviewed
-    reviewed = StudentLogFormModel.objects.filter(
-        student=student_group, is_reviewed=True
-    ).count()
+    reviewed = counts['reviewed']
 
     if user.profile_photo:
         profile_photo = user.profile_photo.url
@@ -84,20 +92,6 @@ def student_dash(request):
 
 
 from django.db import transaction
-from threading import Thread
-
-def send_admin_emails(admin_emails, subject, message):
-    """Send emails to admins in a separate thread"""
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=admin_emails,
-            fail_silently=True,
-        )
-    except Exception as e:
-        print(f"Error sending email: {e}")
 
 @login_required
 def student_support(request):
@@ -136,15 +130,10 @@ def student_support(request):
 
                 if notifications:
                     AdminNotification.objects.bulk_create(notifications)
+                    invalidate_unread_counts(AdminNotification, [n.recipient_id for n in notifications])
 
-                # Start a separate thread to send emails
-                if admin_emails:
-                    email_thread = Thread(
-                        target=send_admin_emails,
-                        args=(admin_emails, notification_title, notification_message)
-                    )
-                    email_thread.daemon = True
-                    email_thread.start()
+                # Sent by the run_email_worker command once this commits
+                queue_email(admin_emails, notification_title, notification_message)
 
             messages.success(request, "Support ticket submitted successfully. We will respond to your issue soon.")
             return redirect("student_section:student_support")
@@ -165,19 +154,6 @@ def student_support(request):
     return render(request, "student_support.html", context)
 
 
-def send_tutor_email(tutor_email, subject, message):
-    """Send email to tutor in a separate thread"""
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[tutor_email],
-            fail_silently=True,
-        )
-    except Exception as e:
-        print(f"Error sending email: {e}")
-
 @login_required
 def student_elog(request):
     if request.method == "POST":
@@ -213,14 +189,8 @@ def student_elog(request):
                     message=notification_message
                 )
 
-                # Send email notification to the tutor in a separate thread
-                if tutor.user.email:
-                    email_thread = Thread(
-                        target=send_tutor_email,
-                        args=(tutor.user.email, notification_title, notification_message)
-                    )
-                    email_thread.daemon = True
-                    email_thread.start()
+                # Email the tutor through the outbox
+                queue_email([tutor.user.email], notification_title, notification_message)
 
             messages.success(request, "Log entry created successfully.")
             return redirect("student_section:student_elog")
@@ -282,9 +252,7 @@ def student_profile(request):
         # Get log statistics
         logs = StudentLogFormModel.objects.filter(student=student)
         logs_count = logs.count()
-        approved_count = logs.filter(is_reviewed=True).exclude(
-            reviewer_comments__startswith='REJECTED'
-        ).count()
+        approved_count = logs.filter(review_status=StudentLogFormModel.STATUS_APPROVED).count()
         pending_count = logs.filter(is_reviewed=False).count()
 
         # Get unique departments the student has submitted logs to
@@ -543,6 +511,7 @@ def student_final_records(request):
 
 
 @login_required
+@conditional_json(Student, CustomUser, Group, LogYear, LogYearSection)
 def get_student_info(request):
     student = _get_student(request)
     if not student:
@@ -567,81 +536,77 @@ def get_student_info(request):
 
 
 @login_required
+@conditional_json(Student, Group, Department)
 def get_departments_by_year(request):
-    try:
-        student = _get_student(request)
-        if not student:
-            return JsonResponse([], safe=False)
-        log_year = student.group.log_year if student.group else None
-
-        if log_year:
-            departments = (
-                Department.objects.filter(log_year=log_year).distinct().order_by("name")
-            )
-            # Prepare concatenated data
-            department_data = [
-                {
-                    "id": dept.id,
-                    "name": (
-                        f"{dept.name} - {dept.log_year.log_year_section.name}"
-                        if dept.log_year.log_year_section
-                        else dept.name
-                    ),
-                }
-                for dept in departments
-            ]
-            return JsonResponse(department_data, safe=False)
-        else:
-            return JsonResponse([], safe=False)
-    except Exception as e:
-        print(f"Error in get_departments_by_year: {e}")
+    student = _get_student(request)
+    if not student or not student.group:
         return JsonResponse([], safe=False)
 
+    _, body = get_catalog(student.group.log_year_id)
+    department_data = [
+        {"id": dept["id"], "name": dept["name"]} for dept in json.loads(body)["departments"]
+    ]
+    return JsonResponse(department_data, safe=False)
+
 
 @login_required
-def get_activity_types(request):
-    try:
-        department_id = request.GET.get("department")
-        if not department_id:
-            print("No department_id provided in get_activity_types")
-            return JsonResponse([], safe=False)
+def get_log_catalog(request):
+    """
+    Departments of the student's log year with their activity types, core
+    diagnoses and tutors, as one JSON document
 
-        # Get activity types for the selected department
-        activity_types = ActivityType.objects.filter(
-            department_id=department_id
-        ).order_by("name")
+    The response carries an ETag; browsers revalidate it on every use
+    (``Cache-Control: no-cache``) and get a 304 until an administrator
+    changes one of the listed models.
+    """
+    log_year_id = (
+        Student.objects.filter(user=request.user)
+        .values_list("group__log_year_id", flat=True).first()
+    )
+    if log_year_id is None:
+        return JsonResponse({"log_year": None, "departments": []})
+
+    etag, body = get_catalog(log_year_id)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
 
-        print(f"Activity Types for department {department_id}: {list(activity_types)}")
 
-        activity_type_data = [
-            {"id": activity.id, "name": activity.name} for activity in activity_types
-        ]
-        return JsonResponse(activity_type_data, safe=False)
-    
-    except Exception as e:
-        print(f"Error in get_activity_types: {str(e)}")
+@login_required
+@conditional_json(ActivityType)
+def get_activity_types(request):
+    try:
+        department_id = int(request.GET.get("department", ""))
+    except ValueError:
         return JsonResponse([], safe=False)
 
+    # Get activity types for the selected department
+    activity_type_data = list(
+        ActivityType.objects.filter(department_id=department_id).order_by("name").values("id", "name")
+    )
+    return JsonResponse(activity_type_data, safe=False)
+
 
 @login_required
+@conditional_json(CoreDiaProSession)
 def get_core_diagnosis(request):
     activity_type_id = request.GET.get("activity_type")
     if not activity_type_id:
         return JsonResponse([], safe=False)
 
-    core_diagnoses = (
+    core_diagnosis_data = list(
         CoreDiaProSession.objects.filter(activity_type_id=activity_type_id)
-        .distinct()
-        .order_by("name")
+        .order_by("name").values("id", "name")
     )
-
-    core_diagnosis_data = [
-        {"id": core.id, "name": core.name} for core in core_diagnoses
-    ]
     return JsonResponse(core_diagnosis_data, safe=False)
 
 
 @login_required
+@conditional_json(Doctor, CustomUser, Doctor.departments.through)
 def get_tutors(request):
     department_id = request.GET.get("department")
     if not department_id:
@@ -651,38 +616,28 @@ def get_tutors(request):
         Doctor.objects.filter(departments=department_id)
         .distinct()
         .order_by("user__first_name")
+        .values_list("id", "user__first_name", "user__last_name")
     )
 
     tutor_data = [
-        {"id": tutor.id, "name": f"{tutor.user.get_full_name()}"} for tutor in tutors
+        {"id": tutor_id, "name": full_name(first_name, last_name)} for tutor_id, first_name, last_name in tutors
     ]
     return JsonResponse(tutor_data, safe=False)
 
 
 @login_required
+@conditional_json(DateRestrictionSettings, daily=True)
 def get_date_restrictions(request):
     """API endpoint to get date restriction settings for students"""
     try:
         # Get date restriction settings or create default if none exist
-        settings = DateRestrictionSettings.objects.first()
-        if not settings:
-            settings = DateRestrictionSettings.objects.create(
-                past_days_limit=7,
-                allow_future_dates=False,
-                future_days_limit=0,
-                doctor_past_days_limit=30,
-                doctor_allow_future_dates=False,
-                doctor_future_days_limit=0,
-                allowed_days_for_students='0,1,2,3,4,5,6',
-                allowed_days_for_doctors='0,1,2,3,4,5,6',
-                is_active=True
-            )
+        settings = get_date_settings(create=True)
 
         # Get current day of week (0=Monday, 6=Sunday)
         current_day = timezone.now().weekday()
 
         # Get allowed days from model
-        allowed_days = settings.get_allowed_days_for_students()
+        allowed_days = settings.student_allowed_days
 
         # Return settings as JSON
         data = {
@@ -690,7 +645,7 @@ def get_date_restrictions(request):
             "allowFutureDates": settings.allow_future_dates,
             "futureDaysLimit": settings.future_days_limit,
             "isCurrentDayAllowed": current_day in allowed_days,
-            "allowedDays": allowed_days,
+            "allowedDays": sorted(allowed_days),
             "isActive": settings.is_active
         }
         return JsonResponse(data)
@@ -911,6 +866,7 @@ def generate_records_pdf(request):
 
 
 @login_required
+@background_export('student_section:export_final_records_excel')
 def export_final_records_excel(request):
     try:
         student = _get_student(request)
@@ -941,11 +897,35 @@ def export_final_records_excel(request):
             )
         logs = logs.order_by('-date', '-created_at')
 
-        # Create workbook in memory
-        output = BytesIO()
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Student Records"
+        # Stream rows into a write-only workbook spooled to a temp file
+        wb = new_workbook()
+        values = iter_values(
+            logs,
+            'date', 'department__name', 'activity_type__name', 'core_diagnosis__name',
+            'tutor__user__first_name', 'tutor__user__last_name', 'review_status', 'review_date',
+            'reviewer_comments',
+        )
+        status_labels = dict(StudentLogFormModel.REVIEW_STATUS_CHOICES)
+        rows = (
+            [
+                log_date.strftime('%Y-%m-%d') if log_date else '',
+                department or '',
+                activity_type or '',
+                core_diagnosis or '',
+                full_name(tutor_first, tutor_last),
+                status_labels[status],
+                review_date.strftime('%Y-%m-%d') if review_date else '',
+                comments or ''
+            ]
+            for (log_date, department, activity_type, core_diagnosis, tutor_first, tutor_last,
+                 status, review_date, comments) in values
+        )
+        ws, _, _ = write_table(
+            wb, "Student Records",
+            ['Date', 'Department', 'Activity Type', 'Core Diagnosis', 'Tutor', 'Status', 'Review Date', 'Comments'],
+            rows,
+            preamble=[["Student Records Export"], [""]]
+        )
 
         # Insert AGU logo if exists (safe)
         logo_path = os.path.join(settings.MEDIA_ROOT or '', 'agulogo.png')
@@ -959,38 +939,8 @@ def export_final_records_excel(request):
                 # don't block export if image fails
                 pass
 
-        ws.append(["Student Records Export"])
-        ws.append([""])
-        ws.append([
-            'Date', 'Department', 'Activity Type', 'Core Diagnosis', 'Tutor', 'Status', 'Review Date', 'Comments'
-        ])
-
-        for log in logs:
-            status = 'Pending'
-            if log.is_reviewed:
-                status = 'Rejected' if log.reviewer_comments and log.reviewer_comments.startswith('REJECTED:') else 'Approved'
-            ws.append([
-                log.date.strftime('%Y-%m-%d') if getattr(log, 'date', None) else '',
-                log.department.name if getattr(log, 'department', None) else '',
-                log.activity_type.name if getattr(log, 'activity_type', None) else '',
-                getattr(log.core_diagnosis, 'name', ''),
-                log.tutor.user.get_full_name() if getattr(log, 'tutor', None) and getattr(log.tutor, 'user', None) else '',
-                status,
-                log.review_date.strftime('%Y-%m-%d') if getattr(log, 'review_date', None) else '',
-                log.reviewer_comments or ''
-            ])
-
-        wb.save(output)
-        output.seek(0)
-
         filename = f'student_records_{student.student_id}_{review_status}.xlsx'
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        response['Content-Length'] = output.getbuffer().nbytes
-        return response
+        return workbook_response(wb, filename)
     except Exception as e:
         # Log and return a friendly HTTP error
         print(f"Error exporting Excel: {e}")
@@ -1094,6 +1044,7 @@ def notifications(request):
     # Mark all as read if requested
     if request.GET.get('mark_all_read'):
         notifications_list.filter(is_read=False).update(is_read=True)
+        forget_unread_counts('student', [request.user.pk])
         messages.success(request, "All notifications marked as read.")
         return redirect('student_section:notifications')
 
@@ -1111,6 +1062,7 @@ def notifications(request):
 
 
 @login_required
+@conditional_json(StudentLogFormModel, Department, ActivityType, CoreDiaProSession, Doctor, CustomUser, TrainingSite)
 def get_log_details(request, log_id):
     """API endpoint to get details for a specific log entry"""
     try:
@@ -1130,7 +1082,7 @@ def get_log_details(request, log_id):
                 "tutor": log.tutor.user.get_full_name(),
                 "training_site": log.training_site.name if hasattr(log, 'training_site') and log.training_site else "N/A",
                 "status": "Reviewed" if log.is_reviewed else "Pending",
-                "is_approved": not (log.reviewer_comments and log.reviewer_comments.startswith("REJECTED")) if log.is_reviewed else None,
+                "is_approved": (log.review_status == StudentLogFormModel.STATUS_APPROVED) if log.is_reviewed else None,
             },
             "patient_info": {
                 "patient_id": log.patient_id if log.patient_id else "N/A",
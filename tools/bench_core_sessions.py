@@ -0,0 +1,144 @@
+"""
+Benchmark of the CoreDiaProSession importers
+
+Builds a synthetic upload by repeating the rows of ``pediatrics.csv`` with
+numbered session names (50,000 rows by default) and imports it through
+``import_core_sessions`` (the upload form and import jobs) and through
+``CoreDiaProSessionResource`` (django-import-export), reporting the queries
+and time of each. ``--legacy`` also runs the former per-row lookups for
+comparison. A throwaway test database is created, so any settings module with
+a reachable database will do.
+
+Usage:
+    python tools/bench_core_sessions.py [--rows 50000] [--legacy] [--settings elogbookagu.settings]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-default'},
+    'users': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-users'},
+}
+
+
+def synthetic_rows(path, count):
+    """Return ``count`` rows cycling through the CSV at ``path``, each with a distinct session name"""
+    with open(path, encoding='utf-8-sig', newline='') as source:
+        template = [row for row in csv.DictReader(source) if row.get('name')]
+    return [
+        dict(row, name=f"{row['name']} #{index // len(template)}")
+        for index, row in ((index, template[index % len(template)]) for index in range(count))
+    ]
+
+
+def legacy_import(rows):
+    """The per-row lookups the importer did before it was set-based"""
+    from admin_section.models import ActivityType, CoreDiaProSession, Department
+
+    created = []
+    for raw_row in rows:
+        row = {str(k).strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in raw_row.items()}
+        dept = Department.objects.filter(name__iexact=row['department']).first()
+        if not dept:
+            continue
+        activity = ActivityType.objects.filter(name__iexact=row['activity_type'], department=dept).first()
+        if not activity:
+            continue
+        if CoreDiaProSession.objects.filter(name__iexact=row['name'], department=dept, activity_type=activity).exists():
+            continue
+        created.append(CoreDiaProSession(name=row['name'], department=dept, activity_type=activity))
+    CoreDiaProSession.objects.bulk_create(created)
+    return len(created)
+
+
+def measure(run):
+    """Run ``run()`` and return its result, the number of queries and the seconds taken"""
+    from django.db import connection
+
+    queries = [0]
+
+    def count(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    with connection.execute_wrapper(count):
+        result = run()
+    return result, queries[0], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--csv', default=os.path.join(ROOT, 'pediatrics.csv'))
+    parser.add_argument('--legacy', action='store_true', help='Also time the former per-row importer')
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'elogbookagu.settings'))
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    os.environ.setdefault('RUNNING_TESTS', '1')
+    import django
+    django.setup()
+
+    import tablib
+    from django.conf import settings
+    from django.test import override_settings
+    from django.test.utils import get_runner, setup_test_environment, teardown_test_environment
+
+    from admin_section.core_session_import import import_core_sessions
+    from admin_section.models import ActivityType, CoreDiaProSession, Department, LogYear
+    from admin_section.views_file.resources import CoreDiaProSessionResource
+
+    rows = synthetic_rows(args.csv, args.rows)
+    dataset = tablib.Dataset(headers=['name', 'activity_type', 'department'])
+    for row in rows:
+        dataset.append([row['name'], row['activity_type'], row['department']])
+
+    def resource_import():
+        result = CoreDiaProSessionResource().import_data(dataset)
+        return result.totals['new']
+
+    importers = [
+        ('import_core_sessions', lambda: import_core_sessions(rows).success_count),
+        ('CoreDiaProSessionResource', resource_import),
+    ]
+    if args.legacy:
+        importers.append(('per-row (before)', lambda: legacy_import(rows)))
+
+    setup_test_environment()
+    runner = get_runner(settings)(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        with override_settings(CACHES=BENCH_CACHES):
+            year = LogYear.objects.create(year_name='Bench')
+            names = {row['department'] for row in rows}
+            departments = {name: Department.objects.create(name=name, log_year=year) for name in names}
+            ActivityType.objects.bulk_create(
+                ActivityType(name=activity, department=departments[dept])
+                for activity, dept in {(row['activity_type'], row['department']) for row in rows}
+            )
+
+            print(f"{len(rows)} rows, {len(names)} department(s), {ActivityType.objects.count()} activity types")
+            print(f"{'importer':<28}{'created':>9}{'queries':>10}{'seconds':>10}{'rows/s':>10}")
+            for label, run in importers:
+                CoreDiaProSession.objects.all().delete()
+                created, queries, seconds = measure(run)
+                print(f"{label:<28}{created:>9}{queries:>10}{seconds:>10.2f}{len(rows) / seconds:>10.0f}")
+
+            # A second upload of the same file only finds duplicates
+            _, queries, seconds = measure(lambda: import_core_sessions(rows))
+            print(f"{'re-upload (duplicates)':<28}{0:>9}{queries:>10}{seconds:>10.2f}{len(rows) / seconds:>10.0f}")
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Micro-benchmark for the per-PDF setup cost in utils.pdf_utils
+
+Times building the AGU header, common styles and footer for one document and
+rendering a small PDF, first the way every export did it before the caches
+(fresh style sheets, the full-size logo file decoded per document, ASCII85
+streams) and then through pdf_utils with warm caches.
+
+Usage:
+    python tools/bench_pdf_setup.py [--runs 200] [--media-root PATH]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'elogbookagu.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+from utils import pdf_utils
+
+
+def legacy_common_styles():
+    styles = getSampleStyleSheet()
+    return {
+        'subtitle': ParagraphStyle('CustomSubtitle', parent=styles['Heading2'], fontSize=12,
+                                   textColor=colors.HexColor('#374151'), spaceAfter=0.15*inch,
+                                   fontName='Helvetica-Bold'),
+        'small': ParagraphStyle('CustomSmall', parent=styles['Normal'], fontSize=8,
+                                textColor=colors.HexColor('#6b7280'), spaceAfter=0.05*inch,
+                                fontName='Helvetica'),
+    }
+
+
+def legacy_elements():
+    """The header, styles and footer as pdf_utils built them before the caches"""
+    styles = getSampleStyleSheet()
+    university = ParagraphStyle('UniversityName', parent=styles['Heading1'], fontSize=16,
+                                textColor=colors.HexColor('#1f2937'), alignment=TA_CENTER,
+                                spaceAfter=0.1*inch, fontName='Helvetica-Bold')
+    title = ParagraphStyle('ReportTitle', parent=styles['Heading1'], fontSize=14,
+                           textColor=colors.HexColor('#2563eb'), alignment=TA_CENTER,
+                           spaceAfter=0.3*inch, fontName='Helvetica-Bold')
+    logo = Image(os.path.join(settings.MEDIA_ROOT, 'agulogo.png'), width=1.5*inch, height=1.5*inch)
+    logo.hAlign = 'CENTER'
+    elements = [logo, Spacer(1, 0.1*inch), Paragraph("Arabian Gulf University", university),
+                Spacer(1, 0.1*inch), Paragraph("Benchmark Report", title), Spacer(1, 0.2*inch)]
+    elements.append(Paragraph("Generated by: Benchmark", legacy_common_styles()['subtitle']))
+    footer = legacy_common_styles()['small']
+    elements += [Spacer(1, 0.3*inch), Paragraph("Generated by: Benchmark", footer),
+                 Paragraph("Generated on: 2025-01-01 00:00:00", footer)]
+    return elements
+
+
+def legacy_render():
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4)
+    doc.build(legacy_elements())
+
+
+def setup_elements():
+    elements = pdf_utils.add_agu_header([], "Benchmark Report")
+    styles = pdf_utils.get_common_styles()
+    elements.append(Paragraph("Generated by: Benchmark", styles['subtitle']))
+    return pdf_utils.add_footer_info(elements, generated_by="Benchmark", export_date="2025-01-01 00:00:00")
+
+
+def render():
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4)
+    pdf_utils.build_pdf(doc, setup_elements())
+
+
+def timed(func, runs):
+    # One warm-up run so imports, font loading and the caches are not counted
+    func()
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--media-root', help='Directory holding agulogo.png (defaults to MEDIA_ROOT)')
+    args = parser.parse_args()
+
+    if args.media_root:
+        settings.MEDIA_ROOT = args.media_root
+    logo_path = os.path.join(settings.MEDIA_ROOT, 'agulogo.png')
+    if not os.path.exists(logo_path):
+        print(f"Logo not found at {logo_path}; use --media-root to point at the media directory")
+        return 1
+
+    # The old code wrote every stream as ASCII85 text
+    rl_config.useA85 = 1
+    print(f"{'':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for label, before, after in (
+        ('header/styles/footer', legacy_elements, setup_elements),
+        ('render 1-page PDF', legacy_render, render),
+    ):
+        old = timed(before, args.runs)
+        new = timed(after, args.runs)
+        print(f"{label:<22}{old:>12.3f}{new:>12.3f}{old / new:>9.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark of the session round-trips per request
+
+Requests the public home page (anonymous, and as a logged-in user) and the
+doctor dashboard with each session backend, and reports the django_session
+queries, session cache calls and time per request. A throwaway test database
+is created, so any settings module with a reachable database will do.
+
+Usage:
+    python tools/bench_sessions.py [--runs 50] [--settings elogbookagu.settings]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-default'},
+    'users': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-users'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-sessions'},
+}
+ENGINES = ('db', 'cached_db', 'cache')
+CACHE_CALLS = ('get', 'get_many', 'set', 'add', 'delete', 'has_key')
+
+
+def count_cache_calls(cache, counter):
+    """Wrap the calls a session store makes so they are counted in ``counter``"""
+    def wrap(name):
+        method = getattr(cache, name)
+
+        def counted(*args, **kwargs):
+            counter[0] += 1
+            return method(*args, **kwargs)
+        return counted
+
+    for name in CACHE_CALLS:
+        setattr(cache, name, wrap(name))
+
+
+def measure(client, path, runs):
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # One warm-up request fills the user and session caches
+    client.get(path)
+    cache_calls = [0]
+    count_cache_calls(caches['sessions'], cache_calls)
+    queries = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(path)
+        assert response.status_code == 200, f"{path} returned {response.status_code}"
+        queries += sum('django_session' in query['sql'] for query in ctx.captured_queries)
+    elapsed = time.perf_counter() - start
+    return queries / runs, cache_calls[0] / runs, elapsed / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'elogbookagu.settings'))
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    os.environ.setdefault('RUNNING_TESTS', '1')
+    import django
+    django.setup()
+
+    from django.test import Client, override_settings
+    from django.test.utils import get_runner, setup_test_environment, teardown_test_environment
+    from django.conf import settings
+    from django.urls import reverse
+
+    from accounts import user_cache
+    from accounts.models import CustomUser
+
+    setup_test_environment()
+    runner = get_runner(settings)(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        user = CustomUser.objects.create_user(
+            username='bench_doctor', email='bench_doctor@example.com', password='bench', role='doctor'
+        )
+        pages = (
+            ('home (anonymous)', reverse('home_page'), False),
+            ('home (logged in)', reverse('home_page'), True),
+            ('doctor dashboard', reverse('doctor_section:doctor_dash'), True),
+        )
+
+        print(f"{'engine':<11}{'page':<20}{'session queries':>17}{'cache calls':>13}{'ms/request':>12}")
+        for engine in ENGINES:
+            with override_settings(
+                CACHES=BENCH_CACHES,
+                SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+                SESSION_CACHE_ALIAS='sessions',
+                SECURE_SSL_REDIRECT=False,
+            ):
+                for label, path, logged_in in pages:
+                    user_cache.clear_local_users()
+                    client = Client()
+                    if logged_in:
+                        client.force_login(user)
+                    queries, cache_calls, ms = measure(client, path, args.runs)
+                    print(f"{engine:<11}{label:<20}{queries:>17.2f}{cache_calls:>13.2f}{ms:>12.2f}")
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
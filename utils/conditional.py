@@ -0,0 +1,164 @@
+"""
+Conditional GET for JSON endpoints
+
+``conditional_json(*models)`` gives a view an ETag derived from cheap
+freshness markers instead of from its response: a version token per listed
+model (kept in the shared ``users`` cache and replaced whenever a row of the
+model is saved or deleted), the requesting user, the URL and query string,
+and a time bucket. A request whose ``If-None-Match`` still matches is answered
+with 304 before the view runs, so polls of unchanged data cost one cache read.
+
+The time bucket is a safety net for writes that send no signals
+(``QuerySet.update()``, ``bulk_create()``); code doing such writes should call
+``bump_model_versions()`` itself.
+
+``get_versions()`` and ``bump_versions()`` manage version tokens under any
+cache key; the date settings, log catalog and user caches use them too.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'model-version:{}'
+# Seconds after which an ETag changes even if no tracked write was seen
+FRESHNESS_WINDOW = 300
+
+_tracked = set()
+
+
+def version_cache():
+    """The shared cache holding version tokens (``users``, else ``default``)"""
+    return caches['users' if 'users' in settings.CACHES else 'default']
+
+
+def get_versions(*keys):
+    """Return the version tokens stored under ``keys``, creating missing ones"""
+    cache = version_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*keys):
+    """
+    Replace the version tokens stored under ``keys``
+
+    The tokens are replaced right away and again once the surrounding
+    transaction commits, so a reader that loaded the old data before the
+    commit cannot keep it cached under the new version.
+    """
+    def bump():
+        try:
+            version_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        except Exception:
+            logger.exception('Error bumping cache versions %s', ', '.join(keys))
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def model_versions(models):
+    """Return the current version tokens of ``models``, creating missing ones"""
+    return get_versions(*(VERSION_KEY.format(_label(model)) for model in models))
+
+
+def bump_model_versions(*models):
+    """
+    Replace the version tokens of ``models``
+
+    Called by the signal handlers of tracked models; call it directly after
+    ``update()`` or ``bulk_create()`` on a tracked model.
+    """
+    bump_versions(*(VERSION_KEY.format(_label(model)) for model in models))
+
+
+def _bump_on_save(sender, update_fields=None, **kwargs):
+    # Logins save last_login on every user; nothing served depends on it
+    if update_fields == frozenset({'last_login'}):
+        return
+    bump_model_versions(sender)
+
+
+def _bump_on_delete(sender, **kwargs):
+    bump_model_versions(sender)
+
+
+def _bump_on_m2m(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_model_versions(sender)
+
+
+def track_models(*models):
+    """Keep version tokens of ``models`` (or many-to-many through models) up to date"""
+    for model in models:
+        if model in _tracked:
+            continue
+        _tracked.add(model)
+        uid = f'conditional-{_label(model)}'
+        if model._meta.auto_created:
+            m2m_changed.connect(_bump_on_m2m, sender=model, dispatch_uid=uid)
+        else:
+            post_save.connect(_bump_on_save, sender=model, dispatch_uid=uid)
+            post_delete.connect(_bump_on_delete, sender=model, dispatch_uid=uid)
+
+
+def conditional_json(*models, daily=False):
+    """
+    Answer unchanged GET requests to a JSON view with 304 Not Modified
+
+    Args:
+        *models: Models (or many-to-many through models) the response is
+            built from
+        daily: Also change the ETag at midnight, for responses that depend
+            on today's date
+
+    Responses carry ``Cache-Control: private, no-cache`` so browsers
+    revalidate them on every use.
+    """
+    track_models(*models)
+
+    def etag_func(request, *args, **kwargs):
+        try:
+            versions = model_versions(models)
+        except Exception:
+            logger.exception('Model version cache unavailable')
+            return None
+        parts = [
+            request.path,
+            request.META.get('QUERY_STRING', ''),
+            str(getattr(request.user, 'pk', '')),
+            str(int(time.time() // FRESHNESS_WINDOW)),
+            timezone.localdate().isoformat() if daily else '',
+            *versions,
+        ]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
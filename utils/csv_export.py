@@ -0,0 +1,64 @@
+"""
+Streaming CSV export helpers
+
+Rows are read from the database in chunks and written to the response as they
+are produced, so large exports keep memory flat and start downloading
+immediately instead of waiting for the whole file to be built.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+CHUNK_SIZE = 2000
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def iter_values(queryset, *fields, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over ``values_list`` tuples of a queryset in chunks
+
+    Args:
+        queryset: Queryset to read
+        *fields: Field or lookup paths to fetch
+        chunk_size: Number of rows fetched per database round trip
+
+    No model instances are built, so joined fields should be requested with
+    lookups (e.g. 'student__user__email') rather than select_related.
+    """
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def full_name(first_name, last_name, username=''):
+    """Match CustomUser.get_full_name() for values_list rows, falling back to ``username``"""
+    return f"{first_name} {last_name}".strip() or username
+
+
+def format_datetime(value, default='N/A', fmt=DATETIME_FORMAT):
+    """Format a date/datetime for a CSV cell, or return ``default`` if empty"""
+    return value.strftime(fmt) if value else default
+
+
+def streaming_csv_response(filename, rows):
+    """
+    Return a StreamingHttpResponse that writes ``rows`` as a CSV attachment
+
+    Args:
+        filename: Download filename for the Content-Disposition header
+        rows: Iterable of row sequences (headers included); may be a
+            generator so rows are produced while the response is sent
+    """
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
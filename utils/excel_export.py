@@ -0,0 +1,105 @@
+"""
+Excel export helpers built on openpyxl write-only workbooks
+
+Rows are written as they are produced and never kept as cell objects, column
+widths are sized from a sample of the first rows, and the finished workbook is
+spooled to a temporary file instead of being held in memory.
+"""
+import tempfile
+from collections import namedtuple
+from itertools import chain, islice
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+WIDTH_SAMPLE_SIZE = 500
+MAX_COLUMN_WIDTH = 50
+
+TITLE_FONT = Font(bold=True, size=16)
+SECTION_FONT = Font(bold=True, size=12)
+BOLD_FONT = Font(bold=True)
+HEADER_FONT = Font(bold=True, color='FFFFFF')
+HEADER_FILL = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+CENTER = Alignment(horizontal='center')
+
+# A preamble value with optional styling, e.g. Styled('Title', font=TITLE_FONT)
+Styled = namedtuple('Styled', 'value font fill alignment', defaults=(None, None, None))
+
+
+def new_workbook():
+    """Return an empty write-only workbook"""
+    return Workbook(write_only=True)
+
+
+def _cell(ws, value):
+    if not isinstance(value, Styled):
+        return value
+    cell = WriteOnlyCell(ws, value=value.value)
+    if value.font:
+        cell.font = value.font
+    if value.fill:
+        cell.fill = value.fill
+    if value.alignment:
+        cell.alignment = value.alignment
+    return cell
+
+
+def _column_widths(headers, sample):
+    widths = [len(str(header)) for header in headers]
+    for row in sample:
+        for index, value in enumerate(row[:len(widths)]):
+            if value is not None:
+                widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def write_table(wb, title, headers, rows, preamble=()):
+    """
+    Add a sheet with optional preamble rows, a styled header row and data rows
+
+    Args:
+        wb: Write-only workbook from ``new_workbook()``
+        title: Sheet title
+        headers: Column headers
+        rows: Iterable of row sequences; may be a lazy iterator such as
+            ``iter_values(...)`` and is consumed exactly once
+        preamble: Rows written above the header (values may be ``Styled``)
+
+    Returns:
+        (worksheet, header_row, data_row_count) so callers can build chart
+        references against the written range.
+    """
+    ws = wb.create_sheet(title=title)
+    rows = iter(rows)
+
+    # Widths must be set before any row is written in write-only mode
+    sample = list(islice(rows, WIDTH_SAMPLE_SIZE))
+    for index, width in enumerate(_column_widths(headers, sample), 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    for row in preamble:
+        ws.append([_cell(ws, value) for value in row])
+    ws.append([_cell(ws, Styled(header, HEADER_FONT, HEADER_FILL, CENTER)) for header in headers])
+
+    count = 0
+    for row in chain(sample, rows):
+        ws.append(row)
+        count += 1
+    return ws, len(preamble) + 1, count
+
+
+def workbook_response(wb, filename):
+    """
+    Save ``wb`` to a temporary file and return it as a streamed attachment
+
+    The temporary file is closed (and removed) once the response is consumed.
+    """
+    spool = tempfile.TemporaryFile(suffix='.xlsx')
+    wb.save(spool)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,182 @@
+"""
+Log statistics helpers that compute review counts and chart breakdowns
+for StudentLogFormModel querysets using grouped conditional aggregates
+"""
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+STATUS_KEYS = ('total', 'reviewed', 'pending', 'approved', 'rejected')
+
+
+def _lookup(prefix, **lookups):
+    """Build a Q object, prefixing each lookup with a relation path"""
+    return Q(**{f"{prefix}{key}": value for key, value in lookups.items()})
+
+
+def status_aggregates(prefix=''):
+    """
+    Return conditional Count expressions for every review status
+
+    Args:
+        prefix: Relation path to the log model (e.g. 'log_forms__') when
+            annotating a related model such as Student or Doctor
+
+    The result can be passed straight to ``aggregate()``, ``annotate()`` or
+    ``values().annotate()``.
+    """
+    return {
+        'total': Count(f'{prefix}id'),
+        'reviewed': Count(f'{prefix}id', filter=_lookup(prefix, review_status__in=['approved', 'rejected'])),
+        'pending': Count(f'{prefix}id', filter=_lookup(prefix, review_status='pending')),
+        'approved': Count(f'{prefix}id', filter=_lookup(prefix, review_status='approved')),
+        'rejected': Count(f'{prefix}id', filter=_lookup(prefix, review_status='rejected')),
+    }
+
+
+def summarize_logs(logs):
+    """
+    Return total/reviewed/pending/approved/rejected counts for a queryset
+
+    Args:
+        logs: StudentLogFormModel queryset (filters are respected)
+
+    Runs a single aggregate query.
+    """
+    return logs.order_by().aggregate(**status_aggregates())
+
+
+def group_status_counts(logs, field):
+    """
+    Return review status counts grouped by a field
+
+    Args:
+        logs: StudentLogFormModel queryset
+        field: Field or lookup path to group by (e.g. 'department_id')
+
+    Returns:
+        dict mapping each value of ``field`` to a dict of status counts.
+        Runs a single grouped query.
+    """
+    rows = logs.order_by().values(field).annotate(**status_aggregates())
+    return {row[field]: {key: row[key] for key in STATUS_KEYS} for row in rows}
+
+
+def annotate_status_counts(queryset, prefix, **log_filters):
+    """
+    Annotate a queryset of a log-related model with its review status counts
+
+    Args:
+        queryset: Queryset of a model with a reverse relation to the logs
+            (e.g. Student)
+        prefix: Relation path to the log model (e.g. 'log_forms__')
+        **log_filters: Lookups on the log model (without the prefix) that
+            restrict which logs are counted
+
+    Returns:
+        The queryset limited to rows with at least one matching log, each
+        annotated with the status counts and ``oldest_pending`` (earliest
+        date of a pending log). The filters are applied in a single
+        ``filter()`` call so they share the join used by the counts.
+    """
+    lookups = {f"{prefix}{key}": value for key, value in log_filters.items()}
+    return queryset.filter(**lookups).annotate(
+        **status_aggregates(prefix),
+        oldest_pending=Min(f'{prefix}date', filter=_lookup(prefix, review_status='pending')),
+    )
+
+
+def empty_status_counts():
+    """Return a status count dict with every counter set to zero"""
+    return dict.fromkeys(STATUS_KEYS, 0)
+
+
+def approval_rate(counts):
+    """Return the percentage of reviewed logs that were approved"""
+    if not counts['reviewed']:
+        return 0
+    return round(counts['approved'] / counts['reviewed'] * 100)
+
+
+def _rollup_counts(row):
+    counts = {key: row.get(key) or 0 for key in ('total', 'reviewed', 'approved', 'rejected')}
+    counts['pending'] = counts['total'] - counts['reviewed']
+    return counts
+
+
+def _rollup_sums():
+    return {key: Sum(key) for key in ('total', 'reviewed', 'approved', 'rejected')}
+
+
+def summarize_rollups(rollups):
+    """
+    Return status counts summed over a StudentLogRollup queryset
+
+    Same shape as ``summarize_logs`` but reads the pre-aggregated rollup
+    rows instead of the log table.
+    """
+    return _rollup_counts(rollups.order_by().aggregate(**_rollup_sums()))
+
+
+def group_rollup_counts(rollups, field):
+    """
+    Return status counts from a StudentLogRollup queryset grouped by a field
+
+    Same shape as ``group_status_counts``.
+    """
+    rows = rollups.order_by().values(field).annotate(**_rollup_sums())
+    return {row[field]: _rollup_counts(row) for row in rows}
+
+
+def breakdown(logs, field, default='Unknown', limit=None):
+    """
+    Count logs per value of ``field`` ordered by frequency
+
+    Returns:
+        Chart data dict with 'labels' and 'data' lists
+    """
+    rows = logs.order_by().values(field).annotate(count=Count('id')).order_by('-count')
+    if limit:
+        rows = rows[:limit]
+    return {
+        'labels': [row[field] or default for row in rows],
+        'data': [row['count'] for row in rows],
+    }
+
+
+def monthly_breakdown(logs, date_field='date', label_format='%B %Y'):
+    """
+    Count logs per calendar month of ``date_field`` in chronological order
+
+    Returns:
+        Chart data dict with 'labels' and 'data' lists
+    """
+    rows = (
+        logs.order_by()
+        .annotate(month=TruncMonth(date_field))
+        .values('month')
+        .annotate(count=Count('id'))
+        .order_by('month')
+    )
+    return {
+        'labels': [row['month'].strftime(label_format) if row['month'] else 'Unknown' for row in rows],
+        'data': [row['count'] for row in rows],
+    }
+
+
+def chart_breakdowns(logs):
+    """
+    Compute the standard set of report charts for a log queryset
+
+    Returns:
+        dict of chart data keyed by chart name. Runs one grouped query
+        per chart regardless of how many departments or logs exist.
+    """
+    return {
+        'case_types_data': breakdown(logs, 'activity_type__name'),
+        'training_sites_data': breakdown(logs, 'training_site__name'),
+        'participation_data': breakdown(logs, 'participation_type', default='Not Specified'),
+        'monthly_data': monthly_breakdown(logs),
+        'core_diagnosis_data': breakdown(logs, 'core_diagnosis__name', limit=10),
+        'gender_data': breakdown(logs, 'patient_gender', default='Not Specified'),
+    }
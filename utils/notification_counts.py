@@ -0,0 +1,86 @@
+"""
+Cached unread notification counts
+
+Each role has its own notification model; the unread count of a user is
+computed with one COUNT over that model and cached per user in the shared
+``users`` cache until a notification of that user is created, read or deleted.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+COUNT_KEY = 'unread-notifications:{}:{}'
+# Safety net for writes that bypass the invalidation hooks
+COUNT_TIMEOUT = 300
+
+# role -> (notification model, lookup from the model to the user id, context variable)
+NOTIFICATION_MODELS = {
+    'doctor': ('doctor_section.Notification', 'recipient__user_id', 'unread_notifications_count'),
+    'student': ('student_section.StudentNotification', 'recipient__user_id', 'student_unread_notifications_count'),
+    'staff': ('staff_section.StaffNotification', 'recipient__user_id', 'staff_unread_notifications_count'),
+    'admin': ('admin_section.AdminNotification', 'recipient_id', 'admin_unread_notifications_count'),
+}
+
+
+def _cache():
+    return caches['users' if 'users' in settings.CACHES else 'default']
+
+
+def unread_count(role, user_id):
+    """
+    Return the number of unread notifications of a user
+
+    Args:
+        role: User role selecting the notification model
+        user_id: CustomUser primary key
+
+    Runs at most one COUNT query; roles without notifications return 0.
+    """
+    if role not in NOTIFICATION_MODELS:
+        return 0
+    key = COUNT_KEY.format(role, user_id)
+    count = _cache().get(key)
+    if count is None:
+        model_label, user_lookup, _ = NOTIFICATION_MODELS[role]
+        count = apps.get_model(model_label).objects.filter(**{user_lookup: user_id, 'is_read': False}).count()
+        _cache().set(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def forget_unread_counts(role, user_ids):
+    """Drop the cached counts of the given users so they are recounted"""
+    keys = [COUNT_KEY.format(role, user_id) for user_id in user_ids]
+    if not keys:
+        return
+    try:
+        _cache().delete_many(keys)
+    except Exception:
+        logger.exception('Error invalidating unread notification counts')
+
+
+def invalidate_unread_counts(model, recipient_ids):
+    """
+    Drop the cached counts of the recipients of ``model`` notifications
+
+    Args:
+        model: Notification model class
+        recipient_ids: Values of the notifications' ``recipient_id``
+
+    Use after ``bulk_create()`` or ``update()``, which send no signals.
+    """
+    label = model._meta.label
+    for role, (model_label, user_lookup, _) in NOTIFICATION_MODELS.items():
+        if model_label != label:
+            continue
+        recipient_ids = set(recipient_ids)
+        if user_lookup == 'recipient__user_id':
+            # Recipients are profiles; their user ids need one lookup
+            recipient_model = model._meta.get_field('recipient').related_model
+            user_ids = recipient_model.objects.filter(pk__in=recipient_ids).values_list('user_id', flat=True)
+        else:
+            user_ids = recipient_ids
+        forget_unread_counts(role, list(user_ids))
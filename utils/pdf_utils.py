@@ -2,12 +2,163 @@
 PDF utility functions for adding common headers, logos, and formatting
 """
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain, islice
+
 from django.conf import settings
-from reportlab.platypus import Paragraph, Spacer, Image
+from PIL import Image as PILImage
+from reportlab.platypus import Flowable, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from reportlab import rl_config
+
+LOGO_SIZE = 1.5*inch
+# Resolution the logo is pre-scaled to before it is embedded
+LOGO_DPI = 150
+
+# Pre-scaled, decoded logos keyed by path, as (mtime, ImageReader)
+_logo_cache = {}
+
+# Documents being built inside binary_streams(), and the useA85 value to
+# restore once the last of them is done
+_binary_lock = threading.Lock()
+_binary_depth = 0
+_saved_use_a85 = None
+
+
+@lru_cache(maxsize=None)
+def _sample_styles():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=None)
+def _header_styles():
+    styles = _sample_styles()
+    return {
+        # Custom style for university name
+        'university': ParagraphStyle(
+            'UniversityName',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor=colors.HexColor('#1f2937'),  # Dark gray
+            alignment=TA_CENTER,
+            spaceAfter=0.1*inch,
+            fontName='Helvetica-Bold'
+        ),
+        # Custom style for title
+        'title': ParagraphStyle(
+            'ReportTitle',
+            parent=styles['Heading1'],
+            fontSize=14,
+            textColor=colors.HexColor('#2563eb'),  # Blue
+            alignment=TA_CENTER,
+            spaceAfter=0.3*inch,
+            fontName='Helvetica-Bold'
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def _common_styles():
+    styles = _sample_styles()
+    return {
+        'subtitle': ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            textColor=colors.HexColor('#374151'),
+            spaceAfter=0.15*inch,
+            fontName='Helvetica-Bold'
+        ),
+        'normal': ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#374151'),
+            spaceAfter=0.1*inch,
+            fontName='Helvetica'
+        ),
+        'small': ParagraphStyle(
+            'CustomSmall',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.HexColor('#6b7280'),
+            spaceAfter=0.05*inch,
+            fontName='Helvetica'
+        )
+    }
+
+
+class CachedImage(Flowable):
+    """
+    Draw a shared ImageReader at a fixed size
+
+    Unlike ``platypus.Image``, which opens its own reader per flowable, every
+    document drawing the same reader reuses its decoded pixel data.
+    """
+
+    def __init__(self, reader, width, height, hAlign='CENTER'):
+        super().__init__()
+        self.reader = reader
+        self.drawWidth = width
+        self.drawHeight = height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.drawWidth, self.drawHeight, mask='auto')
+
+
+def _load_logo(path):
+    """Scale the logo down to LOGO_SIZE at LOGO_DPI and return it decoded as an ImageReader"""
+    with PILImage.open(path) as image:
+        image = image.copy()
+    pixels = round(LOGO_SIZE / inch * LOGO_DPI)
+    if max(image.size) > pixels:
+        image.thumbnail((pixels, pixels), PILImage.LANCZOS)
+    reader = ImageReader(image)
+    # Decode now, so documents only compress the cached pixel data
+    reader.getRGBData()
+    return reader
+
+
+def get_logo(path=None):
+    """
+    Return the pre-scaled AGU logo as an ImageReader, or None if it is missing
+
+    The decoded image is kept for the life of the process and rebuilt when
+    the file's modification time changes.
+    """
+    path = path or os.path.join(settings.MEDIA_ROOT, 'agulogo.png')
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        _logo_cache.pop(path, None)
+        return None
+
+    cached = _logo_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    reader = _load_logo(path)
+    _logo_cache[path] = (mtime, reader)
+    return reader
+
+
+def clear_pdf_caches():
+    """Drop the cached styles and logos so they are rebuilt on next use"""
+    _sample_styles.cache_clear()
+    _header_styles.cache_clear()
+    _common_styles.cache_clear()
+    get_table_style.cache_clear()
+    _logo_cache.clear()
 
 
 def add_agu_header(elements, title="Report"):
@@ -18,39 +169,15 @@ def add_agu_header(elements, title="Report"):
         elements: List of PDF elements to add header to
         title: Title of the report
     """
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Custom style for university name
-    university_style = ParagraphStyle(
-        'UniversityName',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#1f2937'),  # Dark gray
-        alignment=TA_CENTER,
-        spaceAfter=0.1*inch,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Custom style for title
-    title_style = ParagraphStyle(
-        'ReportTitle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        textColor=colors.HexColor('#2563eb'),  # Blue
-        alignment=TA_CENTER,
-        spaceAfter=0.3*inch,
-        fontName='Helvetica-Bold'
-    )
-    
+    styles = _header_styles()
+
     try:
         # Add AGU logo
         logo_path = os.path.join(settings.MEDIA_ROOT, 'agulogo.png')
-        if os.path.exists(logo_path):
-            # Create image with appropriate size
-            logo = Image(logo_path, width=1.5*inch, height=1.5*inch)
-            logo.hAlign = 'CENTER'
-            elements.append(logo)
+        reader = get_logo(logo_path)
+        if reader:
+            # Drawn from the small decoded copy instead of the full-size file
+            elements.append(CachedImage(reader, LOGO_SIZE, LOGO_SIZE))
             elements.append(Spacer(1, 0.1*inch))
         else:
             print(f"Logo not found at: {logo_path}")
@@ -58,11 +185,11 @@ def add_agu_header(elements, title="Report"):
         print(f"Error adding logo: {str(e)}")
     
     # Add university name
-    elements.append(Paragraph("Arabian Gulf University", university_style))
+    elements.append(Paragraph("Arabian Gulf University", styles['university']))
     elements.append(Spacer(1, 0.1*inch))
     
     # Add title
-    elements.append(Paragraph(title, title_style))
+    elements.append(Paragraph(title, styles['title']))
     elements.append(Spacer(1, 0.2*inch))
     
     return elements
@@ -71,38 +198,41 @@ def add_agu_header(elements, title="Report"):
 def get_common_styles():
     """
     Get common styles for PDF documents
+
+    The styles are built once per process; treat them as read-only.
     """
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    custom_styles = {
-        'subtitle': ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Heading2'],
-            fontSize=12,
-            textColor=colors.HexColor('#374151'),
-            spaceAfter=0.15*inch,
-            fontName='Helvetica-Bold'
-        ),
-        'normal': ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#374151'),
-            spaceAfter=0.1*inch,
-            fontName='Helvetica'
-        ),
-        'small': ParagraphStyle(
-            'CustomSmall',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.HexColor('#6b7280'),
-            spaceAfter=0.05*inch,
-            fontName='Helvetica'
-        )
-    }
-    
-    return custom_styles
+    return dict(_common_styles())
+
+
+@contextmanager
+def binary_streams():
+    """
+    Write PDF streams as binary instead of ASCII85 text inside the block
+
+    Without the optional rl_accel extension ReportLab's pure Python ASCII85
+    encoder dominates the cost of embedding the logo. ``rl_config.useA85`` is
+    process-wide, so it is switched off only while documents are built here
+    and restored when the last of them finishes.
+    """
+    global _binary_depth, _saved_use_a85
+    with _binary_lock:
+        if not _binary_depth:
+            _saved_use_a85 = rl_config.useA85
+            rl_config.useA85 = 0
+        _binary_depth += 1
+    try:
+        yield
+    finally:
+        with _binary_lock:
+            _binary_depth -= 1
+            if not _binary_depth:
+                rl_config.useA85 = _saved_use_a85
+
+
+def build_pdf(doc, elements, **kwargs):
+    """Build ``doc`` from ``elements`` with binary streams, see ``binary_streams``"""
+    with binary_streams():
+        doc.build(elements, **kwargs)
 
 
 def add_footer_info(elements, generated_by=None, export_date=None):
@@ -114,7 +244,7 @@ def add_footer_info(elements, generated_by=None, export_date=None):
         generated_by: Name of the person who generated the report
         export_date: Date when the report was generated
     """
-    styles = get_common_styles()
+    styles = _common_styles()
     
     elements.append(Spacer(1, 0.3*inch))
     
@@ -125,3 +255,131 @@ def add_footer_info(elements, generated_by=None, export_date=None):
         elements.append(Paragraph(f"Generated on: {export_date}", styles['small']))
     
     return elements
+
+# Rows per Table flowable; ReportLab re-measures every remaining row each time
+# a table is split across pages, so one huge table costs far more than many
+# small ones
+TABLE_CHUNK_SIZE = 200
+
+_EXHAUSTED = object()
+
+
+class LazyFlowables(list):
+    """
+    Flowable list for ``doc.build()`` that pulls flowables from iterators only
+    once the document has laid out everything before them
+
+    Flowables appended after ``extend_lazy()`` are queued behind the iterator
+    so document order is kept.
+    """
+
+    def __init__(self, flowables=()):
+        super().__init__(flowables)
+        self._pending = deque()
+
+    def extend_lazy(self, flowables):
+        """Queue an iterable of flowables without consuming it"""
+        self._pending.append(iter(flowables))
+
+    def append(self, flowable):
+        if self._pending:
+            self._pending.append(iter((flowable,)))
+        else:
+            super().append(flowable)
+
+    def extend(self, flowables):
+        if self._pending:
+            self._pending.append(iter(flowables))
+        else:
+            super().extend(flowables)
+
+    def __len__(self):
+        # doc.build() checks the length before taking each flowable
+        length = super().__len__()
+        while not length and self._pending:
+            flowable = next(self._pending[0], _EXHAUSTED)
+            if flowable is _EXHAUSTED:
+                self._pending.popleft()
+            else:
+                super().append(flowable)
+                length = 1
+        return length
+
+
+@lru_cache(maxsize=None)
+def get_table_style(header_color='grey', header_font_size=10, body_font_size=None, row_colors=('beige',)):
+    """
+    Return a shared TableStyle for data tables with a header row
+
+    Args:
+        header_color: Header background (color name or hex string)
+        header_font_size: Header font size
+        body_font_size: Body font size, or None for the ReportLab default
+        row_colors: Body background colors, cycled row by row
+
+    Styles are built once per combination of arguments and reused by every
+    table chunk.
+    """
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.toColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.toColor(color) for color in row_colors]),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+    if body_font_size:
+        commands.append(('FONTSIZE', (0, 1), (-1, -1), body_font_size))
+    return TableStyle(commands)
+
+
+def table_chunks(headers, rows, style, chunk_size=TABLE_CHUNK_SIZE, col_widths=None):
+    """
+    Yield Table flowables of at most ``chunk_size`` rows, each with the header
+
+    Args:
+        headers: Header row repeated at the top of every chunk and page
+        rows: Iterable of row sequences, consumed one chunk at a time
+        style: TableStyle applied to every chunk (see ``get_table_style``)
+        chunk_size: Data rows per table
+        col_widths: Optional fixed column widths
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        table = Table([headers] + chunk, colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+
+def add_table(elements, headers, rows, style=None, chunk_size=TABLE_CHUNK_SIZE, col_widths=None):
+    """
+    Add a data table to PDF elements as fixed-size chunks
+
+    Args:
+        elements: List of PDF elements; with ``LazyFlowables`` the rows are
+            read while the document is built instead of up front
+        headers: Column headers
+        rows: Iterable of row sequences, e.g. built from ``iter_values(...)``
+        style: TableStyle, defaults to ``get_table_style()``
+
+    Returns:
+        False if ``rows`` was empty and nothing was added, True otherwise
+    """
+    rows = iter(rows)
+    first = next(rows, _EXHAUSTED)
+    if first is _EXHAUSTED:
+        return False
+
+    chunks = table_chunks(headers, chain([first], rows), style or get_table_style(), chunk_size, col_widths)
+    if isinstance(elements, LazyFlowables):
+        elements.extend_lazy(chunks)
+    else:
+        elements.extend(chunks)
+    return True